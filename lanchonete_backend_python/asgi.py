@@ -2,6 +2,14 @@
 ASGI config for lanchonete_backend_python project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+This is how the whole project is served: the kitchen panel stream
+(orders.views.pedidos_ativos_stream) needs an async server, and its event hub
+lives in the same process as the views that write orders, e.g.
+
+    uvicorn lanchonete_backend_python.asgi:application --workers 1
+
+The other streaming responses (sales export, media) switch to async iterators
+under ASGI (lanchonete_backend_python/streaming.py), so they are not buffered.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -0,0 +1,161 @@
+# lanchonete_backend_python/media.py
+"""
+Entrega dos arquivos de MEDIA_ROOT (fotos e variantes) em produção.
+
+- Nomes com hash do conteúdo (as variantes de stock/images.py) nunca mudam de
+  conteúdo: saem com Cache-Control immutable de um ano. Os demais, com
+  MEDIA_CACHE_MAX_AGE.
+- ETag forte (tamanho + mtime) e Last-Modified: If-None-Match/If-Modified-Since
+  respondem 304 sem abrir o arquivo.
+- Range de um intervalo (bytes=a-b, a-, -n), com If-Range; vários intervalos
+  recebem o arquivo inteiro, como a RFC 9110 permite.
+- Com MEDIA_SENDFILE = 'x-accel-redirect' (nginx) ou 'x-sendfile' (Apache,
+  lighttpd) a view só confere o caminho e monta os headers; o servidor web
+  envia o arquivo, e nenhum worker Python fica preso na transferência.
+  Sem offload, no WSGI o arquivo inteiro sai por FileResponse, que usa o
+  wsgi.file_wrapper (sendfile) do servidor. O ASGI não tem file wrapper e
+  juntaria um corpo síncrono inteiro na memória: lá o arquivo inteiro e os
+  intervalos saem em blocos de TAMANHO_DO_BLOCO lidos num thread à parte
+  (lanchonete_backend_python/streaming.py). Em produção, prefira o offload.
+"""
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import parse_etags, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .streaming import resposta_em_streaming, servido_por_asgi
+
+# <nome>.<hash hexadecimal>.<ext>, como em foto.thumb.0123456789abcdef.webp
+NOME_COM_HASH = re.compile(r'\.[0-9a-f]{16,}\.[A-Za-z0-9]+$')
+UM_ANO = 365 * 24 * 60 * 60
+INTERVALO = re.compile(r'^bytes=(\d*)-(\d*)$')
+TAMANHO_DO_BLOCO = 64 * 1024
+
+
+def _etag(estado):
+    return f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+
+
+def _nao_modificado(request, etag, modificado_em):
+    # If-None-Match tem precedência; a comparação é a fraca (W/"x" vale "x").
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        etags = parse_etags(request.META['HTTP_IF_NONE_MATCH'])
+        return '*' in etags or etag in (valor.removeprefix('W/') for valor in etags)
+    desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return desde is not None and int(modificado_em) <= desde
+
+
+def _intervalo(request, tamanho, etag, modificado_em):
+    """
+    (inicio, fim) inclusivos do Range pedido, None para o arquivo inteiro ou
+    False se o intervalo não existe no arquivo (416).
+    """
+    cabecalho = request.META.get('HTTP_RANGE', '')
+    if not cabecalho:
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(modificado_em):
+        # O cliente tem outra versão: manda o arquivo inteiro.
+        return None
+    partes = INTERVALO.match(cabecalho.replace(' ', ''))
+    if not partes or partes.groups() == ('', ''):
+        return None
+    inicio, fim = partes.groups()
+    if not inicio:
+        # bytes=-n: os últimos n bytes
+        if int(fim) == 0:
+            return False
+        return max(tamanho - int(fim), 0), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+def _blocos(caminho, inicio, tamanho):
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(inicio)
+        while tamanho > 0:
+            bloco = arquivo.read(min(TAMANHO_DO_BLOCO, tamanho))
+            if not bloco:
+                break
+            tamanho -= len(bloco)
+            yield bloco
+
+
+def _cache_control(response, caminho):
+    if NOME_COM_HASH.search(caminho):
+        patch_cache_control(response, public=True, max_age=UM_ANO, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600))
+
+
+def _offload(caminho_relativo, caminho):
+    modo = getattr(settings, 'MEDIA_SENDFILE', None)
+    if modo == 'x-accel-redirect':
+        # Location "internal" do nginx que aponta para MEDIA_ROOT.
+        prefixo = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        return 'X-Accel-Redirect', prefixo + quote(caminho_relativo)
+    if modo == 'x-sendfile':
+        return 'X-Sendfile', caminho
+    return None
+
+
+@require_safe
+def servir_media(request, path):
+    """Entrega MEDIA_ROOT/<path>; 404 para caminhos fora da pasta e diretórios."""
+    try:
+        caminho = safe_join(settings.MEDIA_ROOT, path)
+        estado = os.stat(caminho)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("Arquivo não encontrado.")
+    if not stat.S_ISREG(estado.st_mode):
+        raise Http404("Arquivo não encontrado.")
+
+    etag = _etag(estado)
+    modificado_em = estado.st_mtime
+    content_type = mimetypes.guess_type(caminho)[0] or 'application/octet-stream'
+
+    if _nao_modificado(request, etag, modificado_em):
+        response = HttpResponseNotModified()
+    elif (offload := _offload(path, caminho)) is not None:
+        # O servidor web cuida do corpo, do Range e dos condicionais que chegarem até ele.
+        response = HttpResponse(content_type=content_type)
+        response[offload[0]] = offload[1]
+    else:
+        intervalo = _intervalo(request, estado.st_size, etag, modificado_em)
+        if intervalo is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{estado.st_size}'
+        elif intervalo is None and not servido_por_asgi(request):
+            response = FileResponse(open(caminho, 'rb'), content_type=content_type)
+        elif intervalo is None:
+            response = resposta_em_streaming(
+                request, _blocos(caminho, 0, estado.st_size), thread_sensitive=False, content_type=content_type
+            )
+            response['Content-Length'] = str(estado.st_size)
+        else:
+            inicio, fim = intervalo
+            response = resposta_em_streaming(
+                request, _blocos(caminho, inicio, fim - inicio + 1), thread_sensitive=False,
+                status=206, content_type=content_type
+            )
+            response['Content-Length'] = str(fim - inicio + 1)
+            response['Content-Range'] = f'bytes {inicio}-{fim}/{estado.st_size}'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado_em)
+    response['Accept-Ranges'] = 'bytes'
+    if response.status_code != 416:
+        _cache_control(response, path)
+    return response
@@ -0,0 +1,130 @@
+# lanchonete_backend_python/pagination.py
+"""
+Paginação por chave (keyset) para as listas que crescem sem limite.
+"""
+import base64
+import datetime
+import json
+from decimal import Decimal
+from operator import attrgetter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def _serializar(valor):
+    # isoformat() completo: o DjangoJSONEncoder cortaria os microssegundos e o
+    # cursor de data_venda passaria a pular ou repetir linhas.
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagina por (campo, id) em vez de OFFSET: cada página continua a partir da
+    última linha da anterior com um WHERE que o índice resolve, então a página
+    1000 custa o mesmo que a primeira.
+
+    A view declara a ordenação em `keyset_ordering`, ex.: ('-data_venda', '-id')
+    ou ('name', 'id'). O segundo campo precisa ser único (desempate). O cursor
+    devolvido em "next" é opaco e continua válido mesmo com inserções entre as
+    chamadas. Resposta: {"next": url ou null, "results": [...]}.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    max_page_size = 200
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        padrao = getattr(settings, 'API_PAGE_SIZE', 50)
+        try:
+            tamanho = int(request.query_params.get(self.page_size_query_param, padrao))
+        except ValueError:
+            tamanho = padrao
+        return max(1, min(tamanho, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Uma página da união de vários querysets com os mesmos campos de ordenação
+        (e desempates que não se repetem entre eles): cada um lê no máximo uma
+        página a partir do cursor, e as linhas são intercaladas em memória.
+        """
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', None)
+        if not self.ordering or len(self.ordering) != 2:
+            raise ImproperlyConfigured(f"{type(view).__name__} precisa declarar keyset_ordering = (campo, desempate).")
+        page_size = self.get_page_size(request)
+
+        pagina = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*self.ordering)
+            posicao = self.decode_cursor(request, queryset.model)
+            if posicao is not None:
+                queryset = queryset.filter(self._depois_de(*posicao))
+            pagina.extend(queryset[:page_size + 1])
+        if len(querysets) > 1:
+            # Ordenação estável, do último campo para o primeiro.
+            for campo in reversed(self.ordering):
+                pagina.sort(key=attrgetter(campo.lstrip('-')), reverse=campo.startswith('-'))
+
+        self.next_position = None
+        if len(pagina) > page_size:
+            pagina = pagina[:page_size]
+            self.next_position = tuple(getattr(pagina[-1], campo.lstrip('-')) for campo in self.ordering)
+        return pagina
+
+    def _depois_de(self, valor, desempate):
+        campo, campo_desempate = (c.lstrip('-') for c in self.ordering)
+        operador = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        # (campo, id) > (valor, desempate), escrito com o limite do primeiro campo
+        # em separado para que o banco comece a varredura do índice direto em `valor`.
+        return Q(**{f'{campo}__{operador}e': valor}) & (
+            Q(**{f'{campo}__{operador}': valor}) | Q(**{f'{campo_desempate}__{operador}': desempate})
+        )
+
+    def encode_cursor(self, posicao):
+        bruto = json.dumps([_serializar(valor) for valor in posicao])
+        return base64.urlsafe_b64encode(bruto.encode()).decode()
+
+    def decode_cursor(self, request, modelo):
+        codificado = request.query_params.get(self.cursor_query_param)
+        if not codificado:
+            return None
+        try:
+            valores = json.loads(base64.urlsafe_b64decode(codificado.encode()).decode())
+            campos = [modelo._meta.get_field(c.lstrip('-')) for c in self.ordering]
+            if not isinstance(valores, list) or len(valores) != len(campos):
+                raise ValueError
+            return tuple(campo.to_python(valor) for campo, valor in zip(campos, valores))
+        except (TypeError, ValueError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -68,6 +68,8 @@ AUTH_USER_MODEL = 'users.CustomUser'
 
 # Configurações CORS
 CORS_ALLOW_ALL_ORIGINS = True 
+# O frontend lê o cursor das listas de pedidos (?since=) neste header
+CORS_EXPOSE_HEADERS = ['X-Cursor']
 # CORS_ALLOWED_ORIGINS = [ # Exemplo para produção, se CORS_ALLOW_ALL_ORIGINS = False
 #    "http://localhost:8000", # Se seu frontend estiver na porta 8000
 #    "http://127.0.0.1:8000",
@@ -132,6 +134,14 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'lanchonete_backend_python.wsgi.application'
+# O stream do painel da cozinha (orders/views.py, pedidos_ativos_stream) é assíncrono e
+# fica aberto. O hub de eventos é por processo, então o stream e as gravações de pedidos
+# não podem ficar em servidores separados: sirva o projeto inteiro pelo ASGI, num único
+# processo, ex.: uvicorn lanchonete_backend_python.asgi:application --workers 1
+# Os outros corpos em streaming (exportação de vendas, media.py) viram iteradores
+# assíncronos no ASGI (lanchonete_backend_python/streaming.py) e continuam saindo aos
+# poucos; uma view nova em streaming deve usar resposta_em_streaming().
+ASGI_APPLICATION = 'lanchonete_backend_python.asgi.application'
 
 
 # Database
@@ -193,6 +203,78 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files (for user-uploaded content) - ADICIONE AQUI
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Entrega das fotos (lanchonete_backend_python/media.py). Com o nginx na frente, use
+# MEDIA_SENDFILE = 'x-accel-redirect' e uma location "internal" em MEDIA_ACCEL_REDIRECT_PREFIX
+# apontando para MEDIA_ROOT; com Apache/lighttpd, 'x-sendfile'. None = o Django envia.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Cache das fotos originais, em segundos (as variantes com hash no nome são imutáveis)
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+# Threads que geram as miniaturas das fotos enviadas (stock/images.py). 0 = gera na
+# própria requisição, depois do commit (útil em testes e scripts).
+STOCK_IMAGE_WORKERS = 2
 
 # Configuração de E-mail (para desenvolvimento, usar o console)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Configurações de Pedidos (app orders)
+# Por quanto tempo a resposta de uma venda fica guardada para o header Idempotency-Key
+ORDERS_IDEMPOTENCY_TTL = timedelta(hours=24)
+
+# Entrada de vendas: 'direto' (uma transação por requisição) ou 'lote' (group commit).
+# No modo 'lote' as requisições esperam em uma fila e são gravadas em micro-lotes.
+ORDERS_INTAKE_MODE = 'direto'
+ORDERS_INTAKE_BATCH_SIZE = 50       # Máximo de pedidos por transação
+ORDERS_INTAKE_MAX_WAIT = 0.005      # Segundos que o committer espera para completar um lote
+ORDERS_INTAKE_TIMEOUT = 10          # Segundos que a requisição espera pelo resultado
+
+# Por quanto tempo um pedido online (NA_RETIRADA/ONLINE) segura o estoque esperando o pagamento
+ORDERS_RESERVATION_TTL = timedelta(minutes=30)
+
+# Máximo de vendas aceitas em uma chamada de sincronização do PDV (sales/sync/)
+ORDERS_SYNC_MAX_SALES = 1000
+
+# Itens por página nas listas paginadas por cursor (o cliente pode pedir até 200 com ?page_size=)
+API_PAGE_SIZE = 50
+
+# Cache dos relatórios (orders/cache_relatorios.py). Memória local por padrão, que vale
+# por processo; com vários workers, troque o alias 'relatorios' por
+# 'django.core.cache.backends.filebased.FileBasedCache' (LOCATION = uma pasta) ou
+# 'django.core.cache.backends.db.DatabaseCache' (LOCATION = tabela criada com createcachetable).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'relatorios': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'relatorios',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+ORDERS_REPORT_CACHE_ALIAS = 'relatorios'
+# Validade das entradas de períodos que incluem hoje (os fechados não expiram)
+ORDERS_REPORT_CACHE_TTL = timedelta(hours=1)
+# Maior período aceito pelos relatórios (dias): o cache guarda uma geração por dia
+ORDERS_REPORT_MAX_DAYS = 731
+
+# Versão do catálogo que invalida o snapshot do cardápio público (stock/menu_snapshot.py).
+# O snapshot fica na memória de cada processo, mas a versão precisa ser a mesma para todos:
+# com vários workers, aponte este alias para um cache compartilhado (ex.: Redis ou DatabaseCache).
+STOCK_CATALOG_CACHE_ALIAS = 'default'
+# Idade máxima do snapshot (segundos): atraso máximo do estoque mostrado no cardápio e,
+# com a versão em memória local e vários workers, de qualquer alteração do catálogo.
+STOCK_MENU_SNAPSHOT_TTL = 5
+
+# Ingressos de uso único do stream do painel da cozinha (orders/eventos.py): o navegador
+# não envia o JWT no EventSource, e um token na URL ficaria nos logs de acesso.
+# Quem emite e quem resgata precisam ver o mesmo cache.
+ORDERS_STREAM_TICKET_CACHE_ALIAS = 'default'
+# Validade do ingresso (segundos): só o tempo de abrir o stream.
+ORDERS_STREAM_TICKET_TTL = 30
+
+# Arquivo colunar das vendas encerradas (orders/arquivo.py, comando arquivar_vendas).
+# Vendas FINALIZADO/CANCELADO mais antigas que isso saem das tabelas quentes; os
+# relatórios continuam contando com elas. A pasta precisa ser persistente e ter backup.
+ORDERS_ARCHIVE_DIR = BASE_DIR / 'arquivo_vendas'
+ORDERS_ARCHIVE_AFTER_DAYS = 180
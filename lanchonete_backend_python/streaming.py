@@ -0,0 +1,45 @@
+# lanchonete_backend_python/streaming.py
+"""
+Respostas em streaming que funcionam nos dois servidores.
+
+No WSGI o Django percorre o corpo síncrono aos poucos. No ASGI um corpo
+síncrono é lido inteiro com sync_to_async(list) antes do primeiro byte (e um
+corpo assíncrono, no WSGI, também). resposta_em_streaming() escolhe pela
+requisição: o mesmo gerador síncrono é entregue como está no WSGI e, no ASGI,
+embrulhado em iterar_async(), que busca uma parte por vez no thread do Django.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_FIM = object()
+
+
+def servido_por_asgi(request):
+    """True se a requisição (do Django ou do DRF) chegou pelo handler ASGI."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def iterar_async(partes, thread_sensitive=True):
+    """
+    Percorre o iterador síncrono `partes` sem juntar tudo. Por padrão cada next()
+    roda no thread compartilhado do sync_to_async, o mesmo das queries do Django,
+    então cursores do lado do servidor (.iterator()) continuam válidos entre as
+    partes; corpos que não usam o banco (arquivos) passam thread_sensitive=False
+    e não disputam esse thread com as views.
+    """
+    iterador = iter(partes)
+    proxima = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while (parte := await proxima(iterador, _FIM)) is not _FIM:
+            yield parte
+    finally:
+        if hasattr(iterador, 'close'):
+            await sync_to_async(iterador.close, thread_sensitive=thread_sensitive)()
+
+
+def resposta_em_streaming(request, partes, thread_sensitive=True, **kwargs):
+    """StreamingHttpResponse de `partes` (iterador síncrono) no formato que o servidor da requisição percorre aos poucos."""
+    if servido_por_asgi(request):
+        partes = iterar_async(partes, thread_sensitive=thread_sensitive)
+    return StreamingHttpResponse(partes, **kwargs)
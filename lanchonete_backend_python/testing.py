@@ -0,0 +1,36 @@
+# lanchonete_backend_python/testing.py
+"""
+Utilitários de teste compartilhados pelos apps (orders, stock, users).
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class OrcamentoQueriesMixin:
+    """
+    Mixin para TestCase que fixa o "orçamento" de queries de um endpoint de lista.
+
+    assertOrcamentoQueries chama o endpoint depois de cada rodada de `semear()` e
+    falha se alguma chamada passar do orçamento declarado ou se o número de
+    queries crescer junto com os dados (sinal de N+1).
+    """
+
+    def assertOrcamentoQueries(self, client, url, orcamento, semear, rodadas=3, params=None):
+        contagens = []
+        for _ in range(rodadas):
+            semear()
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, params)
+            self.assertEqual(response.status_code, 200, f"{url}: HTTP {response.status_code}")
+            contagens.append(len(queries))
+
+        sqls = '\n'.join(f"{i}. {query['sql']}" for i, query in enumerate(queries.captured_queries, start=1))
+        self.assertLessEqual(
+            max(contagens), orcamento,
+            f"{url} passou do orçamento de {orcamento} queries: {contagens}\n{sqls}"
+        )
+        self.assertEqual(
+            len(set(contagens)), 1,
+            f"{url}: o número de queries cresce com os dados: {contagens}\n{sqls}"
+        )
+        return response
@@ -1,16 +1,17 @@
 # lanchonete_backend_python/urls.py
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings # Importe settings
-from django.conf.urls.static import static # Importe static
+
+from .media import servir_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('users.urls')),
     path('api/stock/', include('stock.urls')),
     path('api/orders/', include('orders.urls')),
+    # Fotos enviadas, em desenvolvimento e em produção (cache, Range e offload em media.py)
+    re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.+)$', servir_media, name='media'),
 ]
-
-# Apenas para servir arquivos de mídia durante o desenvolvimento
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,402 @@
+# orders/arquivo.py
+"""
+Arquivo colunar das vendas encerradas.
+
+Vendas FINALIZADO/CANCELADO mais antigas que ORDERS_ARCHIVE_AFTER_DAYS saem de
+Venda/ItemVenda e vão para arquivos por mês (ORDERS_ARCHIVE_DIR/AAAA-MM/): um
+arquivo binário por coluna, uma linha por item, só com acréscimos no fim, lidos
+com np.memmap. No banco fica uma VendaArquivada por venda e o manifesto
+ArquivoMensal, que diz quantas linhas de cada mês estão confirmadas.
+
+Os relatórios que leem itens (lucratividade, exportação, reconstrução dos
+resumos, previsão de estoque) somam o arquivo, varrido com NumPy, às linhas
+vivas. Os resumos diários e horários não mudam: a venda continua contada neles.
+"Meus pedidos" e o detalhe da venda também mostram as vendas arquivadas, com os
+itens lidos do mês delas (itens_das_vendas); elas só não aceitam mais alterações.
+"""
+import json
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Venda, ItemVenda, VendaArquivada, ArquivoMensal
+from .sequencia import travar_alteracoes
+
+# Códigos gravados nos arquivos: só acrescente no fim, nunca reordene.
+STATUS = ('AGUARDANDO_PAGAMENTO', 'PAGO', 'EM_PREPARO', 'PRONTO', 'FINALIZADO', 'CANCELADO')
+PAGAMENTOS = ('NA_RETIRADA', 'ONLINE', 'DINHEIRO', 'CARTAO_DEBITO', 'CARTAO_CREDITO', 'PIX')
+
+# Uma linha por ItemVenda, com as colunas da venda repetidas (mesma ordem da exportação). -1 = nulo.
+COLUNAS = {
+    'venda_id': np.int64,
+    'data_venda': np.int64,         # microssegundos desde 1970-01-01 UTC
+    'status': np.int8,
+    'payment_method': np.int8,
+    'valor_total': np.int64,        # centavos
+    'cliente_id': np.int64,
+    'item_id': np.int64,
+    'produto_id': np.int64,
+    'nome_produto': np.int32,       # posição no dicionário nomes.jsonl do mês
+    'quantidade': np.int32,
+    'preco_unitario': np.int64,     # centavos
+    'custo_unitario': np.int64,     # centavos
+}
+ARQUIVO_NOMES = 'nomes.jsonl'
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSSEGUNDO = timedelta(microseconds=1)
+
+
+class ArquivoCorrompido(Exception):
+    """Um arquivo do mês tem menos dados do que o manifesto diz estarem confirmados."""
+
+
+def diretorio_arquivo():
+    return Path(getattr(settings, 'ORDERS_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'arquivo_vendas'))
+
+
+def dias_para_arquivar():
+    return getattr(settings, 'ORDERS_ARCHIVE_AFTER_DAYS', 180)
+
+
+def para_microssegundos(momento):
+    return (momento - EPOCA) // MICROSSEGUNDO
+
+
+def de_microssegundos(valor):
+    return EPOCA + timedelta(microseconds=int(valor))
+
+
+def para_centavos(valor):
+    return -1 if valor is None else int(valor * 100)
+
+
+def de_centavos(valor):
+    return None if valor < 0 else Decimal(int(valor)).scaleb(-2)
+
+
+def _mes_local(momento):
+    return timezone.localtime(momento).date().replace(day=1)
+
+
+def _pasta(mes):
+    return diretorio_arquivo() / f'{mes:%Y-%m}'
+
+
+def _dias_no_mes(mes):
+    proximo = (mes.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return (proximo - mes).days
+
+
+# --- Leitura ---
+
+@dataclass
+class MesArquivado:
+    mes: object
+    colunas: dict       # nome -> array (memmap do mês inteiro ou recorte do período)
+    nomes: list         # nome_produto de cada código
+
+    def __len__(self):
+        return len(self.colunas['venda_id'])
+
+
+def _ler_nomes(manifesto):
+    if not manifesto.bytes_nomes:
+        return []
+    with open(_pasta(manifesto.mes) / ARQUIVO_NOMES, 'rb') as arquivo:
+        bruto = arquivo.read(manifesto.bytes_nomes)
+    return [json.loads(linha) for linha in bruto.splitlines()]
+
+
+def _abrir(manifesto):
+    pasta = _pasta(manifesto.mes)
+    colunas = {
+        nome: np.memmap(pasta / f'{nome}.bin', dtype=tipo, mode='r', shape=(manifesto.linhas,))
+        for nome, tipo in COLUNAS.items()
+    }
+    return MesArquivado(manifesto.mes, colunas, _ler_nomes(manifesto))
+
+
+def meses_arquivados(de=None, ate=None):
+    """
+    Meses do arquivo com linhas em [de, ate) (datetimes; None = sem limite), já
+    recortados para o intervalo. Só as linhas confirmadas no manifesto são lidas.
+    """
+    manifestos = ArquivoMensal.objects.filter(linhas__gt=0)
+    if de is not None:
+        manifestos = manifestos.filter(mes__gte=_mes_local(de))
+    if ate is not None:
+        manifestos = manifestos.filter(mes__lte=_mes_local(ate - MICROSSEGUNDO))
+    for manifesto in manifestos.order_by('mes'):
+        mes = _abrir(manifesto)
+        if de is not None or ate is not None:
+            instantes = mes.colunas['data_venda']
+            dentro = np.ones(len(instantes), dtype=bool)
+            if de is not None:
+                dentro &= instantes >= para_microssegundos(de)
+            if ate is not None:
+                dentro &= instantes < para_microssegundos(ate)
+            if not dentro.all():
+                mes.colunas = {nome: coluna[dentro] for nome, coluna in mes.colunas.items()}
+        if len(mes):
+            yield mes
+
+
+def posicoes_locais(instantes, primeiro_dia, n_dias, por_hora=False):
+    """
+    Dia (0 a n_dias - 1, contado de `primeiro_dia`) e hora locais de cada instante
+    em microssegundos, pelas fronteiras das horas no fuso atual: funciona com
+    horário de verão. Instantes fora do período ficam com dia -1.
+    Retorna o array de dias, ou (dias, horas) com por_hora=True.
+    """
+    fuso = timezone.get_current_timezone()
+    horas = range(24) if por_hora else [0]
+    fronteiras = [
+        para_microssegundos(timezone.make_aware(datetime.combine(primeiro_dia + timedelta(days=dia), time(hora)), fuso))
+        for dia in range(n_dias) for hora in horas
+    ]
+    fronteiras.append(para_microssegundos(timezone.make_aware(
+        datetime.combine(primeiro_dia + timedelta(days=n_dias), time.min), fuso
+    )))
+    fronteiras = np.maximum.accumulate(np.asarray(fronteiras, dtype=np.int64))
+    posicao = np.searchsorted(fronteiras, instantes, side='right') - 1
+    fora = (posicao < 0) | (posicao >= len(fronteiras) - 1)
+    dias = np.where(fora, -1, posicao // len(horas))
+    if not por_hora:
+        return dias
+    return dias, np.where(fora, -1, posicao % 24)
+
+
+def _codigos(nomes_de_status):
+    return [STATUS.index(status) for status in nomes_de_status]
+
+
+def totais_por_produto(de=None, ate=None, status=STATUS):
+    """
+    {nome_produto: [quantidade, receita, custo]} dos itens arquivados em [de, ate)
+    com um dos `status`. Itens sem custo gravado não entram no custo.
+    """
+    totais = defaultdict(lambda: [0, Decimal('0'), Decimal('0')])
+    for mes in meses_arquivados(de, ate):
+        colunas = mes.colunas
+        escolhidos = np.isin(colunas['status'], _codigos(status))
+        nomes = colunas['nome_produto'][escolhidos]
+        quantidade = colunas['quantidade'][escolhidos].astype(np.int64)
+        custo = colunas['custo_unitario'][escolhidos]
+        somas = [
+            np.bincount(nomes, weights=quantidade, minlength=len(mes.nomes)),
+            np.bincount(nomes, weights=quantidade * colunas['preco_unitario'][escolhidos], minlength=len(mes.nomes)),
+            np.bincount(nomes, weights=np.where(custo >= 0, quantidade * custo, 0), minlength=len(mes.nomes)),
+        ]
+        for codigo in np.flatnonzero(somas[0]):
+            linha = totais[mes.nomes[codigo]]
+            linha[0] += int(round(somas[0][codigo]))
+            linha[1] += de_centavos(round(somas[1][codigo]))
+            linha[2] += de_centavos(round(somas[2][codigo]))
+    return totais
+
+
+def totais_por_hora(de=None, ate=None):
+    """
+    Itens arquivados em [de, ate) somados por dia e hora locais, status e produto:
+    tuplas (dia, hora, status, nome_produto, quantidade, receita).
+    """
+    for mes in meses_arquivados(de, ate):
+        colunas = mes.colunas
+        # Um dia de folga de cada lado: o mês do arquivo é o do fuso da época do arquivamento.
+        primeiro_dia = mes.mes - timedelta(days=1)
+        dias, horas = posicoes_locais(colunas['data_venda'], primeiro_dia, _dias_no_mes(mes.mes) + 2, por_hora=True)
+        chaves = (
+            ((dias.astype(np.int64) * 24 + horas) * len(STATUS) + colunas['status']) * max(len(mes.nomes), 1)
+            + colunas['nome_produto']
+        )
+        unicas, grupo = np.unique(chaves, return_inverse=True)
+        quantidade = colunas['quantidade'].astype(np.int64)
+        quantidades = np.bincount(grupo, weights=quantidade)
+        receitas = np.bincount(grupo, weights=quantidade * colunas['preco_unitario'])
+        for chave, total, receita in zip(unicas.tolist(), quantidades, receitas):
+            chave, nome = divmod(chave, max(len(mes.nomes), 1))
+            chave, status = divmod(chave, len(STATUS))
+            dia, hora = divmod(chave, 24)
+            yield (
+                primeiro_dia + timedelta(days=dia), hora, STATUS[status], mes.nomes[nome],
+                int(round(total)), de_centavos(round(receita)),
+            )
+
+
+def itens_das_vendas(arquivadas):
+    """
+    Itens das VendaArquivada informadas, lidos só dos meses delas:
+    {venda_id: [(nome_produto, quantidade, preco_unitario), ...]}, na ordem dos itens.
+    """
+    ids_por_mes = defaultdict(list)
+    for venda in arquivadas:
+        ids_por_mes[venda.mes].append(venda.id)
+    itens = defaultdict(list)
+    if not ids_por_mes:
+        return itens
+    for manifesto in ArquivoMensal.objects.filter(mes__in=list(ids_por_mes), linhas__gt=0).order_by('mes'):
+        mes = _abrir(manifesto)
+        colunas = mes.colunas
+        linhas = np.flatnonzero(np.isin(colunas['venda_id'], ids_por_mes[manifesto.mes]))
+        linhas = linhas[np.lexsort((colunas['item_id'][linhas], colunas['venda_id'][linhas]))]
+        for venda_id, nome, quantidade, preco in zip(
+            colunas['venda_id'][linhas].tolist(), colunas['nome_produto'][linhas].tolist(),
+            colunas['quantidade'][linhas].tolist(), colunas['preco_unitario'][linhas].tolist(),
+        ):
+            itens[venda_id].append((mes.nomes[nome], quantidade, de_centavos(preco)))
+    return itens
+
+
+def linhas_arquivadas(de, ate, bloco=2000):
+    """
+    Linhas dos itens arquivados em [de, ate), em ordem de venda dentro de cada mês,
+    como tuplas na ordem de COLUNAS (valores já decodificados).
+    """
+    for mes in meses_arquivados(de, ate):
+        colunas = mes.colunas
+        ordem = np.lexsort((colunas['item_id'], colunas['venda_id'], colunas['data_venda']))
+        for comeco in range(0, len(ordem), bloco):
+            pedaco = ordem[comeco:comeco + bloco]
+            valores = {nome: coluna[pedaco].tolist() for nome, coluna in colunas.items()}
+            for i in range(len(pedaco)):
+                yield (
+                    valores['venda_id'][i],
+                    de_microssegundos(valores['data_venda'][i]),
+                    STATUS[valores['status'][i]],
+                    PAGAMENTOS[valores['payment_method'][i]],
+                    de_centavos(valores['valor_total'][i]),
+                    None if valores['cliente_id'][i] < 0 else valores['cliente_id'][i],
+                    valores['item_id'][i],
+                    None if valores['produto_id'][i] < 0 else valores['produto_id'][i],
+                    mes.nomes[valores['nome_produto'][i]],
+                    valores['quantidade'][i],
+                    de_centavos(valores['preco_unitario'][i]),
+                    de_centavos(valores['custo_unitario'][i]),
+                )
+
+
+# --- Escrita ---
+
+def _anexar(caminho, confirmado, dados):
+    """
+    Grava `dados` depois dos `confirmado` primeiros bytes do arquivo. Uma sobra
+    além disso é de um arquivamento desfeito (a transação não confirmou o
+    manifesto) e é descartada antes.
+    """
+    with open(caminho, 'a+b') as arquivo:
+        tamanho = arquivo.seek(0, os.SEEK_END)
+        if tamanho < confirmado:
+            raise ArquivoCorrompido(f"{caminho}: {tamanho} bytes, o manifesto confirma {confirmado}.")
+        if tamanho > confirmado:
+            arquivo.truncate(confirmado)
+        arquivo.write(dados)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+
+def _gravar_mes(manifesto, vendas, itens_por_venda):
+    """Acrescenta as vendas ao arquivo do mês e atualiza (sem salvar) o manifesto."""
+    pasta = _pasta(manifesto.mes)
+    pasta.mkdir(parents=True, exist_ok=True)
+    codigos = {nome: codigo for codigo, nome in enumerate(_ler_nomes(manifesto))}
+    novos_nomes = []
+    linhas = {nome: [] for nome in COLUNAS}
+    for venda in vendas:
+        for item_id, produto_id, nome_produto, quantidade, preco_unitario, custo_unitario in itens_por_venda[venda['id']]:
+            if nome_produto not in codigos:
+                codigos[nome_produto] = len(codigos)
+                novos_nomes.append(nome_produto)
+            for nome, valor in (
+                ('venda_id', venda['id']),
+                ('data_venda', para_microssegundos(venda['data_venda'])),
+                ('status', STATUS.index(venda['status'])),
+                ('payment_method', PAGAMENTOS.index(venda['payment_method'])),
+                ('valor_total', para_centavos(venda['valor_total'])),
+                ('cliente_id', -1 if venda['cliente_id'] is None else venda['cliente_id']),
+                ('item_id', item_id),
+                ('produto_id', -1 if produto_id is None else produto_id),
+                ('nome_produto', codigos[nome_produto]),
+                ('quantidade', quantidade),
+                ('preco_unitario', para_centavos(preco_unitario)),
+                ('custo_unitario', para_centavos(custo_unitario)),
+            ):
+                linhas[nome].append(valor)
+
+    for nome, tipo in COLUNAS.items():
+        confirmado = manifesto.linhas * np.dtype(tipo).itemsize
+        _anexar(pasta / f'{nome}.bin', confirmado, np.asarray(linhas[nome], dtype=tipo).tobytes())
+    dicionario = ''.join(json.dumps(nome, ensure_ascii=False) + '\n' for nome in novos_nomes).encode()
+    _anexar(pasta / ARQUIVO_NOMES, manifesto.bytes_nomes, dicionario)
+
+    manifesto.linhas += len(linhas['venda_id'])
+    manifesto.nomes += len(novos_nomes)
+    manifesto.bytes_nomes += len(dicionario)
+
+
+def _arquivar_lote(corte, lote):
+    with transaction.atomic():
+        # A trava das alterações para os escritores e o reconstruir_resumos enquanto o
+        # lote troca de lugar: ninguém vê a venda nas duas fontes, nem em nenhuma.
+        travar_alteracoes()
+        vendas = list(
+            Venda.objects.filter(status__in=Venda.STATUS_ENCERRADOS, data_venda__lt=corte)
+            .order_by('data_venda', 'id')
+            .values('id', 'cliente_id', 'status', 'payment_method', 'data_venda', 'uuid_cliente', 'valor_total')[:lote]
+        )
+        if not vendas:
+            return 0
+        ids = [venda['id'] for venda in vendas]
+        itens_por_venda = defaultdict(list)
+        for venda_id, *item in ItemVenda.objects.filter(venda_id__in=ids).order_by('venda_id', 'id').values_list(
+            'venda_id', 'id', 'produto_id', 'nome_produto', 'quantidade', 'preco_unitario', 'custo_unitario'
+        ):
+            itens_por_venda[venda_id].append(item)
+
+        por_mes = defaultdict(list)
+        for venda in vendas:
+            por_mes[_mes_local(venda['data_venda'])].append(venda)
+        for mes in por_mes:
+            ArquivoMensal.objects.get_or_create(mes=mes)
+        manifestos = ArquivoMensal.objects.select_for_update().filter(mes__in=list(por_mes)).in_bulk(field_name='mes')
+
+        resumos = []
+        for mes, vendas_do_mes in sorted(por_mes.items()):
+            manifesto = manifestos[mes]
+            _gravar_mes(manifesto, vendas_do_mes, itens_por_venda)
+            manifesto.save(update_fields=['linhas', 'nomes', 'bytes_nomes', 'atualizado_em'])
+            resumos.extend(
+                VendaArquivada(
+                    id=venda['id'], cliente_id=venda['cliente_id'], status=venda['status'],
+                    payment_method=venda['payment_method'], data_venda=venda['data_venda'],
+                    uuid_cliente=venda['uuid_cliente'], valor_total=venda['valor_total'],
+                    itens=len(itens_por_venda[venda['id']]), mes=mes,
+                )
+                for venda in vendas_do_mes
+            )
+        VendaArquivada.objects.bulk_create(resumos)
+        Venda.objects.filter(pk__in=ids).delete()
+    return len(vendas)
+
+
+def arquivar_vendas(dias=None, lote=5000, agora=None):
+    """
+    Move para o arquivo as vendas encerradas com mais de `dias` dias (padrão:
+    ORDERS_ARCHIVE_AFTER_DAYS), em lotes de `lote` vendas, cada um na sua
+    transação. Retorna quantas vendas foram arquivadas.
+    """
+    dias = dias_para_arquivar() if dias is None else dias
+    corte = (agora or timezone.now()) - timedelta(days=dias)
+    total = 0
+    while True:
+        arquivadas = _arquivar_lote(corte, lote)
+        total += arquivadas
+        if arquivadas < lote:
+            return total
@@ -0,0 +1,188 @@
+# orders/benchmark.py
+"""
+Utilitários compartilhados pelos comandos de benchmark (bench_*).
+Os comandos rodam contra o banco configurado no settings, criam um catálogo
+próprio com um prefixo e apagam tudo o que criaram no final.
+"""
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from stock.models import StockItem, MenuProduct
+from users.models import CustomUser
+from .models import Venda, ItemVenda
+from .resumos import mover_vendas
+
+PREFIXO_PADRAO = 'bench-'
+
+
+def semear_catalogo(n_produtos, quantidade=1_000_000, prefixo=PREFIXO_PADRAO):
+    """Cria n_produtos pares StockItem/MenuProduct com estoque suficiente para o teste."""
+    stock_items = StockItem.objects.bulk_create([
+        StockItem(name=f'{prefixo}item-{i}', quantity=quantidade, cost_price=Decimal('3.00'))
+        for i in range(n_produtos)
+    ])
+    MenuProduct.objects.bulk_create([
+        MenuProduct(stock_item=item, name=f'{prefixo}produto-{i}', sale_price=Decimal('7.50'))
+        for i, item in enumerate(stock_items)
+    ])
+    return list(MenuProduct.objects.filter(name__startswith=f'{prefixo}produto-').values_list('id', flat=True))
+
+
+def limpar_catalogo(prefixo=PREFIXO_PADRAO, venda_ids=()):
+    """
+    Apaga as vendas geradas pelo benchmark e o catálogo criado por semear_catalogo.
+    As vendas passaram pelo checkout, então saem dos resumos antes de sumir do
+    banco, como no DELETE da venda.
+    """
+    venda_ids = list(venda_ids)
+    for inicio in range(0, len(venda_ids), 1000):
+        with transaction.atomic():
+            lote = Venda.objects.select_for_update().filter(pk__in=venda_ids[inicio:inicio + 1000])
+            mover_vendas(dict(lote.order_by('pk').values_list('pk', 'status')))
+            lote.delete()
+    StockItem.objects.filter(name__startswith=f'{prefixo}item-').delete()
+
+
+def vendas_do_catalogo(prefixo=PREFIXO_PADRAO):
+    """
+    Ids das vendas com itens do catálogo de semear_catalogo, inclusive as de uma
+    rodada interrompida antes de o comando saber delas.
+    """
+    return list(
+        Venda.objects.filter(itens__nome_produto__startswith=f'{prefixo}produto-').values_list('pk', flat=True).distinct()
+    )
+
+
+def semear_clientes(n_clientes, prefixo=PREFIXO_PADRAO):
+    """Cria n_clientes alunos '<prefixo>cliente-N@bench.local' (sem senha utilizável)."""
+    CustomUser.objects.bulk_create([
+        CustomUser(email=f'{prefixo}cliente-{i}@bench.local', first_name=f'Cliente {i}', password='!')
+        for i in range(n_clientes)
+    ])
+    return list(CustomUser.objects.filter(email__startswith=f'{prefixo}cliente-', email__endswith='@bench.local').values_list('pk', flat=True))
+
+
+def semear_vendas(n_vendas, product_ids, cliente_ids, dias=365, fracao_ativas=0.01, itens_por_venda=2, lote=10_000, seed=42):
+    """
+    Grava um histórico sintético de n_vendas com bulk_create, em lotes, sem passar
+    pelo checkout (não mexe no estoque). As datas ficam espalhadas pelos últimos
+    `dias`; as vendas mais recentes (fracao_ativas) ficam em aberto no painel,
+    cerca de 4% das demais são canceladas e o resto finalizado.
+    Todas as vendas pertencem aos clientes informados, o que permite limpar depois.
+    Elas não entram nos resumos (orders/resumos.py), e limpar_vendas_semeadas
+    também não os toca.
+    """
+    rng = random.Random(seed)
+    inicio = timezone.now() - timedelta(days=dias)
+    passo = timedelta(days=dias) / max(n_vendas, 1)
+    n_ativas = int(n_vendas * fracao_ativas)
+    ativos = ['PAGO', 'EM_PREPARO', 'PRONTO', 'AGUARDANDO_PAGAMENTO']
+    pagamentos = [codigo for codigo, _ in Venda.PAYMENT_CHOICES]
+    preco = Decimal('7.50')
+    custo = Decimal('3.00')
+
+    for comeco in range(0, n_vendas, lote):
+        numeros = range(comeco, min(comeco + lote, n_vendas))
+        vendas = Venda.objects.bulk_create([
+            Venda(
+                cliente_id=rng.choice(cliente_ids),
+                status=(rng.choice(ativos) if i >= n_vendas - n_ativas
+                        else 'CANCELADO' if rng.random() < 0.04 else 'FINALIZADO'),
+                payment_method=rng.choice(pagamentos),
+                data_venda=inicio + passo * i,
+                valor_total=preco * itens_por_venda,
+            )
+            for i in numeros
+        ])
+        ItemVenda.objects.bulk_create([
+            ItemVenda(
+                venda=venda, produto_id=product_id, nome_produto=f'produto-{product_id}', quantidade=1,
+                preco_unitario=preco, custo_unitario=custo
+            )
+            for venda in vendas
+            for product_id in rng.sample(product_ids, itens_por_venda)
+        ])
+
+
+def limpar_vendas_semeadas(prefixo=PREFIXO_PADRAO):
+    """Apaga as vendas criadas por semear_vendas e os clientes de semear_clientes."""
+    clientes = CustomUser.objects.filter(email__startswith=f'{prefixo}cliente-', email__endswith='@bench.local')
+    ItemVenda.objects.filter(venda__cliente__in=clientes).delete()
+    Venda.objects.filter(cliente__in=clientes).delete()
+    clientes.delete()
+
+
+def carrinho_aleatorio(product_ids, n_itens, rng=random):
+    return [{'product_id': product_id, 'quantity': 1} for product_id in rng.sample(product_ids, n_itens)]
+
+
+def percentil(valores, p):
+    """Percentil por interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    baixo = int(posicao)
+    alto = min(baixo + 1, len(ordenados) - 1)
+    return ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (posicao - baixo)
+
+
+def resumir(latencias, duracao, erros=0):
+    """Resumo padrão dos benchmarks: throughput e latências em milissegundos."""
+    return {
+        'operacoes': len(latencias),
+        'erros': erros,
+        'duracao_s': round(duracao, 3),
+        'ops_por_segundo': round(len(latencias) / duracao, 2) if duracao else 0.0,
+        'latencia_ms': {
+            'p50': round(percentil(latencias, 50) * 1000, 2),
+            'p95': round(percentil(latencias, 95) * 1000, 2),
+            'p99': round(percentil(latencias, 99) * 1000, 2),
+            'max': round(max(latencias) * 1000, 2) if latencias else 0.0,
+        },
+    }
+
+
+def disparar_clientes(n_clientes, n_operacoes, operacao):
+    """
+    Executa `operacao(cliente, i)` n_operacoes vezes em cada uma de n_clientes threads,
+    todas liberadas ao mesmo tempo. Retorna (latencias, resultados, erros, duracao).
+    """
+    latencias = []
+    resultados = []
+    erros = []
+    lock = threading.Lock()
+    largada = threading.Barrier(n_clientes + 1)
+
+    def cliente(numero):
+        try:
+            largada.wait()
+            for i in range(n_operacoes):
+                inicio = time.perf_counter()
+                try:
+                    resultado = operacao(numero, i)
+                except Exception as e:
+                    with lock:
+                        erros.append(e)
+                    continue
+                decorrido = time.perf_counter() - inicio
+                with lock:
+                    latencias.append(decorrido)
+                    resultados.append(resultado)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=cliente, args=(n,)) for n in range(n_clientes)]
+    for t in threads:
+        t.start()
+    largada.wait()
+    inicio = time.perf_counter()
+    for t in threads:
+        t.join()
+    return latencias, resultados, erros, time.perf_counter() - inicio
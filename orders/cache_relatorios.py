@@ -0,0 +1,111 @@
+# orders/cache_relatorios.py
+"""
+Cache dos relatórios (RelatorioVendasView, ProductProfitabilityView) com
+invalidação guiada pelas gravações.
+
+Cada dia tem um contador de geração. A chave de um relatório junta o endpoint,
+o período normalizado e as gerações de todos os dias do período; gravar uma
+venda só incrementa a geração do dia dela (normalmente hoje), e as entradas que
+o cobrem deixam de ser encontradas. Períodos já fechados não têm mais escritas,
+ficam no cache sem prazo e só o dia corrente é recalculado.
+
+O backend é o alias definido em ORDERS_REPORT_CACHE_ALIAS (memória local por
+padrão; FileBasedCache ou DatabaseCache para compartilhar entre processos).
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+PREFIXO = 'relatorios'
+# Geração de "qualquer dia": usada pelos relatórios sem período definido.
+DIA_QUALQUER = '*'
+# Geração global, incrementada quando os resumos são reconstruídos.
+TUDO = 'tudo'
+
+
+def cache_relatorios():
+    return caches[getattr(settings, 'ORDERS_REPORT_CACHE_ALIAS', 'default')]
+
+
+def ttl_periodo_aberto():
+    return getattr(settings, 'ORDERS_REPORT_CACHE_TTL', timedelta(hours=1))
+
+
+def _chave_geracao(balde):
+    return f'{PREFIXO}:geracao:{balde}'
+
+
+def _geracoes(baldes):
+    """
+    Lê as gerações dos baldes. Uma geração ausente (nunca criada ou descartada
+    pelo cache) nasce com o relógio em nanossegundos, e não com zero: assim uma
+    entrada antiga, gravada com a geração anterior ao descarte, nunca volta a valer.
+    """
+    cache = cache_relatorios()
+    chaves = [_chave_geracao(balde) for balde in baldes]
+    atuais = cache.get_many(chaves)
+    faltando = [chave for chave in chaves if chave not in atuais]
+    if faltando:
+        base = time.time_ns()
+        for chave in faltando:
+            # add() não sobrescreve: se uma escrita criou a geração no meio, vale a dela.
+            cache.add(chave, base, timeout=None)
+        atuais.update(cache.get_many(faltando))
+    return [atuais.get(chave, 0) for chave in chaves]
+
+
+def _incrementar(baldes):
+    cache = cache_relatorios()
+    for balde in baldes:
+        chave = _chave_geracao(balde)
+        try:
+            cache.incr(chave)
+        except ValueError:
+            # Sem geração no cache: começa uma nova, maior que qualquer anterior.
+            cache.set(chave, time.time_ns(), timeout=None)
+
+
+def invalidar_dias(dias):
+    """
+    Invalida os relatórios que cobrem `dias` (datas locais). O incremento só
+    acontece depois do commit: antes disso, um leitor poderia recalcular com os
+    dados antigos e guardá-los sob a geração nova.
+    """
+    baldes = sorted({dia.isoformat() for dia in dias})
+    if baldes:
+        transaction.on_commit(lambda: _incrementar([*baldes, DIA_QUALQUER]))
+
+
+def invalidar_tudo():
+    transaction.on_commit(lambda: _incrementar([TUDO]))
+
+
+def _dias(inicio, fim):
+    return [inicio + timedelta(days=n) for n in range((fim - inicio).days + 1)]
+
+
+def relatorio_em_cache(endpoint, inicio, fim, calcular):
+    """
+    Devolve o relatório de `endpoint` para os dias [inicio, fim] (datas; None e
+    None = sem período), chamando `calcular()` só quando não há entrada válida.
+    """
+    if inicio is None or fim is None:
+        baldes = [TUDO, DIA_QUALQUER]
+    else:
+        baldes = [TUDO, *(dia.isoformat() for dia in _dias(inicio, fim))]
+    assinatura = hashlib.sha1(repr(_geracoes(baldes)).encode()).hexdigest()
+    chave = f'{PREFIXO}:{endpoint}:{inicio}:{fim}:{assinatura}'
+
+    cache = cache_relatorios()
+    resultado = cache.get(chave)
+    if resultado is None:
+        resultado = calcular()
+        # Período fechado: nada mais muda nele sem incrementar a geração, então não expira.
+        fechado = fim is not None and fim < timezone.localdate()
+        cache.set(chave, resultado, timeout=None if fechado else ttl_periodo_aberto().total_seconds())
+    return resultado
@@ -0,0 +1,147 @@
+# orders/eventos.py
+"""
+Hub de eventos em memória para o painel da cozinha (Server-Sent Events).
+
+As gravações de pedidos publicam aqui, depois do commit, os deltas
+"pedido_criado" e "status_alterado". Cada evento é serializado uma única vez
+e o mesmo texto é entregue a todas as telas conectadas.
+
+O hub é por processo: para que todas as telas recebam todos os eventos, o
+stream e as gravações de pedidos precisam ser servidos pelo mesmo processo ASGI
+(veja ASGI_APPLICATION em settings.py).
+
+O EventSource do navegador não envia headers, então o stream não recebe o JWT:
+a tela pede antes um ingresso (POST autenticado) e abre o stream com
+?ticket=<ingresso>. O ingresso vale por poucos segundos e uma única vez, e o que
+fica nos logs de acesso não serve para mais nada.
+"""
+import asyncio
+import json
+import secrets
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Venda
+
+STATUS_DISPLAY = dict(Venda.STATUS_CHOICES)
+PREFIXO_INGRESSO = 'stream:ingresso'
+
+
+def formatar_evento(tipo, dados):
+    """Monta uma mensagem no formato text/event-stream."""
+    return f"event: {tipo}\ndata: {json.dumps(dados, cls=JSONEncoder, ensure_ascii=False)}\n\n"
+
+
+class HubPedidos:
+    """
+    Distribui mensagens para as filas asyncio dos streams abertos.
+    publicar() pode ser chamado de qualquer thread (views síncronas, committer em lote).
+    """
+
+    def __init__(self, tamanho_fila=200):
+        self.tamanho_fila = tamanho_fila
+        self._inscritos = {}
+        self._lock = threading.Lock()
+
+    def inscrever(self):
+        """Cria a fila de um novo stream. Deve ser chamado dentro do event loop do stream."""
+        fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._inscritos[fila] = asyncio.get_running_loop()
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._inscritos.pop(fila, None)
+
+    def tem_inscritos(self):
+        return bool(self._inscritos)
+
+    def publicar(self, tipo, dados):
+        if not self._inscritos:
+            return
+        mensagem = formatar_evento(tipo, dados)
+        with self._lock:
+            inscritos = list(self._inscritos.items())
+        for fila, loop in inscritos:
+            try:
+                loop.call_soon_threadsafe(self._entregar, fila, mensagem)
+            except RuntimeError:
+                # O event loop do stream já foi encerrado.
+                self.cancelar(fila)
+
+    @staticmethod
+    def _entregar(fila, mensagem):
+        try:
+            fila.put_nowait(mensagem)
+        except asyncio.QueueFull:
+            # Tela lenta demais: descarta o atraso e pede que ela recarregue o painel.
+            while not fila.empty():
+                fila.get_nowait()
+            fila.put_nowait(formatar_evento('resync', {}))
+
+
+hub = HubPedidos()
+
+
+def _publicar_criadas(venda_ids):
+    if not hub.tem_inscritos():
+        return
+    from .serializers import VendaOutputSerializer, vendas_para_saida
+
+    vendas = vendas_para_saida(Venda.objects.filter(pk__in=venda_ids).order_by('data_venda'))
+    for dados in VendaOutputSerializer(vendas, many=True).data:
+        hub.publicar('pedido_criado', dados)
+
+
+def _publicar_status(venda_ids, status):
+    for venda_id in venda_ids:
+        hub.publicar('status_alterado', {'id': venda_id, 'status': status, 'status_display': STATUS_DISPLAY[status]})
+
+
+def publicar_vendas_criadas(venda_ids):
+    """Agenda, para depois do commit, o evento das vendas criadas (uma leitura para todas as telas)."""
+    venda_ids = list(venda_ids)
+    if venda_ids:
+        transaction.on_commit(lambda: _publicar_criadas(venda_ids))
+
+
+def publicar_mudanca_status(venda_ids, status):
+    """Agenda, para depois do commit, o evento de mudança de status. Não consulta o banco."""
+    venda_ids = list(venda_ids)
+    if venda_ids:
+        transaction.on_commit(lambda: _publicar_status(venda_ids, status))
+
+
+def publicar_remocao(venda_id):
+    """Agenda, para depois do commit, o aviso de que um pedido foi apagado."""
+    transaction.on_commit(lambda: hub.publicar('pedido_removido', {'id': venda_id}))
+
+
+def _cache_ingressos():
+    return caches[getattr(settings, 'ORDERS_STREAM_TICKET_CACHE_ALIAS', 'default')]
+
+
+def emitir_ingresso(usuario):
+    """Ingresso de uso único para abrir o stream em nome de `usuario`. Retorna (ingresso, validade em segundos)."""
+    validade = getattr(settings, 'ORDERS_STREAM_TICKET_TTL', 30)
+    ingresso = secrets.token_urlsafe(32)
+    _cache_ingressos().set(f'{PREFIXO_INGRESSO}:{ingresso}', usuario.pk, validade)
+    return ingresso, validade
+
+
+def resgatar_ingresso(ingresso):
+    """
+    Consome o ingresso e retorna o pk do usuário, ou None se ele não existe, já
+    expirou ou já foi usado. Só quem consegue apagar a chave leva o ingresso.
+    """
+    cache = _cache_ingressos()
+    chave = f'{PREFIXO_INGRESSO}:{ingresso}'
+    usuario_id = cache.get(chave)
+    if usuario_id is None or not cache.delete(chave):
+        return None
+    return usuario_id
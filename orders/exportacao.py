@@ -0,0 +1,94 @@
+# orders/exportacao.py
+"""
+Exportação completa de vendas e itens (para a contabilidade) em CSV ou NDJSON.
+
+Uma linha por ItemVenda, com as colunas da venda repetidas. A consulta é uma
+projeção values() lida com .iterator(chunk_size): no Postgres vira um cursor do
+lado do servidor, e cada bloco é formatado e entregue antes do próximo ser
+buscado. A memória usada não depende do tamanho do período exportado. Os
+geradores são síncronos; no ASGI a view os entrega por iterar_async
+(lanchonete_backend_python/streaming.py), um bloco por vez.
+Vendas já arquivadas (orders/arquivo.py) saem antes, lidas das colunas do mês.
+"""
+import csv
+from itertools import chain
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import arquivo
+from .models import ItemVenda
+from .resumos import limites_do_periodo
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+TAMANHO_DO_BLOCO = 2000
+
+# (nome da coluna na exportação, caminho no ItemVenda)
+COLUNAS = [
+    ('venda_id', 'venda_id'),
+    ('data_venda', 'venda__data_venda'),
+    ('status', 'venda__status'),
+    ('payment_method', 'venda__payment_method'),
+    ('valor_total', 'venda__valor_total'),
+    ('cliente_id', 'venda__cliente_id'),
+    ('item_id', 'id'),
+    ('produto_id', 'produto_id'),
+    ('nome_produto', 'nome_produto'),
+    ('quantidade', 'quantidade'),
+    ('preco_unitario', 'preco_unitario'),
+    ('custo_unitario', 'custo_unitario'),
+]
+
+
+def itens_do_periodo(inicio, fim):
+    """
+    Tuplas na ordem de COLUNAS para os dias locais [inicio, fim]: primeiro os itens
+    arquivados, depois os vivos, cada parte em ordem de venda.
+    """
+    de, ate = limites_do_periodo(inicio, fim)
+    vivas = ItemVenda.objects.filter(
+        venda__data_venda__gte=de, venda__data_venda__lt=ate
+    ).order_by('venda__data_venda', 'venda_id', 'id').values_list(
+        *(caminho for _, caminho in COLUNAS)
+    ).iterator(chunk_size=TAMANHO_DO_BLOCO)
+    return chain(arquivo.linhas_arquivadas(de, ate, bloco=TAMANHO_DO_BLOCO), vivas)
+
+
+def _blocos(linhas):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == TAMANHO_DO_BLOCO:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+class _Eco:
+    """Arquivo falso para o csv.writer: write() devolve o texto em vez de gravar."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([nome for nome, _ in COLUNAS])
+    for bloco in _blocos(linhas):
+        yield ''.join(escritor.writerow(linha) for linha in bloco)
+
+
+def gerar_ndjson(linhas):
+    nomes = [nome for nome, _ in COLUNAS]
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for bloco in _blocos(linhas):
+        yield ''.join(codificador.encode(dict(zip(nomes, linha))) + '\n' for linha in bloco)
+
+
+def exportar(inicio, fim, formato):
+    """Gerador de pedaços de texto da exportação de [inicio, fim] no `formato` pedido."""
+    linhas = itens_do_periodo(inicio, fim)
+    return gerar_csv(linhas) if formato == 'csv' else gerar_ndjson(linhas)
@@ -0,0 +1,102 @@
+# orders/fila_pedidos.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .services import registrar_vendas_em_lote
+
+
+class FilaDePedidos:
+    """
+    Entrada de pedidos em lote (group commit) para os picos de movimento.
+
+    As requisições colocam carrinhos já validados na fila e esperam um Future.
+    Uma thread "committer" drena a fila em micro-lotes (até `tamanho_lote`
+    pedidos ou `espera_maxima` segundos) e grava cada lote com
+    registrar_vendas_em_lote, ou seja, em uma única transação.
+    """
+
+    def __init__(self, tamanho_lote=50, espera_maxima=0.005):
+        self.tamanho_lote = tamanho_lote
+        self.espera_maxima = espera_maxima
+        self._fila = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submeter(self, carrinho, payment_method, cliente=None):
+        """Enfileira um pedido e retorna o Future com a Venda (ou o CheckoutError)."""
+        self._garantir_thread()
+        futuro = Future()
+        self._fila.put(({'carrinho': carrinho, 'payment_method': payment_method, 'cliente': cliente}, futuro))
+        return futuro
+
+    def _garantir_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, name='orders-group-commit', daemon=True)
+                self._thread.start()
+
+    def _proximo_lote(self):
+        # Bloqueia até o primeiro pedido e depois junta o que chegar dentro da janela.
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.espera_maxima
+        while len(lote) < self.tamanho_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _executar(self):
+        while True:
+            lote = self._proximo_lote()
+            # Só processa pedidos cujo cliente ainda está esperando.
+            lote = [(pedido, futuro) for pedido, futuro in lote if futuro.set_running_or_notify_cancel()]
+            if lote:
+                self.processar_lote(lote)
+
+    def processar_lote(self, lote):
+        close_old_connections()
+        try:
+            resultados = registrar_vendas_em_lote([pedido for pedido, futuro in lote])
+        except Exception as e:
+            # Erro inesperado (ex.: banco fora do ar): todos os pedidos do lote falham.
+            for pedido, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        for (pedido, futuro), resultado in zip(lote, resultados):
+            if isinstance(resultado, Exception):
+                futuro.set_exception(resultado)
+            else:
+                futuro.set_result(resultado)
+
+
+_fila = None
+_fila_lock = threading.Lock()
+
+
+def entrada_em_lote_ativa():
+    return getattr(settings, 'ORDERS_INTAKE_MODE', 'direto') == 'lote'
+
+
+def fila_de_pedidos():
+    """Fila única por processo, criada sob demanda com as configurações do settings."""
+    global _fila
+    if _fila is None:
+        with _fila_lock:
+            if _fila is None:
+                _fila = FilaDePedidos(
+                    tamanho_lote=getattr(settings, 'ORDERS_INTAKE_BATCH_SIZE', 50),
+                    espera_maxima=getattr(settings, 'ORDERS_INTAKE_MAX_WAIT', 0.005),
+                )
+    return _fila
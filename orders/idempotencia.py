@@ -0,0 +1,137 @@
+# orders/idempotencia.py
+"""
+Idempotency-Key das vendas. A chave vale dentro de um escopo (o usuário logado
+ou, na venda anônima do PDV, o IP do cliente): a mesma chave enviada por outro
+cliente é outra chave, e ninguém recebe a resposta de um pedido alheio. Junto
+com a resposta fica o hash do corpo do pedido; a mesma chave com outro corpo
+é um erro do cliente (ConflitoIdempotencia, 422), não um reenvio.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChaveIdempotencia
+
+HEADER_IDEMPOTENCIA = 'Idempotency-Key'
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+class ConflitoIdempotencia(Exception):
+    """A chave já foi usada, no mesmo escopo, com outro corpo de pedido."""
+
+
+class CacheRespostas:
+    """
+    Caminho rápido em memória (por processo) para as chaves usadas recentemente.
+    LRU limitado em tamanho; cada entrada respeita a mesma expiração da tabela.
+    """
+
+    def __init__(self, max_itens=2048):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        """(status_code, resposta, hash do corpo) de `chave` ((escopo, chave)), ou None."""
+        with self._lock:
+            entrada = self._itens.get(chave)
+            if entrada is None:
+                return None
+            if entrada[2] <= timezone.now():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return entrada[0], entrada[1], entrada[3]
+
+    def set(self, chave, status_code, resposta, expira_em, hash_corpo):
+        with self._lock:
+            self._itens[chave] = (status_code, resposta, expira_em, hash_corpo)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+
+cache_respostas = CacheRespostas()
+
+
+def ttl_idempotencia():
+    return getattr(settings, 'ORDERS_IDEMPOTENCY_TTL', timedelta(hours=24))
+
+
+def escopo_da_requisicao(request):
+    """Dono das chaves da requisição: o usuário logado ou, sem login, o IP do cliente."""
+    if request.user.is_authenticated:
+        return f'usuario:{request.user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def hash_do_corpo(dados):
+    """SHA-256 do corpo do pedido já decodificado, com as chaves em ordem."""
+    corpo = json.dumps(dados, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(corpo.encode()).hexdigest()
+
+
+def _conferir(encontrada, hash_corpo):
+    status_code, resposta, hash_salvo = encontrada
+    if hash_salvo != hash_corpo:
+        raise ConflitoIdempotencia()
+    return status_code, resposta
+
+
+def buscar_resposta(escopo, chave, hash_corpo):
+    """
+    Retorna (status_code, resposta) de uma chave já usada no escopo, ou None.
+    Levanta ConflitoIdempotencia se ela foi usada com outro corpo.
+    Consulta primeiro o cache do processo e depois o índice único da tabela.
+    Registros expirados encontrados aqui são removidos na hora.
+    """
+    encontrada = cache_respostas.get((escopo, chave))
+    if encontrada is not None:
+        return _conferir(encontrada, hash_corpo)
+
+    registro = ChaveIdempotencia.objects.filter(escopo=escopo, chave=chave).only(
+        'status_code', 'resposta', 'hash_corpo', 'expira_em'
+    ).first()
+    if registro is None:
+        return None
+    if registro.expira_em <= timezone.now():
+        registro.delete()
+        return None
+
+    cache_respostas.set(
+        (escopo, chave), registro.status_code, registro.resposta, registro.expira_em, registro.hash_corpo
+    )
+    return _conferir((registro.status_code, registro.resposta, registro.hash_corpo), hash_corpo)
+
+
+def salvar_resposta(escopo, chave, hash_corpo, venda, status_code, resposta):
+    """
+    Grava a resposta da venda para a chave do escopo. Deve rodar na mesma
+    transação que criou a venda: se outra requisição com a mesma chave ganhou a
+    corrida, o IntegrityError do índice único desfaz esta venda inteira.
+    """
+    expira_em = timezone.now() + ttl_idempotencia()
+    ChaveIdempotencia.objects.create(
+        escopo=escopo, chave=chave, hash_corpo=hash_corpo, venda=venda,
+        status_code=status_code, resposta=resposta, expira_em=expira_em
+    )
+    # O cache só é preenchido depois do commit, para nunca servir uma venda desfeita.
+    transaction.on_commit(
+        lambda: cache_respostas.set((escopo, chave), status_code, resposta, expira_em, hash_corpo)
+    )
+
+
+def purgar_expiradas():
+    """Remove em lote todas as chaves expiradas. Retorna quantas foram apagadas."""
+    apagadas, _ = ChaveIdempotencia.objects.filter(expira_em__lte=timezone.now()).delete()
+    return apagadas
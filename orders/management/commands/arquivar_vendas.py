@@ -0,0 +1,28 @@
+# orders/management/commands/arquivar_vendas.py
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.arquivo import arquivar_vendas, dias_para_arquivar
+
+
+class Command(BaseCommand):
+    help = (
+        "Move as vendas finalizadas e canceladas antigas para o arquivo colunar por mês "
+        "(ORDERS_ARCHIVE_DIR), deixando só um resumo por venda no banco. Os relatórios continuam "
+        "incluindo as vendas arquivadas. Pensado para rodar periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int,
+            help="Arquiva as vendas com mais de N dias. Padrão: ORDERS_ARCHIVE_AFTER_DAYS.",
+        )
+        parser.add_argument('--lote', type=int, default=5000, help="Vendas por transação.")
+
+    def handle(self, *args, **options):
+        dias = dias_para_arquivar() if options['dias'] is None else options['dias']
+        if dias < 0:
+            raise CommandError("--dias não pode ser negativo.")
+        if options['lote'] < 1:
+            raise CommandError("--lote precisa ser positivo.")
+        arquivadas = arquivar_vendas(dias, options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{arquivadas} venda(s) arquivada(s)."))
@@ -0,0 +1,137 @@
+# orders/management/commands/bench_ciclo_pedidos.py
+import json
+import random
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from orders.benchmark import semear_catalogo, limpar_catalogo, carrinho_aleatorio, resumir
+from orders.models import Venda
+from users.models import CustomUser
+
+PREFIXO_USUARIOS = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do ciclo completo de um pedido: checkout (CriarVendaView), confirmação de "
+        "pagamento (ConfirmarPagamentoView), avanço de status pela cozinha (VendaDetailView) e "
+        "leitura do painel de pedidos ativos (PedidoAtivoListView), com vários clientes simultâneos. "
+        "Reporta pedidos/s, latências p50/p95/p99 e queries por requisição de cada endpoint em JSON, "
+        "para comparar versões. Rode contra um banco local de testes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=8, help="Clientes simultâneos.")
+        parser.add_argument('--ciclos', type=int, default=25, help="Pedidos completos por cliente.")
+        parser.add_argument('--produtos', type=int, default=40, help="Tamanho do catálogo semeado.")
+        parser.add_argument('--itens', type=int, default=3, help="Itens por carrinho.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (além da saída padrão).")
+
+    def handle(self, *args, **options):
+        if options['clientes'] > 1 and connection.vendor == 'sqlite':
+            # O SQLite aceita um escritor por vez: os outros clientes esperam a trava
+            # e falham com "database is locked", e o resultado não mede o código.
+            raise CommandError("Com SQLite use --clientes 1; para medir concorrência rode contra o PostgreSQL.")
+
+        medicoes = {}
+        erros = []
+        lock = threading.Lock()
+        largada = threading.Barrier(options['clientes'] + 1)
+
+        def medir(endpoint, requisicao, status_esperado):
+            with CaptureQueriesContext(connection) as queries:
+                inicio = time.perf_counter()
+                response = requisicao()
+                decorrido = time.perf_counter() - inicio
+            if response.status_code != status_esperado:
+                raise RuntimeError(f"{endpoint}: HTTP {response.status_code} {response.content[:200]!r}")
+            with lock:
+                medicoes.setdefault(endpoint, []).append((decorrido, len(queries)))
+            return response
+
+        def cliente(numero):
+            rng = random.Random(options['seed'] + numero)
+            client_aluno = APIClient()
+            client_aluno.force_authenticate(alunos[numero])
+            client_equipe = APIClient()
+            client_equipe.force_authenticate(equipe)
+            try:
+                largada.wait()
+                for _ in range(options['ciclos']):
+                    try:
+                        venda = medir('checkout', lambda: client_aluno.post(reverse('create-sale'), {
+                            'payment_method': 'ONLINE',
+                            'items': carrinho_aleatorio(product_ids, options['itens'], rng),
+                        }, format='json'), 201).data
+                        medir('confirmar_pagamento', lambda: client_aluno.post(
+                            reverse('confirm-payment', args=[venda['id']])), 200)
+                        medir('painel_ativos', lambda: client_equipe.get(reverse('active-sales-list')), 200)
+                        for novo_status in ('EM_PREPARO', 'PRONTO', 'FINALIZADO'):
+                            medir('atualizar_status', lambda: client_equipe.patch(
+                                reverse('sale-detail', args=[venda['id']]), {'status': novo_status}, format='json'), 200)
+                    except Exception as e:
+                        with lock:
+                            erros.append(e)
+            finally:
+                connection.close()
+
+        try:
+            product_ids = semear_catalogo(options['produtos'])
+            equipe = CustomUser.objects.create_user(
+                email=f'{PREFIXO_USUARIOS}cozinha@bench.local', first_name='Cozinha', role='equipe'
+            )
+            alunos = [
+                CustomUser.objects.create_user(email=f'{PREFIXO_USUARIOS}aluno-{i}@bench.local', first_name=f'Aluno {i}')
+                for i in range(options['clientes'])
+            ]
+
+            # O test client usa o host 'testserver'.
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                threads = [threading.Thread(target=cliente, args=(n,)) for n in range(options['clientes'])]
+                for t in threads:
+                    t.start()
+                largada.wait()
+                inicio = time.perf_counter()
+                for t in threads:
+                    t.join()
+                duracao = time.perf_counter() - inicio
+        finally:
+            # As vendas são buscadas pelos usuários do benchmark, e não pelas respostas:
+            # um checkout que gravou e depois falhou também precisa sair.
+            usuarios = CustomUser.objects.filter(email__startswith=PREFIXO_USUARIOS, email__endswith='@bench.local')
+            try:
+                limpar_catalogo(venda_ids=Venda.objects.filter(cliente__in=usuarios).values_list('pk', flat=True))
+            finally:
+                usuarios.delete()
+
+        ciclos_completos = len(medicoes.get('atualizar_status', [])) // 3
+        relatorio = {
+            'parametros': {k: options[k] for k in ('clientes', 'ciclos', 'produtos', 'itens', 'seed')},
+            'duracao_s': round(duracao, 3),
+            'pedidos_por_segundo': round(ciclos_completos / duracao, 2) if duracao else 0.0,
+            'erros': len(erros),
+            'endpoints': {},
+        }
+        if erros:
+            relatorio['primeiro_erro'] = repr(erros[0])
+        for endpoint, valores in medicoes.items():
+            latencias = [latencia for latencia, _ in valores]
+            queries = [n for _, n in valores]
+            relatorio['endpoints'][endpoint] = resumir(latencias, duracao)
+            relatorio['endpoints'][endpoint]['queries_por_requisicao'] = {
+                'media': round(sum(queries) / len(queries), 2),
+                'max': max(queries),
+            }
+
+        saida = json.dumps(relatorio, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(saida)
+        self.stdout.write(saida)
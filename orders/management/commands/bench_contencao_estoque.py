@@ -0,0 +1,60 @@
+# orders/management/commands/bench_contencao_estoque.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from orders.benchmark import semear_catalogo, limpar_catalogo, vendas_do_catalogo, disparar_clientes, resumir
+from orders.services import registrar_venda
+from stock.models import MenuProduct, StockItem
+from stock.services import fold_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a disputa por um único item de estoque muito vendido: muitas threads vendendo o mesmo "
+        "produto no modo normal (uma linha) e no modo de contadores fragmentados. Imprime JSON. "
+        "Use um Postgres local de testes: no SQLite todas as escritas são serializadas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=32, help="Threads vendendo ao mesmo tempo.")
+        parser.add_argument('--vendas', type=int, default=100, help="Vendas por thread.")
+        parser.add_argument('--shards', type=int, default=8, help="Sub-contadores no modo fragmentado.")
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (além da saída padrão).")
+
+    def handle(self, *args, **options):
+        if options['clientes'] > 1 and connection.vendor == 'sqlite':
+            # Como em bench_ciclo_pedidos: no SQLite os outros clientes só medem "database is locked".
+            raise CommandError("Com SQLite use --clientes 1; para medir a disputa rode contra o PostgreSQL.")
+
+        total_vendas = options['clientes'] * options['vendas']
+        relatorio = {'parametros': {k: options[k] for k in ('clientes', 'vendas', 'shards')}}
+
+        for modo, shards in (('linha_unica', 0), ('fragmentado', options['shards'])):
+            try:
+                product_id = semear_catalogo(1, quantidade=total_vendas * 2)[0]
+                stock_item_id = MenuProduct.objects.get(pk=product_id).stock_item_id
+                StockItem.objects.filter(pk=stock_item_id).update(counter_shards=shards)
+                fold_shards([stock_item_id])
+
+                carrinho = [{'product_id': product_id, 'quantity': 1}]
+                latencias, resultados, erros, duracao = disparar_clientes(
+                    options['clientes'], options['vendas'], lambda cliente, i: registrar_venda(carrinho, 'DINHEIRO').pk
+                )
+
+                fold_shards([stock_item_id])
+                restante = StockItem.objects.get(pk=stock_item_id).quantity
+                relatorio[modo] = resumir(latencias, duracao, len(erros))
+                relatorio[modo]['estoque_consistente'] = restante == total_vendas * 2 - len(resultados)
+                if erros:
+                    relatorio[modo]['primeiro_erro'] = repr(erros[0])
+            finally:
+                # Pelo catálogo, e não pelos resultados: uma rodada interrompida também sai do banco e dos resumos.
+                limpar_catalogo(venda_ids=vendas_do_catalogo())
+
+        saida = json.dumps(relatorio, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(saida)
+        self.stdout.write(saida)
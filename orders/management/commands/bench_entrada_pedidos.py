@@ -0,0 +1,57 @@
+# orders/management/commands/bench_entrada_pedidos.py
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from orders.benchmark import semear_catalogo, limpar_catalogo, carrinho_aleatorio, disparar_clientes, resumir
+from orders.fila_pedidos import FilaDePedidos
+from orders.services import registrar_venda
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara a entrada de pedidos direta (uma transação por pedido) com o modo em lote "
+        "(group commit). Mede pedidos/s e latências p50/p95/p99 e imprime o resultado em JSON. "
+        "Use um banco local de testes (Postgres de preferência: o SQLite serializa todas as escritas)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=16, help="Requisições simultâneas.")
+        parser.add_argument('--pedidos', type=int, default=50, help="Pedidos por cliente.")
+        parser.add_argument('--produtos', type=int, default=20, help="Tamanho do catálogo semeado.")
+        parser.add_argument('--itens', type=int, default=3, help="Itens por carrinho.")
+        parser.add_argument('--lote', type=int, default=50, help="Tamanho máximo do micro-lote.")
+        parser.add_argument('--espera', type=float, default=0.005, help="Janela do micro-lote, em segundos.")
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (além da saída padrão).")
+
+    def handle(self, *args, **options):
+        product_ids = semear_catalogo(options['produtos'])
+        venda_ids = []
+        try:
+            rng = random.Random(42)
+            carrinhos = [carrinho_aleatorio(product_ids, options['itens'], rng) for _ in range(options['pedidos'])]
+
+            def direto(cliente, i):
+                return registrar_venda(carrinhos[i], 'DINHEIRO').pk
+
+            fila = FilaDePedidos(tamanho_lote=options['lote'], espera_maxima=options['espera'])
+
+            def em_lote(cliente, i):
+                return fila.submeter(carrinhos[i], 'DINHEIRO').result().pk
+
+            relatorio = {'parametros': {k: options[k] for k in ('clientes', 'pedidos', 'produtos', 'itens', 'lote', 'espera')}}
+            for nome, operacao in (('direto', direto), ('lote', em_lote)):
+                latencias, resultados, erros, duracao = disparar_clientes(options['clientes'], options['pedidos'], operacao)
+                venda_ids.extend(resultados)
+                relatorio[nome] = resumir(latencias, duracao, len(erros))
+                if erros:
+                    relatorio[nome]['primeiro_erro'] = repr(erros[0])
+        finally:
+            limpar_catalogo(venda_ids=venda_ids)
+
+        saida = json.dumps(relatorio, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(saida)
+        self.stdout.write(saida)
@@ -0,0 +1,106 @@
+# orders/management/commands/bench_filtro_datas.py
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from orders.benchmark import semear_catalogo, limpar_catalogo, semear_clientes, semear_vendas, limpar_vendas_semeadas
+from orders.models import Venda, ItemVenda
+from orders.resumos import limites_do_periodo
+
+INDICE = 'venda_data_idx'
+
+
+class Command(BaseCommand):
+    help = (
+        "Semeia um histórico grande de vendas e compara o filtro por período com cast "
+        "(data_venda__date__range) e com intervalo semiaberto na coluna (data_venda >= de AND < ate), "
+        "imprimindo tempos, planos (EXPLAIN) e se o índice venda_data_idx foi usado, em JSON. "
+        "Rode contra um Postgres local de testes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendas', type=int, default=1_000_000, help="Vendas semeadas.")
+        parser.add_argument('--clientes', type=int, default=2_000, help="Clientes entre os quais as vendas são divididas.")
+        parser.add_argument('--produtos', type=int, default=60, help="Tamanho do catálogo semeado.")
+        parser.add_argument('--dias', type=int, default=365, help="Período coberto pelo histórico.")
+        parser.add_argument('--periodo', type=int, default=7, help="Dias consultados (os mais recentes).")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Execuções de cada consulta (vale a mediana).")
+        parser.add_argument('--analyze', action='store_true', help="Usa EXPLAIN ANALYZE (Postgres).")
+        parser.add_argument('--manter', action='store_true', help="Não apaga os dados semeados no final.")
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (além da saída padrão).")
+
+    def handle(self, *args, **options):
+        product_ids = semear_catalogo(options['produtos'])
+        cliente_ids = semear_clientes(options['clientes'])
+        try:
+            inicio = time.perf_counter()
+            semear_vendas(options['vendas'], product_ids, cliente_ids, dias=options['dias'])
+            semeadura = time.perf_counter() - inicio
+            with connection.cursor() as cursor:
+                for modelo in (Venda, ItemVenda):
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}')
+
+            relatorio = {
+                'parametros': {k: options[k] for k in ('vendas', 'clientes', 'produtos', 'dias', 'periodo', 'repeticoes')},
+                'banco': connection.vendor,
+                'fuso': timezone.get_current_timezone_name(),
+                'semeadura_s': round(semeadura, 2),
+            }
+            for nome, consultas in self._consultas(options['periodo']).items():
+                relatorio[nome] = self._medir(consultas, options)
+        finally:
+            if not options['manter']:
+                limpar_vendas_semeadas()
+                limpar_catalogo()
+
+        saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(saida)
+        self.stdout.write(saida)
+
+    def _consultas(self, periodo):
+        fim = timezone.localdate()
+        inicio = fim - timedelta(days=periodo - 1)
+        de, ate = limites_do_periodo(inicio, fim)
+        filtros = {
+            'com_cast': {'data_venda__date__range': [inicio, fim]},
+            'semiaberto': {'data_venda__gte': de, 'data_venda__lt': ate},
+        }
+        # As duas formas de cada consulta: vendas do período e a lucratividade (ProductProfitabilityView).
+        return {
+            nome: {
+                'vendas_do_periodo': Venda.objects.filter(**filtro).order_by().values('payment_method')
+                .annotate(total=Sum('valor_total')),
+                'lucratividade': ItemVenda.objects.filter(
+                    venda__in=Venda.objects.filter(**filtro, status__in=['PAGO', 'FINALIZADO'])
+                ).values('nome_produto').annotate(
+                    receita=Sum(F('quantidade') * F('preco_unitario')), custo=Sum(F('quantidade') * F('custo_unitario'))
+                ).order_by('-receita'),
+            }
+            for nome, filtro in filtros.items()
+        }
+
+    def _medir(self, consultas, options):
+        resultado = {}
+        for nome, queryset in consultas.items():
+            tempos = []
+            for _ in range(options['repeticoes']):
+                inicio = time.perf_counter()
+                linhas = len(list(queryset.all()))
+                tempos.append(time.perf_counter() - inicio)
+            explain = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+            plano = queryset.explain(**explain)
+            resultado[nome] = {
+                'linhas': linhas,
+                'mediana_ms': round(statistics.median(tempos) * 1000, 2),
+                'usa_indice': INDICE in plano,
+                'plano': plano.splitlines(),
+            }
+        return resultado
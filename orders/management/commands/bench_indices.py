@@ -0,0 +1,120 @@
+# orders/management/commands/bench_indices.py
+import json
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from orders.benchmark import semear_catalogo, limpar_catalogo, semear_clientes, semear_vendas, limpar_vendas_semeadas
+from orders.models import Venda, ItemVenda
+
+# Índices criados em orders/migrations/0009_indices_consultas_quentes.py e 0012_itemvenda_custo_unitario.py
+INDICES = {
+    Venda: ['venda_ativa_data_idx', 'venda_cliente_data_idx'],
+    ItemVenda: ['itemvenda_venda_produto_idx', 'itemvenda_lucro_cobertura_idx'],
+}
+
+
+def _indices_do_modelo(modelo, nomes):
+    return [indice for indice in modelo._meta.indexes if indice.name in nomes]
+
+
+class Command(BaseCommand):
+    help = (
+        "Semeia um histórico grande de vendas (padrão: 1 milhão) e mede as consultas quentes "
+        "(painel de pedidos ativos, pedidos de um cliente, produtos vendidos no período, lucratividade) "
+        "sem e com os índices das migrações 0009 e 0012, imprimindo tempos e planos (EXPLAIN) em JSON. "
+        "Rode contra um Postgres local de testes: os índices são removidos e recriados durante a medição."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vendas', type=int, default=1_000_000, help="Vendas semeadas.")
+        parser.add_argument('--clientes', type=int, default=2_000, help="Clientes entre os quais as vendas são divididas.")
+        parser.add_argument('--produtos', type=int, default=60, help="Tamanho do catálogo semeado.")
+        parser.add_argument('--dias', type=int, default=365, help="Período coberto pelo histórico.")
+        parser.add_argument('--repeticoes', type=int, default=5, help="Execuções de cada consulta (vale a mediana).")
+        parser.add_argument('--analyze', action='store_true', help="Usa EXPLAIN ANALYZE (Postgres).")
+        parser.add_argument('--manter', action='store_true', help="Não apaga os dados semeados no final.")
+        parser.add_argument('--saida', help="Arquivo onde gravar o JSON (além da saída padrão).")
+
+    def handle(self, *args, **options):
+        product_ids = semear_catalogo(options['produtos'])
+        cliente_ids = semear_clientes(options['clientes'])
+        try:
+            inicio = time.perf_counter()
+            semear_vendas(options['vendas'], product_ids, cliente_ids, dias=options['dias'])
+            semeadura = time.perf_counter() - inicio
+            self._atualizar_estatisticas()
+
+            consultas = self._consultas(cliente_ids[0])
+            relatorio = {
+                'parametros': {k: options[k] for k in ('vendas', 'clientes', 'produtos', 'dias', 'repeticoes')},
+                'banco': connection.vendor,
+                'semeadura_s': round(semeadura, 2),
+            }
+            self._alterar_indices(remover=True)
+            try:
+                relatorio['sem_indices'] = self._medir(consultas, options)
+            finally:
+                self._alterar_indices(remover=False)
+            self._atualizar_estatisticas()
+            relatorio['com_indices'] = self._medir(consultas, options)
+        finally:
+            if not options['manter']:
+                limpar_vendas_semeadas()
+                limpar_catalogo()
+
+        saida = json.dumps(relatorio, indent=2, ensure_ascii=False)
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                arquivo.write(saida)
+        self.stdout.write(saida)
+
+    def _consultas(self, cliente_id):
+        # As mesmas consultas das views (PedidoAtivoListView, UserOrderListView, relatórios).
+        periodo = Venda.objects.filter(
+            data_venda__gte=timezone.now() - timedelta(days=30), status__in=['PAGO', 'EM_PREPARO', 'PRONTO', 'FINALIZADO']
+        )
+        return {
+            'painel_ativos': Venda.objects.exclude(status__in=Venda.STATUS_ENCERRADOS).order_by('data_venda'),
+            'pedidos_do_cliente': Venda.objects.filter(cliente_id=cliente_id).order_by('-data_venda')[:50],
+            'produtos_do_periodo': ItemVenda.objects.filter(venda__in=periodo).values('produto')
+            .annotate(quantidade=Sum('quantidade')).order_by('-quantidade'),
+            'lucratividade': ItemVenda.objects.filter(venda__in=periodo).values('nome_produto').annotate(
+                receita=Sum(F('quantidade') * F('preco_unitario')), custo=Sum(F('quantidade') * F('custo_unitario'))
+            ).order_by('-receita'),
+        }
+
+    def _medir(self, consultas, options):
+        resultado = {}
+        for nome, queryset in consultas.items():
+            tempos = []
+            for _ in range(options['repeticoes']):
+                inicio = time.perf_counter()
+                linhas = len(list(queryset.all()))
+                tempos.append(time.perf_counter() - inicio)
+            explain = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+            resultado[nome] = {
+                'linhas': linhas,
+                'mediana_ms': round(statistics.median(tempos) * 1000, 2),
+                'plano': queryset.explain(**explain).splitlines(),
+            }
+        return resultado
+
+    def _alterar_indices(self, remover):
+        with connection.schema_editor() as editor:
+            for modelo, nomes in INDICES.items():
+                for indice in _indices_do_modelo(modelo, nomes):
+                    if remover:
+                        editor.remove_index(modelo, indice)
+                    else:
+                        editor.add_index(modelo, indice)
+
+    def _atualizar_estatisticas(self):
+        with connection.cursor() as cursor:
+            for modelo in INDICES:
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}')
@@ -0,0 +1,39 @@
+# orders/management/commands/exportar_vendas.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.exportacao import FORMATOS, exportar
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor!r} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporta as vendas e os itens de um período (uma linha por item) em CSV ou NDJSON. "
+        "As linhas são lidas e gravadas em blocos, então períodos longos não aumentam o uso de memória."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', type=_data, required=True, help="Primeiro dia (AAAA-MM-DD).")
+        parser.add_argument('--fim', type=_data, required=True, help="Último dia (AAAA-MM-DD).")
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--saida', help="Arquivo de destino. Padrão: saída padrão.")
+
+    def handle(self, *args, **options):
+        if options['inicio'] > options['fim']:
+            raise CommandError("--inicio não pode ser depois de --fim.")
+        pedacos = exportar(options['inicio'], options['fim'], options['formato'])
+        if not options['saida']:
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending='')
+            return
+        with open(options['saida'], 'w', newline='', encoding='utf-8') as arquivo:
+            for pedaco in pedacos:
+                arquivo.write(pedaco)
+        self.stderr.write(f"Exportação gravada em {options['saida']}.")
@@ -0,0 +1,15 @@
+# orders/management/commands/liberar_reservas_expiradas.py
+from django.core.management.base import BaseCommand
+
+from orders.services import liberar_reservas_expiradas
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancela os pedidos online que passaram do prazo de pagamento (ORDERS_RESERVATION_TTL) "
+        "e devolve o estoque reservado. Pensado para rodar a cada minuto (cron)."
+    )
+
+    def handle(self, *args, **options):
+        cancelados = liberar_reservas_expiradas()
+        self.stdout.write(self.style.SUCCESS(f"{cancelados} pedido(s) expirado(s) cancelado(s)."))
@@ -0,0 +1,12 @@
+# orders/management/commands/limpar_chaves_idempotencia.py
+from django.core.management.base import BaseCommand
+
+from orders.idempotencia import purgar_expiradas
+
+
+class Command(BaseCommand):
+    help = "Remove as chaves Idempotency-Key expiradas. Pensado para rodar periodicamente (cron)."
+
+    def handle(self, *args, **options):
+        apagadas = purgar_expiradas()
+        self.stdout.write(self.style.SUCCESS(f"{apagadas} chave(s) expirada(s) removida(s)."))
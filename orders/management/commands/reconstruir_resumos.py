@@ -0,0 +1,33 @@
+# orders/management/commands/reconstruir_resumos.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.resumos import reconstruir_resumos
+
+
+def _data(valor):
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise CommandError(f"Data inválida: {valor!r} (use AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula os resumos de vendas, diários e por hora (DailySalesSummary, DailyProductSales, "
+        "HourlySalesSummary e HourlyProductSales), a partir das vendas. Sem datas, reconstrói tudo; "
+        "use --inicio/--fim para um período (ex.: depois de importar vendas antigas ou de corrigir vendas pelo admin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', type=_data, help="Primeiro dia (AAAA-MM-DD).")
+        parser.add_argument('--fim', type=_data, help="Último dia (AAAA-MM-DD). Padrão: hoje.")
+
+    def handle(self, *args, **options):
+        if options['inicio'] and options['fim'] and options['inicio'] > options['fim']:
+            raise CommandError("--inicio não pode ser depois de --fim.")
+        gravadas = reconstruir_resumos(options['inicio'], options['fim'])
+        for modelo, linhas in gravadas.items():
+            self.stdout.write(f"{modelo}: {linhas} linha(s)")
+        self.stdout.write(self.style.SUCCESS("Resumos reconstruídos."))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:54
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_remove_itemvenda_subtotal_alter_venda_payment_method_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=255, unique=True, verbose_name='Chave de Idempotência')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Status HTTP')),
+                ('resposta', models.JSONField(encoder=rest_framework.utils.encoders.JSONEncoder, verbose_name='Resposta')),
+                ('criada_em', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('expira_em', models.DateTimeField(db_index=True, verbose_name='Expira em')),
+                ('venda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='orders.venda', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Chave de Idempotência',
+                'verbose_name_plural': 'Chaves de Idempotência',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_chaveidempotencia'),
+        ('stock', '0010_stockitem_reserved_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantidade Reservada')),
+                ('status', models.CharField(choices=[('ATIVA', 'Ativa'), ('CONVERTIDA', 'Convertida em Baixa'), ('LIBERADA', 'Liberada')], default='ATIVA', max_length=12, verbose_name='Status')),
+                ('criada_em', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('expira_em', models.DateTimeField(verbose_name='Expira em')),
+                ('stock_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='stock.stockitem', verbose_name='Item de Estoque')),
+                ('venda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='orders.venda', verbose_name='Venda')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Estoque',
+                'verbose_name_plural': 'Reservas de Estoque',
+                'indexes': [models.Index(fields=['status', 'expira_em'], name='reserva_status_expira_idx')],
+            },
+        ),
+    ]
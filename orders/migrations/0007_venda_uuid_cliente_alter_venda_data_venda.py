@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_reservaestoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='uuid_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='UUID do Terminal'),
+        ),
+        migrations.AlterField(
+            model_name='venda',
+            name='data_venda',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Data da Venda'),
+        ),
+    ]
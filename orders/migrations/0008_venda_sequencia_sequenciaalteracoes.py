@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+from django.db import migrations, models
+
+
+def criar_contador(apps, schema_editor):
+    SequenciaAlteracoes = apps.get_model('orders', 'SequenciaAlteracoes')
+    SequenciaAlteracoes.objects.get_or_create(pk=1, defaults={'valor': 0})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_venda_uuid_cliente_alter_venda_data_venda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaAlteracoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0, verbose_name='Valor Atual')),
+            ],
+            options={
+                'verbose_name': 'Sequência de Alterações',
+                'verbose_name_plural': 'Sequência de Alterações',
+            },
+        ),
+        migrations.AddField(
+            model_name='venda',
+            name='sequencia',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False, verbose_name='Sequência de Alteração'),
+        ),
+        migrations.RunPython(criar_contador, migrations.RunPython.noop),
+    ]
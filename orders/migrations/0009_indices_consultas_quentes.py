@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_venda_sequencia_sequenciaalteracoes'),
+        ('stock', '0011_stockitem_counter_shards_stockitemshard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemvenda',
+            index=models.Index(fields=['venda', 'produto'], name='itemvenda_venda_produto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(condition=models.Q(('status__in', ['FINALIZADO', 'CANCELADO']), _negated=True), fields=['data_venda'], name='venda_ativa_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['cliente', '-data_venda'], name='venda_cliente_data_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:15
+
+from django.db import migrations, models
+
+
+def marcar_canceladas(apps, schema_editor):
+    # Vendas já canceladas tiveram o estoque devolvido pelo código anterior.
+    Venda = apps.get_model('orders', 'Venda')
+    Venda.objects.filter(status='CANCELADO').update(estoque_devolvido=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_indices_consultas_quentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='estoque_devolvido',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Estoque Devolvido'),
+        ),
+        migrations.RunPython(marcar_canceladas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:18
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# Cópia de orders.resumos.grupo_do_status na época desta migração.
+GRUPOS_STATUS = {
+    'AGUARDANDO_PAGAMENTO': 'PENDENTE',
+    'CANCELADO': 'CANCELADO',
+}
+DIAS_POR_LOTE = 31
+
+
+def periodos(Venda):
+    """Intervalos [de, ate) de DIAS_POR_LOTE dias locais cobrindo todas as vendas."""
+    datas = Venda.objects.aggregate(primeira=Min('data_venda'), ultima=Max('data_venda'))
+    if datas['primeira'] is None:
+        return
+    dia = timezone.localdate(datas['primeira'])
+    ultimo = timezone.localdate(datas['ultima'])
+    while dia <= ultimo:
+        proximo = dia + timedelta(days=DIAS_POR_LOTE)
+        yield (
+            timezone.make_aware(datetime.combine(dia, time.min)),
+            timezone.make_aware(datetime.combine(proximo, time.min)),
+        )
+        dia = proximo
+
+
+def preencher_resumos(apps, schema_editor):
+    # Sem isso o relatório de vendas, que passa a ler só os resumos, mostraria zero
+    # para todo o histórico. Um lote por faixa de dias limita a memória; os dias de
+    # um lote não se repetem em outro, então cada lote só insere.
+    Venda = apps.get_model('orders', 'Venda')
+    ItemVenda = apps.get_model('orders', 'ItemVenda')
+    DailySalesSummary = apps.get_model('orders', 'DailySalesSummary')
+    DailyProductSales = apps.get_model('orders', 'DailyProductSales')
+
+    for de, ate in periodos(Venda):
+        resumo = defaultdict(lambda: [0, Decimal('0')])
+        for dia, payment_method, status, pedidos, faturamento in (
+            Venda.objects.filter(data_venda__gte=de, data_venda__lt=ate)
+            .annotate(dia=TruncDate('data_venda')).values('dia', 'payment_method', 'status')
+            .annotate(pedidos=Count('id'), faturamento=Sum('valor_total')).order_by()
+            .values_list('dia', 'payment_method', 'status', 'pedidos', 'faturamento')
+        ):
+            linha = resumo[(dia, payment_method, GRUPOS_STATUS.get(status, 'FATURADO'))]
+            linha[0] += pedidos
+            linha[1] += faturamento
+
+        produtos = defaultdict(lambda: [0, Decimal('0')])
+        for dia, status, nome_produto, quantidade, receita in (
+            ItemVenda.objects.filter(venda__data_venda__gte=de, venda__data_venda__lt=ate)
+            .annotate(dia=TruncDate('venda__data_venda')).values('dia', 'venda__status', 'nome_produto')
+            .annotate(total=Sum('quantidade'), receita=Sum(F('quantidade') * F('preco_unitario'))).order_by()
+            .values_list('dia', 'venda__status', 'nome_produto', 'total', 'receita')
+        ):
+            linha = produtos[(dia, GRUPOS_STATUS.get(status, 'FATURADO'), nome_produto)]
+            linha[0] += quantidade
+            linha[1] += receita
+
+        DailySalesSummary.objects.bulk_create([
+            DailySalesSummary(day=dia, payment_method=payment_method, status_group=grupo, order_count=pedidos, revenue=faturamento)
+            for (dia, payment_method, grupo), (pedidos, faturamento) in resumo.items()
+        ], batch_size=1000)
+        DailyProductSales.objects.bulk_create([
+            DailyProductSales(day=dia, status_group=grupo, product_name=nome_produto, quantity=quantidade, revenue=receita)
+            for (dia, grupo, nome_produto), (quantidade, receita) in produtos.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_venda_estoque_devolvido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('status_group', models.CharField(choices=[('FATURADO', 'Faturado'), ('PENDENTE', 'Pendente'), ('CANCELADO', 'Cancelado')], max_length=10, verbose_name='Grupo de Status')),
+                ('product_name', models.CharField(max_length=255, verbose_name='Nome do Produto na Venda')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Receita')),
+            ],
+            options={
+                'verbose_name': 'Venda Diária por Produto',
+                'verbose_name_plural': 'Vendas Diárias por Produto',
+                'constraints': [models.UniqueConstraint(fields=('day', 'status_group', 'product_name'), name='unique_produto_dia_grupo_nome')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('payment_method', models.CharField(choices=[('NA_RETIRADA', 'Pagar na Retirada'), ('ONLINE', 'Pago Online'), ('DINHEIRO', 'Dinheiro'), ('CARTAO_DEBITO', 'Cartão de Débito'), ('CARTAO_CREDITO', 'Cartão de Crédito'), ('PIX', 'Pix')], max_length=20, verbose_name='Método de Pagamento')),
+                ('status_group', models.CharField(choices=[('FATURADO', 'Faturado'), ('PENDENTE', 'Pendente'), ('CANCELADO', 'Cancelado')], max_length=10, verbose_name='Grupo de Status')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Faturamento')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Vendas',
+                'verbose_name_plural': 'Resumos Diários de Vendas',
+                'constraints': [models.UniqueConstraint(fields=('day', 'payment_method', 'status_group'), name='unique_resumo_dia_pagamento_grupo')],
+            },
+        ),
+        migrations.RunPython(preencher_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:24
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+TAMANHO_DO_LOTE = 5000
+
+
+def preencher_custo(apps, schema_editor):
+    # O custo da época não foi guardado; o melhor disponível é o custo atual do
+    # item de estoque. Lotes por faixa de id, cada um na sua transação, para não
+    # travar a tabela inteira de itens durante a migração.
+    ItemVenda = apps.get_model('orders', 'ItemVenda')
+    MenuProduct = apps.get_model('stock', 'MenuProduct')
+    custo = MenuProduct.objects.filter(pk=OuterRef('produto_id')).values('stock_item__cost_price')[:1]
+
+    pendentes = ItemVenda.objects.filter(custo_unitario__isnull=True, produto__isnull=False)
+    ultimo_id = pendentes.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for inicio in range(0, ultimo_id + 1, TAMANHO_DO_LOTE):
+        pendentes.filter(pk__gte=inicio, pk__lt=inicio + TAMANHO_DO_LOTE).update(custo_unitario=Subquery(custo))
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('orders', '0011_resumos_diarios'),
+        ('stock', '0011_stockitem_counter_shards_stockitemshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='itemvenda',
+            name='custo_unitario',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Custo Unitário na Venda'),
+        ),
+        migrations.RunPython(preencher_custo, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='itemvenda',
+            index=models.Index(fields=['venda'], include=('nome_produto', 'quantidade', 'preco_unitario', 'custo_unitario'), name='itemvenda_lucro_cobertura_idx'),
+        ),
+    ]
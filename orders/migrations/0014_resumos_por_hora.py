@@ -0,0 +1,119 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:35
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+# Cópia de orders.resumos.grupo_do_status na época desta migração.
+GRUPOS_STATUS = {
+    'AGUARDANDO_PAGAMENTO': 'PENDENTE',
+    'CANCELADO': 'CANCELADO',
+}
+DIAS_POR_LOTE = 31
+
+
+def periodos(Venda):
+    """Intervalos [de, ate) de DIAS_POR_LOTE dias locais cobrindo todas as vendas."""
+    datas = Venda.objects.aggregate(primeira=Min('data_venda'), ultima=Max('data_venda'))
+    if datas['primeira'] is None:
+        return
+    dia = timezone.localdate(datas['primeira'])
+    ultimo = timezone.localdate(datas['ultima'])
+    while dia <= ultimo:
+        proximo = dia + timedelta(days=DIAS_POR_LOTE)
+        yield (
+            timezone.make_aware(datetime.combine(dia, time.min)),
+            timezone.make_aware(datetime.combine(proximo, time.min)),
+        )
+        dia = proximo
+
+
+def preencher_resumos_por_hora(apps, schema_editor):
+    # O mapa de calor lê só os resumos por hora: sem isso começaria vazio. Mesmos
+    # lotes por faixa de dias da 0011.
+    Venda = apps.get_model('orders', 'Venda')
+    ItemVenda = apps.get_model('orders', 'ItemVenda')
+    HourlySalesSummary = apps.get_model('orders', 'HourlySalesSummary')
+    HourlyProductSales = apps.get_model('orders', 'HourlyProductSales')
+
+    for de, ate in periodos(Venda):
+        horas = defaultdict(lambda: [0, Decimal('0')])
+        for dia, hora, status, pedidos, faturamento in (
+            Venda.objects.filter(data_venda__gte=de, data_venda__lt=ate)
+            .annotate(dia=TruncDate('data_venda'), hora=ExtractHour('data_venda')).values('dia', 'hora', 'status')
+            .annotate(pedidos=Count('id'), faturamento=Sum('valor_total')).order_by()
+            .values_list('dia', 'hora', 'status', 'pedidos', 'faturamento')
+        ):
+            linha = horas[(GRUPOS_STATUS.get(status, 'FATURADO'), dia, hora)]
+            linha[0] += pedidos
+            linha[1] += faturamento
+
+        produtos = defaultdict(lambda: [0, Decimal('0')])
+        for dia, hora, status, nome_produto, quantidade, receita in (
+            ItemVenda.objects.filter(venda__data_venda__gte=de, venda__data_venda__lt=ate)
+            .annotate(dia=TruncDate('venda__data_venda'), hora=ExtractHour('venda__data_venda'))
+            .values('dia', 'hora', 'venda__status', 'nome_produto')
+            .annotate(total=Sum('quantidade'), receita=Sum(F('quantidade') * F('preco_unitario'))).order_by()
+            .values_list('dia', 'hora', 'venda__status', 'nome_produto', 'total', 'receita')
+        ):
+            linha = produtos[(GRUPOS_STATUS.get(status, 'FATURADO'), dia, hora, nome_produto)]
+            linha[0] += quantidade
+            linha[1] += receita
+
+        HourlySalesSummary.objects.bulk_create([
+            HourlySalesSummary(status_group=grupo, day=dia, hour=hora, order_count=pedidos, revenue=faturamento)
+            for (grupo, dia, hora), (pedidos, faturamento) in horas.items()
+        ], batch_size=1000)
+        HourlyProductSales.objects.bulk_create([
+            HourlyProductSales(status_group=grupo, day=dia, hour=hora, product_name=nome_produto, quantity=quantidade, revenue=receita)
+            for (grupo, dia, hora, nome_produto), (quantidade, receita) in produtos.items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0013_indice_data_venda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Hora')),
+                ('status_group', models.CharField(choices=[('FATURADO', 'Faturado'), ('PENDENTE', 'Pendente'), ('CANCELADO', 'Cancelado')], max_length=10, verbose_name='Grupo de Status')),
+                ('product_name', models.CharField(max_length=255, verbose_name='Nome do Produto na Venda')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Receita')),
+            ],
+            options={
+                'verbose_name': 'Venda Horária por Produto',
+                'verbose_name_plural': 'Vendas Horárias por Produto',
+                'constraints': [models.UniqueConstraint(fields=('status_group', 'day', 'hour', 'product_name'), name='unique_produto_grupo_dia_hora_nome')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Hora')),
+                ('status_group', models.CharField(choices=[('FATURADO', 'Faturado'), ('PENDENTE', 'Pendente'), ('CANCELADO', 'Cancelado')], max_length=10, verbose_name='Grupo de Status')),
+                ('order_count', models.IntegerField(default=0, verbose_name='Pedidos')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Faturamento')),
+            ],
+            options={
+                'verbose_name': 'Resumo Horário de Vendas',
+                'verbose_name_plural': 'Resumos Horários de Vendas',
+                'constraints': [models.UniqueConstraint(fields=('status_group', 'day', 'hour'), name='unique_resumo_grupo_dia_hora')],
+            },
+        ),
+        migrations.RunPython(preencher_resumos_por_hora, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0014_resumos_por_hora'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(unique=True, verbose_name='Mês')),
+                ('linhas', models.PositiveBigIntegerField(default=0, verbose_name='Linhas (itens)')),
+                ('nomes', models.PositiveIntegerField(default=0, verbose_name='Nomes de Produto')),
+                ('bytes_nomes', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho do Dicionário de Nomes')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Arquivo Mensal de Vendas',
+                'verbose_name_plural': 'Arquivos Mensais de Vendas',
+                'ordering': ['mes'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendaArquivada',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('AGUARDANDO_PAGAMENTO', 'Aguardando Pagamento'), ('PAGO', 'Pago'), ('EM_PREPARO', 'Em Preparo'), ('PRONTO', 'Pronto para Retirada'), ('FINALIZADO', 'Finalizado/Entregue'), ('CANCELADO', 'Cancelado')], max_length=25, verbose_name='Status')),
+                ('payment_method', models.CharField(choices=[('NA_RETIRADA', 'Pagar na Retirada'), ('ONLINE', 'Pago Online'), ('DINHEIRO', 'Dinheiro'), ('CARTAO_DEBITO', 'Cartão de Débito'), ('CARTAO_CREDITO', 'Cartão de Crédito'), ('PIX', 'Pix')], max_length=20, verbose_name='Método de Pagamento')),
+                ('data_venda', models.DateTimeField(verbose_name='Data da Venda')),
+                ('uuid_cliente', models.UUIDField(blank=True, null=True, unique=True, verbose_name='UUID do Terminal')),
+                ('valor_total', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Valor Total')),
+                ('itens', models.PositiveIntegerField(default=0, verbose_name='Itens no Arquivo')),
+                ('mes', models.DateField(verbose_name='Mês do Arquivo')),
+                ('cliente', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Venda Arquivada',
+                'verbose_name_plural': 'Vendas Arquivadas',
+                'indexes': [models.Index(fields=['data_venda'], name='vendaarquivada_data_idx')],
+            },
+        ),
+    ]
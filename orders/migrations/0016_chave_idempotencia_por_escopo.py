@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0015_vendas_arquivadas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chaveidempotencia',
+            name='escopo',
+            field=models.CharField(default='', max_length=100, verbose_name='Escopo'),
+        ),
+        migrations.AddField(
+            model_name='chaveidempotencia',
+            name='hash_corpo',
+            field=models.CharField(default='', max_length=64, verbose_name='Hash do Corpo'),
+        ),
+        migrations.AlterField(
+            model_name='chaveidempotencia',
+            name='chave',
+            field=models.CharField(max_length=255, verbose_name='Chave de Idempotência'),
+        ),
+        migrations.AddConstraint(
+            model_name='chaveidempotencia',
+            constraint=models.UniqueConstraint(fields=('escopo', 'chave'), name='unique_chave_idempotencia_escopo'),
+        ),
+    ]
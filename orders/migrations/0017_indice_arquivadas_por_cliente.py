@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0016_chave_idempotencia_por_escopo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vendaarquivada',
+            index=models.Index(fields=['cliente', '-data_venda', '-id'], name='vendaarquivada_cliente_idx'),
+        ),
+    ]
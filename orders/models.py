@@ -1,6 +1,8 @@
 # orders/models.py
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
 
 class Venda(models.Model):
     STATUS_CHOICES = [
@@ -11,6 +13,20 @@ class Venda(models.Model):
         ('FINALIZADO', 'Finalizado/Entregue'),
         ('CANCELADO', 'Cancelado'),
     ]
+    # Pedidos que já saíram do painel da cozinha. As consultas do painel usam
+    # exclude(status__in=STATUS_ENCERRADOS), o mesmo predicado do índice parcial abaixo.
+    STATUS_ENCERRADOS = ['FINALIZADO', 'CANCELADO']
+    # Máquina de estados das mudanças de status (PATCH da venda e transições em lote):
+    # status atual -> destinos permitidos. Pedidos só andam para frente (podendo pular
+    # etapas) e só saem do painel finalizados ou cancelados; nada volta de um status final.
+    TRANSICOES_STATUS = {
+        'AGUARDANDO_PAGAMENTO': ['PAGO', 'EM_PREPARO', 'PRONTO', 'FINALIZADO', 'CANCELADO'],
+        'PAGO': ['EM_PREPARO', 'PRONTO', 'FINALIZADO', 'CANCELADO'],
+        'EM_PREPARO': ['PRONTO', 'FINALIZADO', 'CANCELADO'],
+        'PRONTO': ['FINALIZADO', 'CANCELADO'],
+        'FINALIZADO': [],
+        'CANCELADO': [],
+    }
 
     # --- OPÇÕES DE PAGAMENTO ATUALIZADAS ---
     PAYMENT_CHOICES = [
@@ -41,7 +57,16 @@ class Venda(models.Model):
         default='DINHEIRO', # Um padrão para o PDV
         verbose_name="Método de Pagamento"
     )
-    data_venda = models.DateTimeField(auto_now_add=True, verbose_name="Data da Venda")
+    # Padrão "agora", mas vendas sincronizadas do PDV offline trazem o horário real do terminal
+    data_venda = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Data da Venda")
+    # Identificador gerado pelo terminal PDV, usado para não duplicar vendas reenviadas na sincronização
+    uuid_cliente = models.UUIDField(unique=True, null=True, blank=True, editable=False, verbose_name="UUID do Terminal")
+    # Número da transação da última alteração (criação ou mudança de status); veja orders/sequencia.py.
+    # Permite que as listas devolvam só o que mudou depois de um cursor (?since=).
+    sequencia = models.BigIntegerField(default=0, db_index=True, editable=False, verbose_name="Sequência de Alteração")
+    # Marcado no cancelamento, quando o estoque (ou a reserva) da venda volta para o disponível.
+    # Um segundo cancelamento da mesma venda nunca devolve o estoque de novo.
+    estoque_devolvido = models.BooleanField(default=False, editable=False, verbose_name="Estoque Devolvido")
     valor_total = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor Total")
     
     def __str__(self):
@@ -51,6 +76,52 @@ class Venda(models.Model):
         verbose_name = "Venda"
         verbose_name_plural = "Vendas"
         ordering = ['-data_venda']
+        indexes = [
+            # Painel de pedidos ativos: só as poucas vendas em aberto entram no índice.
+            models.Index(
+                fields=['data_venda'], name='venda_ativa_data_idx',
+                condition=~models.Q(status__in=['FINALIZADO', 'CANCELADO'])
+            ),
+            # "Meus pedidos": vendas de um cliente, mais recentes primeiro.
+            models.Index(fields=['cliente', '-data_venda'], name='venda_cliente_data_idx'),
+            # Relatórios, exportação e reconstrução dos resumos: intervalos de data_venda.
+            models.Index(fields=['data_venda'], name='venda_data_idx'),
+        ]
+
+
+class SequenciaAlteracoes(models.Model):
+    """
+    Contador único (linha pk=1) que numera as transações que alteram vendas nos
+    bancos sem o id de transação do PostgreSQL (veja orders/sequencia.py). A
+    linha fica travada do incremento até o commit, então a ordem dos números é a
+    ordem dos commits e um cursor nunca "pula" uma alteração atrasada.
+    """
+    valor = models.BigIntegerField(default=0, verbose_name="Valor Atual")
+
+    def __str__(self):
+        return str(self.valor)
+
+    class Meta:
+        verbose_name = "Sequência de Alterações"
+        verbose_name_plural = "Sequência de Alterações"
+
+
+class VendaRemovida(models.Model):
+    """
+    Marca de uma venda apagada (DELETE da venda). As listas incrementais
+    (?since=, AlteracoesDesdeMixin) devolvem o id em "removed" para quem tinha o
+    pedido na tela; `sequencia` é a da transação que apagou a venda.
+    """
+    venda_id = models.IntegerField(verbose_name="ID da Venda")
+    cliente = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    sequencia = models.BigIntegerField(db_index=True, editable=False, verbose_name="Sequência de Alteração")
+
+    def __str__(self):
+        return f"Venda removida #{self.venda_id}"
+
+    class Meta:
+        verbose_name = "Venda Removida"
+        verbose_name_plural = "Vendas Removidas"
 
 
 class ItemVenda(models.Model):
@@ -65,6 +136,11 @@ class ItemVenda(models.Model):
     nome_produto = models.CharField(max_length=255, verbose_name="Nome do Produto na Venda")
     quantidade = models.PositiveIntegerField(verbose_name="Quantidade")
     preco_unitario = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Preço Unitário na Venda")
+    # Custo do item de estoque no momento da venda: o relatório de lucratividade
+    # não depende do custo atual (que muda) nem precisa juntar o cardápio e o estoque.
+    custo_unitario = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Custo Unitário na Venda"
+    )
     
     # Removido o campo subtotal para ser uma property, é mais seguro
     @property
@@ -76,4 +152,220 @@ class ItemVenda(models.Model):
 
     class Meta:
         verbose_name = "Item de Venda"
-        verbose_name_plural = "Itens de Venda"
\ No newline at end of file
+        verbose_name_plural = "Itens de Venda"
+        indexes = [
+            # Relatórios por produto que juntam os itens às vendas do período.
+            models.Index(fields=['venda', 'produto'], name='itemvenda_venda_produto_idx'),
+            # Lucratividade: as colunas somadas vêm no próprio índice (index-only scan no Postgres).
+            models.Index(
+                fields=['venda'], include=['nome_produto', 'quantidade', 'preco_unitario', 'custo_unitario'],
+                name='itemvenda_lucro_cobertura_idx'
+            ),
+        ]
+
+class ChaveIdempotencia(models.Model):
+    """
+    Guarda a resposta de uma venda criada com o header Idempotency-Key,
+    para que reenvios do mesmo pedido devolvam a resposta original. A chave é
+    única dentro do escopo (usuário ou IP, veja orders/idempotencia.py).
+    """
+    escopo = models.CharField(max_length=100, default='', verbose_name="Escopo")
+    chave = models.CharField(max_length=255, verbose_name="Chave de Idempotência")
+    # SHA-256 do corpo do pedido. Registros anteriores ao escopo ficam com '' e só expiram.
+    hash_corpo = models.CharField(max_length=64, default='', verbose_name="Hash do Corpo")
+    venda = models.ForeignKey(Venda, related_name='+', on_delete=models.CASCADE, verbose_name="Venda")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Status HTTP")
+    resposta = models.JSONField(encoder=JSONEncoder, verbose_name="Resposta")
+    criada_em = models.DateTimeField(auto_now_add=True, verbose_name="Criada em")
+    expira_em = models.DateTimeField(db_index=True, verbose_name="Expira em")
+
+    def __str__(self):
+        return f"{self.escopo}/{self.chave} -> Venda #{self.venda_id}"
+
+    class Meta:
+        verbose_name = "Chave de Idempotência"
+        verbose_name_plural = "Chaves de Idempotência"
+        constraints = [
+            models.UniqueConstraint(fields=['escopo', 'chave'], name='unique_chave_idempotencia_escopo'),
+        ]
+
+
+class ReservaEstoque(models.Model):
+    """
+    Reserva de estoque de um pedido online que ainda aguarda pagamento.
+    Enquanto ATIVA, a quantidade fica somada em StockItem.reserved_quantity;
+    ao confirmar o pagamento vira baixa real (CONVERTIDA) e, se expirar, é LIBERADA.
+    """
+    STATUS_CHOICES = [
+        ('ATIVA', 'Ativa'),
+        ('CONVERTIDA', 'Convertida em Baixa'),
+        ('LIBERADA', 'Liberada'),
+    ]
+
+    venda = models.ForeignKey(Venda, related_name='reservas', on_delete=models.CASCADE, verbose_name="Venda")
+    stock_item = models.ForeignKey(
+        'stock.StockItem',
+        related_name='reservas',
+        on_delete=models.CASCADE,
+        verbose_name="Item de Estoque"
+    )
+    quantidade = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantidade Reservada")
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='ATIVA', verbose_name="Status")
+    criada_em = models.DateTimeField(auto_now_add=True, verbose_name="Criada em")
+    expira_em = models.DateTimeField(verbose_name="Expira em")
+
+    def __str__(self):
+        return f"{self.quantidade} de {self.stock_item_id} para Venda #{self.venda_id} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = "Reserva de Estoque"
+        verbose_name_plural = "Reservas de Estoque"
+        indexes = [
+            # Usado pelo liberador de reservas expiradas
+            models.Index(fields=['status', 'expira_em'], name='reserva_status_expira_idx'),
+        ]
+
+
+class DailySalesSummary(models.Model):
+    """
+    Total de pedidos e faturamento por dia × método de pagamento × grupo de status.
+    Mantido de forma incremental pelas gravações de pedidos (orders/resumos.py) e
+    reconstruível pelo comando reconstruir_resumos. O relatório de vendas lê daqui.
+    """
+    STATUS_GROUP_CHOICES = [
+        ('FATURADO', 'Faturado'),      # PAGO, EM_PREPARO, PRONTO, FINALIZADO
+        ('PENDENTE', 'Pendente'),      # AGUARDANDO_PAGAMENTO
+        ('CANCELADO', 'Cancelado'),
+    ]
+
+    day = models.DateField(verbose_name="Dia")
+    payment_method = models.CharField(max_length=20, choices=Venda.PAYMENT_CHOICES, verbose_name="Método de Pagamento")
+    status_group = models.CharField(max_length=10, choices=STATUS_GROUP_CHOICES, verbose_name="Grupo de Status")
+    order_count = models.IntegerField(default=0, verbose_name="Pedidos")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Faturamento")
+
+    def __str__(self):
+        return f"{self.day} {self.payment_method} {self.status_group}: {self.order_count} pedidos"
+
+    class Meta:
+        verbose_name = "Resumo Diário de Vendas"
+        verbose_name_plural = "Resumos Diários de Vendas"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method', 'status_group'], name='unique_resumo_dia_pagamento_grupo'),
+        ]
+
+
+class DailyProductSales(models.Model):
+    """Quantidade vendida e receita por dia × produto (nome na venda) × grupo de status."""
+    day = models.DateField(verbose_name="Dia")
+    status_group = models.CharField(max_length=10, choices=DailySalesSummary.STATUS_GROUP_CHOICES, verbose_name="Grupo de Status")
+    product_name = models.CharField(max_length=255, verbose_name="Nome do Produto na Venda")
+    quantity = models.IntegerField(default=0, verbose_name="Quantidade")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Receita")
+
+    def __str__(self):
+        return f"{self.day} {self.product_name} {self.status_group}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Venda Diária por Produto"
+        verbose_name_plural = "Vendas Diárias por Produto"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status_group', 'product_name'], name='unique_produto_dia_grupo_nome'),
+        ]
+
+
+class HourlySalesSummary(models.Model):
+    """
+    Pedidos e faturamento por dia × hora local × grupo de status. Mantido junto
+    com os resumos diários (orders/resumos.py); o mapa de calor por dia da semana
+    × hora é somado daqui.
+    """
+    day = models.DateField(verbose_name="Dia")
+    hour = models.PositiveSmallIntegerField(verbose_name="Hora")
+    status_group = models.CharField(max_length=10, choices=DailySalesSummary.STATUS_GROUP_CHOICES, verbose_name="Grupo de Status")
+    order_count = models.IntegerField(default=0, verbose_name="Pedidos")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Faturamento")
+
+    def __str__(self):
+        return f"{self.day} {self.hour:02d}h {self.status_group}: {self.order_count} pedidos"
+
+    class Meta:
+        verbose_name = "Resumo Horário de Vendas"
+        verbose_name_plural = "Resumos Horários de Vendas"
+        constraints = [
+            # Grupo primeiro: o mapa de calor filtra status_group = 'FATURADO' e um intervalo de dias.
+            models.UniqueConstraint(fields=['status_group', 'day', 'hour'], name='unique_resumo_grupo_dia_hora'),
+        ]
+
+
+class HourlyProductSales(models.Model):
+    """Quantidade vendida e receita por dia × hora local × produto (nome na venda) × grupo de status."""
+    day = models.DateField(verbose_name="Dia")
+    hour = models.PositiveSmallIntegerField(verbose_name="Hora")
+    status_group = models.CharField(max_length=10, choices=DailySalesSummary.STATUS_GROUP_CHOICES, verbose_name="Grupo de Status")
+    product_name = models.CharField(max_length=255, verbose_name="Nome do Produto na Venda")
+    quantity = models.IntegerField(default=0, verbose_name="Quantidade")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Receita")
+
+    def __str__(self):
+        return f"{self.day} {self.hour:02d}h {self.product_name} {self.status_group}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Venda Horária por Produto"
+        verbose_name_plural = "Vendas Horárias por Produto"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['status_group', 'day', 'hour', 'product_name'], name='unique_produto_grupo_dia_hora_nome'
+            ),
+        ]
+
+
+class VendaArquivada(models.Model):
+    """
+    Resumo de uma venda encerrada que saiu das tabelas quentes (orders/arquivo.py).
+    Os itens ficam nos arquivos colunares do mês; aqui fica só o cabeçalho, com o
+    mesmo id da venda original.
+    """
+    id = models.IntegerField(primary_key=True)
+    cliente = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=25, choices=Venda.STATUS_CHOICES, verbose_name="Status")
+    payment_method = models.CharField(max_length=20, choices=Venda.PAYMENT_CHOICES, verbose_name="Método de Pagamento")
+    data_venda = models.DateTimeField(verbose_name="Data da Venda")
+    uuid_cliente = models.UUIDField(unique=True, null=True, blank=True, verbose_name="UUID do Terminal")
+    valor_total = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Valor Total")
+    itens = models.PositiveIntegerField(default=0, verbose_name="Itens no Arquivo")
+    mes = models.DateField(verbose_name="Mês do Arquivo")
+
+    def __str__(self):
+        return f"Venda arquivada #{self.id} ({self.status}) - R$ {self.valor_total}"
+
+    class Meta:
+        verbose_name = "Venda Arquivada"
+        verbose_name_plural = "Vendas Arquivadas"
+        indexes = [
+            models.Index(fields=['data_venda'], name='vendaarquivada_data_idx'),
+            # "Meus pedidos" (UserOrderListView) também lista as vendas arquivadas.
+            models.Index(fields=['cliente', '-data_venda', '-id'], name='vendaarquivada_cliente_idx'),
+        ]
+
+
+class ArquivoMensal(models.Model):
+    """
+    Manifesto dos arquivos colunares de um mês. Só as `linhas` (e os `nomes`)
+    registrados aqui foram confirmados: o arquivamento grava os arquivos e
+    atualiza esta linha na mesma transação em que apaga as vendas, e quem lê
+    ignora qualquer sobra além desse tamanho.
+    """
+    mes = models.DateField(unique=True, verbose_name="Mês")
+    linhas = models.PositiveBigIntegerField(default=0, verbose_name="Linhas (itens)")
+    nomes = models.PositiveIntegerField(default=0, verbose_name="Nomes de Produto")
+    bytes_nomes = models.PositiveBigIntegerField(default=0, verbose_name="Tamanho do Dicionário de Nomes")
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m}: {self.linhas} linha(s)"
+
+    class Meta:
+        verbose_name = "Arquivo Mensal de Vendas"
+        verbose_name_plural = "Arquivos Mensais de Vendas"
+        ordering = ['mes']
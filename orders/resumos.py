@@ -0,0 +1,243 @@
+# orders/resumos.py
+"""
+Manutenção incremental dos resumos de vendas: diários (DailySalesSummary,
+DailyProductSales) e por hora local (HourlySalesSummary, HourlyProductSales).
+
+Cada transação que cria, muda de grupo de status ou apaga vendas soma aqui os
+seus deltas, com um único upsert por tabela, com as chaves em ordem (duas
+transações travam as linhas dos resumos na mesma sequência). As chamadas
+acontecem depois de proxima_sequencia(), que pega a trava das alterações de
+vendas (orders/sequencia.py) sem serializar os pedidos entre si; o
+reconstruir_resumos pega a mesma trava exclusiva e recalcula sem disputa.
+Os dias tocados também invalidam o cache dos relatórios (orders/cache_relatorios.py).
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from . import arquivo
+from .cache_relatorios import invalidar_dias, invalidar_tudo
+from .models import (
+    Venda, ItemVenda, DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales,
+    VendaArquivada,
+)
+from .sequencia import travar_alteracoes
+
+GRUPOS_STATUS = {
+    'AGUARDANDO_PAGAMENTO': 'PENDENTE',
+    'CANCELADO': 'CANCELADO',
+}
+
+
+def grupo_do_status(status):
+    return GRUPOS_STATUS.get(status, 'FATURADO')
+
+
+# Cada resumo: (modelo, colunas da chave, colunas somadas), gravados sempre nesta ordem.
+TABELAS = {
+    'resumo': (DailySalesSummary, ['day', 'payment_method', 'status_group'], ['order_count', 'revenue']),
+    'produtos': (DailyProductSales, ['day', 'status_group', 'product_name'], ['quantity', 'revenue']),
+    'horas': (HourlySalesSummary, ['status_group', 'day', 'hour'], ['order_count', 'revenue']),
+    'produtos_hora': (HourlyProductSales, ['status_group', 'day', 'hour', 'product_name'], ['quantity', 'revenue']),
+}
+
+
+def _acumular(linha, contagem, valor):
+    linha[0] += contagem
+    linha[1] += valor
+
+
+class Deltas:
+    """Acumula, em memória, as somas de uma transação antes de gravá-las."""
+
+    def __init__(self):
+        self.linhas = {nome: defaultdict(lambda: [0, Decimal('0')]) for nome in TABELAS}
+        self.dias = set()
+
+    def tocar(self, data_venda):
+        """Marca o dia da venda como alterado (para o cache), mesmo sem somas. Retorna (dia, hora) locais."""
+        local = timezone.localtime(data_venda)
+        self.dias.add(local.date())
+        return local.date(), local.hour
+
+    def somar_venda(self, dia, hora, payment_method, grupo, pedidos, faturamento):
+        _acumular(self.linhas['resumo'][(dia, payment_method, grupo)], pedidos, faturamento)
+        _acumular(self.linhas['horas'][(grupo, dia, hora)], pedidos, faturamento)
+
+    def somar_produto(self, dia, hora, grupo, nome_produto, quantidade, receita):
+        _acumular(self.linhas['produtos'][(dia, grupo, nome_produto)], quantidade, receita)
+        _acumular(self.linhas['produtos_hora'][(grupo, dia, hora, nome_produto)], quantidade, receita)
+
+    def adicionar(self, data_venda, payment_method, valor_total, grupo, itens, sinal=1):
+        """`itens` são tuplas (nome_produto, quantidade, preco_unitario)."""
+        dia, hora = self.tocar(data_venda)
+        self.somar_venda(dia, hora, payment_method, grupo, sinal, sinal * valor_total)
+        for nome_produto, quantidade, preco_unitario in itens:
+            self.somar_produto(dia, hora, grupo, nome_produto, sinal * quantidade, sinal * quantidade * preco_unitario)
+
+    def gravar(self):
+        for nome, (modelo, chaves, somas) in TABELAS.items():
+            _somar(modelo, chaves, somas, self.linhas[nome])
+        invalidar_dias(self.dias)
+
+
+def _somar(modelo, chaves, somas, linhas):
+    # Chaves em ordem: duas transações que tocam as mesmas linhas as travam na mesma sequência.
+    linhas = sorted((chave, valores) for chave, valores in linhas.items() if any(valores))
+    if not linhas:
+        return
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        for chave, valores in linhas:
+            filtro = dict(zip(chaves, chave))
+            if not modelo.objects.filter(**filtro).update(**{c: F(c) + v for c, v in zip(somas, valores)}):
+                modelo.objects.create(**filtro, **dict(zip(somas, valores)))
+        _podar(modelo, chaves, somas[0], linhas)
+        return
+
+    # INSERT ... ON CONFLICT DO UPDATE: um único comando soma todas as linhas, criando as que faltam.
+    qn = connection.ops.quote_name
+    tabela = qn(modelo._meta.db_table)
+    colunas = chaves + somas
+    marcadores = '(' + ', '.join(['%s'] * len(colunas)) + ')'
+    sql = (
+        f"INSERT INTO {tabela} ({', '.join(qn(c) for c in colunas)}) VALUES {', '.join([marcadores] * len(linhas))} "
+        f"ON CONFLICT ({', '.join(qn(c) for c in chaves)}) DO UPDATE SET "
+        + ', '.join(f"{qn(c)} = {tabela}.{qn(c)} + EXCLUDED.{qn(c)}" for c in somas)
+    )
+    parametros = [valor for chave, valores in linhas for valor in (*chave, *valores)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+    _podar(modelo, chaves, somas[0], linhas)
+
+
+def _podar(modelo, chaves, contador, linhas):
+    # Linhas que ficaram zeradas depois de uma subtração saem da tabela, para que
+    # o resultado incremental seja igual ao do reconstruir_resumos.
+    posicao_dia = chaves.index('day')
+    dias = {chave[posicao_dia] for chave, valores in linhas if valores[0] < 0}
+    if dias:
+        modelo.objects.filter(day__in=dias, **{contador: 0}).delete()
+
+
+def contabilizar_vendas(vendas, itens):
+    """Soma aos resumos vendas recém-criadas; `itens` são os ItemVenda delas."""
+    itens_por_venda = defaultdict(list)
+    for item in itens:
+        itens_por_venda[item.venda_id].append((item.nome_produto, item.quantidade, item.preco_unitario))
+    deltas = Deltas()
+    for venda in vendas:
+        deltas.adicionar(
+            venda.data_venda, venda.payment_method, venda.valor_total, grupo_do_status(venda.status),
+            itens_por_venda[venda.pk]
+        )
+    deltas.gravar()
+
+
+def mover_vendas(status_antigos, novo_status=None):
+    """
+    Atualiza os resumos de vendas que mudaram de status (`status_antigos` é
+    {venda_id: status anterior}). Só as que trocam de grupo têm os itens lidos
+    e são movidas; as demais apenas invalidam o cache do seu dia.
+    Com novo_status=None as vendas são apenas descontadas (venda apagada).
+    """
+    if not status_antigos:
+        return
+    novo_grupo = grupo_do_status(novo_status) if novo_status else None
+    venda_ids = [pk for pk, status in status_antigos.items() if grupo_do_status(status) != novo_grupo]
+
+    itens_por_venda = defaultdict(list)
+    if venda_ids:
+        for venda_id, *item in ItemVenda.objects.filter(venda_id__in=venda_ids).values_list(
+            'venda_id', 'nome_produto', 'quantidade', 'preco_unitario'
+        ):
+            itens_por_venda[venda_id].append(item)
+
+    deltas = Deltas()
+    for pk, data_venda, payment_method, valor_total in Venda.objects.filter(pk__in=list(status_antigos)).values_list(
+        'pk', 'data_venda', 'payment_method', 'valor_total'
+    ):
+        if grupo_do_status(status_antigos[pk]) == novo_grupo:
+            deltas.tocar(data_venda)
+            continue
+        itens = itens_por_venda[pk]
+        deltas.adicionar(data_venda, payment_method, valor_total, grupo_do_status(status_antigos[pk]), itens, sinal=-1)
+        if novo_grupo:
+            deltas.adicionar(data_venda, payment_method, valor_total, novo_grupo, itens)
+    deltas.gravar()
+
+
+def limites_do_periodo(inicio, fim):
+    """Dias locais [inicio, fim] como intervalo semiaberto [de, ate) de datetimes."""
+    fuso = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(inicio, time.min), fuso),
+        timezone.make_aware(datetime.combine(fim + timedelta(days=1), time.min), fuso),
+    )
+
+
+def reconstruir_resumos(inicio=None, fim=None):
+    """
+    Recalcula os resumos dos dias [inicio, fim] (todos, se omitidos) a partir das
+    vendas, vivas e arquivadas. Trava as alterações de vendas: nenhuma venda é
+    gravada (nem arquivada) no meio. Retorna {nome do modelo: linhas gravadas}.
+    """
+    with transaction.atomic():
+        travar_alteracoes()
+
+        vendas = [Venda.objects.all(), VendaArquivada.objects.all()]
+        itens = ItemVenda.objects.all()
+        de = ate = None
+        antigos = [modelo.objects.all() for modelo, _, _ in TABELAS.values()]
+        if inicio or fim:
+            inicio = inicio or _primeiro_dia(vendas)
+            fim = fim or timezone.localdate()
+            de, ate = limites_do_periodo(inicio, fim)
+            vendas = [queryset.filter(data_venda__gte=de, data_venda__lt=ate) for queryset in vendas]
+            itens = itens.filter(venda__data_venda__gte=de, venda__data_venda__lt=ate)
+            antigos = [queryset.filter(day__range=(inicio, fim)) for queryset in antigos]
+        for queryset in antigos:
+            queryset.delete()
+
+        # Uma passada por hora local alimenta os resumos diários e os horários.
+        deltas = Deltas()
+        for queryset in vendas:
+            for dia, hora, payment_method, status, pedidos, faturamento in (
+                queryset.annotate(dia=TruncDate('data_venda'), hora=ExtractHour('data_venda'))
+                .values('dia', 'hora', 'payment_method', 'status')
+                .annotate(pedidos=Count('id'), faturamento=Sum('valor_total')).order_by()
+                .values_list('dia', 'hora', 'payment_method', 'status', 'pedidos', 'faturamento')
+            ):
+                deltas.somar_venda(dia, hora, payment_method, grupo_do_status(status), pedidos, faturamento)
+
+        for dia, hora, status, nome_produto, quantidade, receita in (
+            itens.annotate(dia=TruncDate('venda__data_venda'), hora=ExtractHour('venda__data_venda'))
+            .values('dia', 'hora', 'venda__status', 'nome_produto')
+            .annotate(total=Sum('quantidade'), receita=Sum(F('quantidade') * F('preco_unitario'))).order_by()
+            .values_list('dia', 'hora', 'venda__status', 'nome_produto', 'total', 'receita')
+        ):
+            deltas.somar_produto(dia, hora, grupo_do_status(status), nome_produto, quantidade, receita)
+        # Os itens arquivados são somados com NumPy nas colunas do mês.
+        for dia, hora, status, nome_produto, quantidade, receita in arquivo.totais_por_hora(de, ate):
+            deltas.somar_produto(dia, hora, grupo_do_status(status), nome_produto, quantidade, receita)
+
+        gravadas = {}
+        for nome, (modelo, chaves, somas) in TABELAS.items():
+            linhas = deltas.linhas[nome]
+            modelo.objects.bulk_create([
+                modelo(**dict(zip(chaves, chave)), **dict(zip(somas, valores)))
+                for chave, valores in linhas.items()
+            ], batch_size=1000)
+            gravadas[modelo.__name__] = len(linhas)
+        invalidar_tudo()
+    return gravadas
+
+
+def _primeiro_dia(vendas):
+    primeiras = [queryset.order_by('data_venda').values_list('data_venda', flat=True).first() for queryset in vendas]
+    primeiras = [primeira for primeira in primeiras if primeira]
+    return timezone.localdate(min(primeiras)) if primeiras else timezone.localdate()
@@ -0,0 +1,85 @@
+# orders/sequencia.py
+"""
+Sequência de alterações de vendas (Venda.sequencia) e o cursor das listas
+incrementais (?since=, AlteracoesDesdeMixin).
+
+No PostgreSQL a sequência de uma transação é o id dela (pg_current_xact_id),
+que não trava nada: pedidos concorrentes não esperam uns pelos outros. Os ids
+não chegam em ordem de commit, então o cursor é uma marca d'água "visível até":
+o xmin do snapshot menos 1. Toda transação com id abaixo do xmin já terminou,
+portanto uma lista lida depois do cursor enxerga todas as alterações até ele;
+as de id maior podem vir de novo na próxima chamada, mas nunca ficam de fora.
+Uma transação longa segura o xmin e faz os clientes receberem mais repetições.
+
+Nos outros bancos fica o contador SequenciaAlteracoes (pk=1), incrementado com
+UPDATE: a linha fica presa até o commit, e a ordem dos números é a dos commits.
+No SQLite, que já serializa os escritores, isso não custa concorrência extra.
+
+travar_alteracoes() é a trava de quem precisa de uma foto parada das vendas
+(reconstruir_resumos, o arquivamento): no PostgreSQL, um advisory lock que os
+escritores pegam compartilhado em proxima_sequencia() e essa função pega
+exclusivo; nos outros bancos, a própria linha do contador.
+"""
+from django.db import connection
+from django.db.models import F
+
+from .models import SequenciaAlteracoes, VendaRemovida
+
+# Chave do advisory lock das alterações de vendas (um bigint qualquer, fixo).
+TRAVA_ALTERACOES = 0x6F72646572730001
+
+
+def _postgres():
+    return connection.vendor == 'postgresql'
+
+
+def proxima_sequencia():
+    """
+    Número da transação atual na sequência de alterações. Chamar dentro da
+    transação que cria ou muda o status das vendas e depois de travar o estoque;
+    depois dela só vêm os resumos (orders/resumos.py). Todas as vendas alteradas
+    na mesma transação usam o mesmo número.
+    """
+    if _postgres():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock_shared(%s), pg_current_xact_id()::text::bigint', [TRAVA_ALTERACOES]
+            )
+            return cursor.fetchone()[1]
+    SequenciaAlteracoes.objects.filter(pk=1).update(valor=F('valor') + 1)
+    return SequenciaAlteracoes.objects.values_list('valor', flat=True).get(pk=1)
+
+
+def registrar_remocoes(vendas):
+    """
+    Grava a marca (VendaRemovida) das vendas que esta transação vai apagar, para
+    que as listas incrementais as tragam em "removed". `vendas` são pares
+    (venda_id, cliente_id). Mesmas regras de chamada de proxima_sequencia().
+    """
+    vendas = list(vendas)
+    if vendas:
+        sequencia = proxima_sequencia()
+        VendaRemovida.objects.bulk_create([
+            VendaRemovida(venda_id=venda_id, cliente_id=cliente_id, sequencia=sequencia) for venda_id, cliente_id in vendas
+        ])
+
+
+def sequencia_atual():
+    """Cursor de quem vai ler a lista agora: toda alteração até ele já está visível."""
+    if _postgres():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint - 1')
+            return cursor.fetchone()[0]
+    return SequenciaAlteracoes.objects.values_list('valor', flat=True).get(pk=1)
+
+
+def travar_alteracoes():
+    """
+    Impede, até o fim da transação atual, que outras transações criem ou alterem
+    vendas. Chamar dentro de transaction.atomic(), antes de ler as vendas.
+    """
+    if _postgres():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [TRAVA_ALTERACOES])
+        return
+    SequenciaAlteracoes.objects.select_for_update().get(pk=1)
@@ -1,6 +1,11 @@
 # orders/serializers.py
+from django.conf import settings
+from django.db import models
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Venda, ItemVenda
+from . import arquivo
+from .models import Venda, ItemVenda, VendaArquivada
+from .services import VENDAS_PDV
 
 # Este serializer valida os dados que o frontend envia do carrinho
 class CarrinhoItemInputSerializer(serializers.Serializer):
@@ -10,12 +15,57 @@ class CarrinhoItemInputSerializer(serializers.Serializer):
     class Meta:
         fields = ['product_id', 'quantity']
 
+# Uma venda feita pelo PDV enquanto estava sem internet, enviada na sincronização em lote
+class VendaOfflineInputSerializer(serializers.Serializer):
+    client_uuid = serializers.UUIDField()
+    created_at = serializers.DateTimeField(required=False)
+    payment_method = serializers.ChoiceField(choices=VENDAS_PDV)
+    items = CarrinhoItemInputSerializer(many=True, allow_empty=False)
+
+# Mudança de status de vários pedidos de uma vez (ex.: "estes 20 pedidos estão PRONTOS")
+class VendaTransicaoLoteInputSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=200)
+    status = serializers.ChoiceField(choices=Venda.STATUS_CHOICES)
+
+# Período dos relatórios e da exportação: datas locais, as duas inclusivas
+class PeriodoInputSerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    # O cache dos relatórios lê uma geração por dia do período (orders/cache_relatorios.py):
+    # períodos longos demais viram milhões de chaves.
+    limitar_dias = True
+
+    def validate(self, data):
+        if 'start_date' in data and 'end_date' in data:
+            if data['start_date'] > data['end_date']:
+                raise serializers.ValidationError({'end_date': 'end_date não pode ser anterior a start_date.'})
+            maximo = getattr(settings, 'ORDERS_REPORT_MAX_DAYS', 731)
+            if self.limitar_dias and (data['end_date'] - data['start_date']).days + 1 > maximo:
+                raise serializers.ValidationError({'end_date': f'O período pode ter no máximo {maximo} dias.'})
+        return data
+
+# A exportação não passa pelo cache e é entregue em streaming: aceita qualquer período.
+class PeriodoObrigatorioInputSerializer(PeriodoInputSerializer):
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    limitar_dias = False
+
 # Este serializer formata os itens da venda para a resposta da API
 class ItemVendaOutputSerializer(serializers.ModelSerializer):
     class Meta:
         model = ItemVenda
         fields = ['nome_produto', 'quantidade', 'preco_unitario', 'subtotal']
 
+# Listas de vendas que também podem trazer vendas arquivadas (veja arquivadas_para_saida)
+class VendaOutputListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        pedidos = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return [
+            VendaArquivadaOutputSerializer(pedido, context=self.context).data if isinstance(pedido, VendaArquivada)
+            else self.child.to_representation(pedido)
+            for pedido in pedidos
+        ]
+
 # Este serializer formata a venda completa para a resposta da API
 class VendaOutputSerializer(serializers.ModelSerializer):
     itens = ItemVendaOutputSerializer(many=True, read_only=True)
@@ -25,6 +75,43 @@ class VendaOutputSerializer(serializers.ModelSerializer):
     class Meta:
         model = Venda
         fields = ['id', 'status', 'status_display', 'payment_method', 'data_venda', 'valor_total', 'itens', 'cliente_nome']
+        list_serializer_class = VendaOutputListSerializer
+
+# Venda que já saiu para o arquivo colunar: mesmo formato da VendaOutputSerializer
+class VendaArquivadaOutputSerializer(serializers.ModelSerializer):
+    itens = ItemVendaOutputSerializer(source='itens_do_arquivo', many=True, read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    cliente_nome = serializers.CharField(source='cliente.first_name', read_only=True, default='Venda no Balcão')
+
+    class Meta:
+        model = VendaArquivada
+        fields = VendaOutputSerializer.Meta.fields
+
+def vendas_para_saida(queryset):
+    """
+    Prepara um queryset de Venda para o VendaOutputSerializer: cliente no mesmo
+    SELECT, itens em uma única query extra e só as colunas que o serializer usa.
+    Assim a lista custa 2 queries, não importa quantos pedidos tenha.
+    """
+    itens = ItemVenda.objects.only('venda_id', 'nome_produto', 'quantidade', 'preco_unitario')
+    return queryset.select_related('cliente').prefetch_related(Prefetch('itens', queryset=itens)).only(
+        'id', 'status', 'payment_method', 'data_venda', 'valor_total', 'cliente__first_name'
+    )
+
+def arquivadas_para_saida(pedidos):
+    """
+    Prepara para o VendaArquivadaOutputSerializer as VendaArquivada de `pedidos`
+    (que pode misturar vendas vivas): os itens de todas são lidos do arquivo de
+    uma vez, com uma query no manifesto. Retorna a mesma lista.
+    """
+    arquivadas = [pedido for pedido in pedidos if isinstance(pedido, VendaArquivada)]
+    itens = arquivo.itens_das_vendas(arquivadas)
+    for venda in arquivadas:
+        venda.itens_do_arquivo = [
+            ItemVenda(nome_produto=nome, quantidade=quantidade, preco_unitario=preco)
+            for nome, quantidade, preco in itens[venda.id]
+        ]
+    return pedidos
 
 class VendaStatusUpdateSerializer(serializers.ModelSerializer):
     """
@@ -0,0 +1,552 @@
+# orders/services.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Venda, ItemVenda, ReservaEstoque, VendaArquivada
+from .eventos import publicar_vendas_criadas, publicar_mudanca_status
+from .resumos import contabilizar_vendas, mover_vendas
+from .sequencia import proxima_sequencia
+from stock.models import MenuProduct, StockItem
+from stock.services import fold_shards, sharded_available, take_from_shards
+
+# Vendas de balcão (PDV) já entram como pagas.
+# Vendas do cardápio online ('NA_RETIRADA' e 'ONLINE') ficam aguardando a confirmação.
+VENDAS_PDV = ['DINHEIRO', 'CARTAO_DEBITO', 'CARTAO_CREDITO', 'PIX']
+VENDAS_ONLINE = ['ONLINE', 'NA_RETIRADA']
+
+
+class CheckoutError(Exception):
+    """
+    Erro de regra de negócio do checkout. A view converte em uma resposta
+    {"error": mensagem} com o status HTTP indicado.
+    """
+    status_code = 400
+
+    def __init__(self, mensagem):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+
+
+class ProdutoNaoEncontrado(CheckoutError):
+    status_code = 404
+
+
+class EstoqueInsuficiente(CheckoutError):
+    status_code = 400
+
+
+class CotasEsgotadas(EstoqueInsuficiente):
+    """
+    As cotas dos shards de um item fragmentado não cobrem o pedido, embora o
+    saldo da linha principal talvez cubra (reservas liberadas, reposições ainda
+    não consolidadas). Veja com_cotas_consolidadas.
+    """
+
+    def __init__(self, mensagem, stock_item_id):
+        super().__init__(mensagem)
+        self.stock_item_id = stock_item_id
+
+
+def carregar_produtos(product_ids):
+    """Busca todos os produtos informados em uma única query. Retorna {id: produto}."""
+    return MenuProduct.objects.select_related('stock_item').only(
+        'id', 'name', 'sale_price', 'stock_item_id', 'stock_item__counter_shards', 'stock_item__cost_price'
+    ).order_by().in_bulk(set(product_ids))
+
+
+def verificar_produtos(product_ids, produtos):
+    """Lança ProdutoNaoEncontrado para o primeiro ID inexistente (na ordem do carrinho)."""
+    for product_id in product_ids:
+        if product_id not in produtos:
+            raise ProdutoNaoEncontrado(f"Produto com ID {product_id} não encontrado.")
+
+
+def montar_linhas(carrinho, produtos):
+    """
+    Converte o carrinho validado em linhas de venda.
+    Retorna (linhas, valor_total, demanda), onde demanda agrega a quantidade
+    pedida por StockItem (vários produtos podem usar o mesmo item de estoque)
+    e guarda se o item está no modo de contadores fragmentados.
+    """
+    linhas = []
+    valor_total = 0
+    demanda = {}
+    for item_data in carrinho:
+        produto = produtos[item_data['product_id']]
+        quantidade = item_data['quantity']
+        valor_total += produto.sale_price * quantidade
+        linhas.append((produto, quantidade))
+
+        if produto.stock_item_id not in demanda:
+            demanda[produto.stock_item_id] = {
+                'quantidade': 0, 'nome': produto.name, 'shards': produto.stock_item.counter_shards
+            }
+        demanda[produto.stock_item_id]['quantidade'] += quantidade
+    return linhas, valor_total, demanda
+
+
+def bloquear_estoque(demanda):
+    """
+    Trava as linhas de StockItem envolvidas com SELECT ... FOR UPDATE.
+    A ordem fixa por pk evita deadlock entre dois caixas vendendo os mesmos itens.
+    Itens em modo fragmentado não são travados: o saldo deles é só uma leitura,
+    e quem garante que não falta estoque é o UPDATE condicional nos shards.
+    Retorna {stock_item_id: quantidade disponível}, já descontadas as reservas ativas.
+    """
+    normais = [stock_item_id for stock_item_id, pedido in demanda.items() if not pedido['shards']]
+    fragmentados = [stock_item_id for stock_item_id, pedido in demanda.items() if pedido['shards']]
+
+    itens = StockItem.objects.select_for_update().filter(pk__in=normais).only(
+        'id', 'quantity', 'reserved_quantity', 'counter_shards'
+    ).order_by('pk')
+    disponivel = {item.pk: item.available_quantity for item in itens}
+    if fragmentados:
+        disponivel.update(sharded_available(fragmentados))
+    return disponivel
+
+
+def consumir_disponivel(demanda, disponivel):
+    """
+    Confere a demanda de um pedido contra o saldo travado e, se couber, desconta
+    do saldo em memória. Não altera nada se algum item faltar.
+    """
+    for stock_item_id, pedido in demanda.items():
+        if disponivel[stock_item_id] < pedido['quantidade']:
+            raise EstoqueInsuficiente(
+                f"Estoque insuficiente para: {pedido['nome']}. Disponível: {disponivel[stock_item_id]}"
+            )
+    for stock_item_id, pedido in demanda.items():
+        disponivel[stock_item_id] -= pedido['quantidade']
+
+
+def _atualizar_estoque(demanda, reserva):
+    agora = timezone.now()
+    for stock_item_id in sorted(demanda):
+        pedido = demanda[stock_item_id]
+        quantidade = pedido['quantidade']
+        if pedido['shards']:
+            if not take_from_shards(stock_item_id, quantidade, pedido['shards'], reserve=reserva):
+                raise CotasEsgotadas(f"Estoque insuficiente para: {pedido['nome']}.", stock_item_id)
+            if reserva:
+                StockItem.objects.filter(pk=stock_item_id).update(reserved_quantity=F('reserved_quantity') + quantidade)
+            continue
+
+        if reserva:
+            campos = {'reserved_quantity': F('reserved_quantity') + quantidade}
+        else:
+            campos = {'quantity': F('quantity') - quantidade}
+        # O filtro é uma segunda barreira contra vender o que não está disponível,
+        # útil em bancos sem suporte a travas de linha.
+        atualizados = StockItem.objects.filter(
+            pk=stock_item_id, quantity__gte=F('reserved_quantity') + quantidade
+        ).update(**campos, last_updated=agora)
+        if not atualizados:
+            raise EstoqueInsuficiente(f"Estoque insuficiente para: {pedido['nome']}.")
+
+
+def aplicar_baixas(demanda):
+    """
+    Grava as baixas com um UPDATE condicional por item de estoque (ou por shard,
+    nos itens em modo fragmentado). Deve ser chamada dentro de uma transação,
+    depois de bloquear_estoque.
+    """
+    _atualizar_estoque(demanda, reserva=False)
+
+
+def aplicar_reservas(demanda):
+    """
+    Segura a demanda de um pedido online em StockItem.reserved_quantity, sem baixar
+    a quantidade física. Mesmas regras de aplicar_baixas.
+    """
+    _atualizar_estoque(demanda, reserva=True)
+
+
+def criar_reservas(vendas_e_demandas):
+    """Grava o registro das reservas (uma por venda e item de estoque) com bulk_create."""
+    expira_em = timezone.now() + getattr(settings, 'ORDERS_RESERVATION_TTL', timedelta(minutes=30))
+    ReservaEstoque.objects.bulk_create([
+        ReservaEstoque(venda=venda, stock_item_id=stock_item_id, quantidade=pedido['quantidade'], expira_em=expira_em)
+        for venda, demanda in vendas_e_demandas
+        for stock_item_id, pedido in demanda.items()
+    ])
+
+
+def com_cotas_consolidadas(gravar):
+    """
+    Roda `gravar()` (uma transação de checkout inteira). Se as cotas de um item
+    fragmentado secaram, consolida o item depois do rollback, já sem as travas
+    do checkout, e tenta uma única vez mais. Dentro de uma transação maior o erro
+    segue adiante: as travas dela ainda estariam presas durante o fold.
+    """
+    try:
+        return gravar()
+    except CotasEsgotadas as e:
+        if transaction.get_connection().in_atomic_block:
+            raise
+        fold_shards([e.stock_item_id])
+    return gravar()
+
+
+def status_inicial(payment_method):
+    return 'PAGO' if payment_method in VENDAS_PDV else 'AGUARDANDO_PAGAMENTO'
+
+
+def _itens_da_venda(venda, linhas):
+    return [
+        ItemVenda(
+            venda=venda, produto=produto, nome_produto=produto.name,
+            quantidade=quantidade, preco_unitario=produto.sale_price,
+            custo_unitario=produto.stock_item.cost_price
+        )
+        for produto, quantidade in linhas
+    ]
+
+
+def registrar_venda(carrinho, payment_method, cliente=None):
+    """
+    Registra uma venda completa: produtos carregados em uma query, estoque
+    travado e decrementado com F(), e todos os ItemVenda gravados com bulk_create.
+    Qualquer CheckoutError desfaz a transação inteira.
+    """
+    product_ids = [item['product_id'] for item in carrinho]
+
+    with transaction.atomic():
+        produtos = carregar_produtos(product_ids)
+        verificar_produtos(product_ids, produtos)
+        linhas, valor_total, demanda = montar_linhas(carrinho, produtos)
+        consumir_disponivel(demanda, bloquear_estoque(demanda))
+
+        # Pedidos online só reservam o estoque; a baixa real acontece no pagamento.
+        status_venda = status_inicial(payment_method)
+        if status_venda == 'AGUARDANDO_PAGAMENTO':
+            aplicar_reservas(demanda)
+        else:
+            aplicar_baixas(demanda)
+
+        venda = Venda.objects.create(
+            cliente=cliente,
+            valor_total=valor_total,
+            status=status_venda,
+            payment_method=payment_method,
+            sequencia=proxima_sequencia()
+        )
+        itens = ItemVenda.objects.bulk_create(_itens_da_venda(venda, linhas))
+        if status_venda == 'AGUARDANDO_PAGAMENTO':
+            criar_reservas([(venda, demanda)])
+        contabilizar_vendas([venda], itens)
+        publicar_vendas_criadas([venda.pk])
+    return venda
+
+
+def _aplicar_estoque_do_lote(aceitos, baixas, reservas, resultados):
+    """
+    Aplica as baixas e reservas somadas do lote em um savepoint. Se uma delas
+    falhar (ex.: take_from_shards perdeu a corrida por um shard), o savepoint
+    desfaz só o que foi aplicado e cada pedido tenta de novo sozinho, no seu
+    próprio savepoint: o pedido que não cabe recebe o CheckoutError em
+    `resultados` e os outros seguem. Retorna os pedidos aplicados.
+    """
+    try:
+        with transaction.atomic():
+            aplicar_baixas(baixas)
+            aplicar_reservas(reservas)
+        return aceitos
+    except CheckoutError:
+        pass
+
+    aplicados = []
+    for aceito in aceitos:
+        indice, demanda, status_venda = aceito[0], aceito[3], aceito[4]
+        try:
+            with transaction.atomic():
+                if status_venda == 'AGUARDANDO_PAGAMENTO':
+                    aplicar_reservas(demanda)
+                else:
+                    aplicar_baixas(demanda)
+        except CheckoutError as e:
+            resultados[indice] = e
+        else:
+            aplicados.append(aceito)
+    return aplicados
+
+
+def registrar_vendas_em_lote(pedidos):
+    """
+    Registra vários pedidos em uma única transação (group commit).
+
+    `pedidos` é uma lista de dicts com 'carrinho', 'payment_method' e, opcionalmente,
+    'cliente', 'data_venda' e 'uuid_cliente' (vendas sincronizadas do PDV offline).
+    Todos os produtos são carregados juntos, o estoque de todos os pedidos é
+    travado uma vez, as baixas são somadas por item e as vendas e itens são
+    gravados com bulk_create. Um pedido inválido não derruba os outros: o
+    retorno tem, na mesma ordem, a Venda criada ou o CheckoutError do pedido.
+    """
+    resultados = [None] * len(pedidos)
+    planos = []
+
+    with transaction.atomic():
+        produtos = carregar_produtos(
+            item['product_id'] for pedido in pedidos for item in pedido['carrinho']
+        )
+
+        envolvidos = {}
+        for indice, pedido in enumerate(pedidos):
+            product_ids = [item['product_id'] for item in pedido['carrinho']]
+            try:
+                verificar_produtos(product_ids, produtos)
+            except CheckoutError as e:
+                resultados[indice] = e
+                continue
+            linhas, valor_total, demanda = montar_linhas(pedido['carrinho'], produtos)
+            planos.append((indice, linhas, valor_total, demanda))
+            envolvidos.update(demanda)
+
+        # Os pedidos disputam o saldo na ordem em que chegaram.
+        disponivel = bloquear_estoque(envolvidos)
+        baixas = {}
+        reservas = {}
+        aceitos = []
+        for indice, linhas, valor_total, demanda in planos:
+            try:
+                consumir_disponivel(demanda, disponivel)
+            except CheckoutError as e:
+                resultados[indice] = e
+                continue
+            status_venda = status_inicial(pedidos[indice]['payment_method'])
+            destino = reservas if status_venda == 'AGUARDANDO_PAGAMENTO' else baixas
+            for stock_item_id, pedido in demanda.items():
+                total = destino.setdefault(stock_item_id, {'quantidade': 0, 'nome': pedido['nome'], 'shards': pedido['shards']})
+                total['quantidade'] += pedido['quantidade']
+            aceitos.append((indice, linhas, valor_total, demanda, status_venda))
+
+        if aceitos:
+            aceitos = _aplicar_estoque_do_lote(aceitos, baixas, reservas, resultados)
+        if aceitos:
+            sequencia = proxima_sequencia()
+            vendas = Venda.objects.bulk_create([
+                Venda(
+                    cliente=pedidos[indice].get('cliente'),
+                    valor_total=valor_total,
+                    status=status_venda,
+                    payment_method=pedidos[indice]['payment_method'],
+                    data_venda=pedidos[indice].get('data_venda') or timezone.now(),
+                    uuid_cliente=pedidos[indice].get('uuid_cliente'),
+                    sequencia=sequencia
+                )
+                for indice, linhas, valor_total, demanda, status_venda in aceitos
+            ])
+            itens = []
+            reservas_por_venda = []
+            for venda, (indice, linhas, valor_total, demanda, status_venda) in zip(vendas, aceitos):
+                itens.extend(_itens_da_venda(venda, linhas))
+                if status_venda == 'AGUARDANDO_PAGAMENTO':
+                    reservas_por_venda.append((venda, demanda))
+                resultados[indice] = venda
+            ItemVenda.objects.bulk_create(itens)
+            if reservas_por_venda:
+                criar_reservas(reservas_por_venda)
+            contabilizar_vendas(vendas, itens)
+            publicar_vendas_criadas(venda.pk for venda in vendas)
+
+    return resultados
+
+
+def _totais_por_item(reservas):
+    return dict(
+        reservas.values('stock_item').annotate(total=Sum('quantidade')).order_by('stock_item').values_list('stock_item', 'total')
+    )
+
+
+def converter_reservas(venda):
+    """
+    Transforma as reservas ATIVAS da venda em baixa real de estoque (pagamento confirmado).
+    Chamar dentro de uma transação, com a venda travada. Retorna True se havia reservas.
+    """
+    return converter_reservas_das_vendas([venda.pk])
+
+
+def converter_reservas_das_vendas(venda_ids):
+    """converter_reservas para várias vendas, com as reservas somadas por item."""
+    reservas = ReservaEstoque.objects.filter(venda_id__in=venda_ids, status='ATIVA')
+    totais = _totais_por_item(reservas)
+    agora = timezone.now()
+    for stock_item_id, total in totais.items():
+        StockItem.objects.filter(pk=stock_item_id).update(
+            quantity=F('quantity') - total,
+            reserved_quantity=F('reserved_quantity') - total,
+            last_updated=agora
+        )
+    reservas.update(status='CONVERTIDA')
+    return bool(totais)
+
+
+def liberar_reservas(venda_ids):
+    """
+    Devolve ao disponível as reservas ATIVAS das vendas informadas, somadas por item.
+    Chamar dentro de uma transação. Retorna quantas reservas foram liberadas.
+    """
+    reservas = ReservaEstoque.objects.filter(venda_id__in=venda_ids, status='ATIVA')
+    totais = _totais_por_item(reservas)
+    agora = timezone.now()
+    for stock_item_id, total in totais.items():
+        StockItem.objects.filter(pk=stock_item_id).update(
+            reserved_quantity=F('reserved_quantity') - total, last_updated=agora
+        )
+    return reservas.update(status='LIBERADA')
+
+
+def liberar_reservas_expiradas(agora=None):
+    """
+    Cancela, em lote, os pedidos que ainda aguardam pagamento e cujas reservas venceram,
+    devolvendo o estoque reservado. Retorna quantos pedidos foram cancelados.
+    """
+    agora = agora or timezone.now()
+    with transaction.atomic():
+        expiradas = ReservaEstoque.objects.filter(status='ATIVA', expira_em__lte=agora).values('venda_id')
+        # Trava as vendas antes do estoque, na mesma ordem usada pela confirmação de pagamento.
+        venda_ids = list(
+            Venda.objects.select_for_update().filter(pk__in=expiradas, status='AGUARDANDO_PAGAMENTO')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        if not venda_ids:
+            return 0
+        liberar_reservas(venda_ids)
+        Venda.objects.filter(pk__in=venda_ids).update(
+            status='CANCELADO', estoque_devolvido=True, sequencia=proxima_sequencia()
+        )
+        mover_vendas(dict.fromkeys(venda_ids, 'AGUARDANDO_PAGAMENTO'), 'CANCELADO')
+        publicar_mudanca_status(venda_ids, 'CANCELADO')
+    return len(venda_ids)
+
+
+def estornar_estoque(venda_ids):
+    """
+    Devolve ao estoque físico os itens das vendas informadas: uma query agrupa os
+    itens por StockItem (via MenuProduct.stock_item) e cada item recebe um único
+    incremento com F(). Chamar dentro de uma transação, com as vendas travadas e
+    só para vendas cujo estoque foi de fato baixado. Vendas com estoque_devolvido
+    são ignoradas; quem chama deve marcá-las no mesmo UPDATE do cancelamento.
+    Retorna {stock_item_id: total}.
+    """
+    totais = dict(
+        ItemVenda.objects.filter(venda_id__in=venda_ids, venda__estoque_devolvido=False, produto__stock_item__isnull=False)
+        .values('produto__stock_item').annotate(total=Sum('quantidade'))
+        .order_by('produto__stock_item').values_list('produto__stock_item', 'total')
+    )
+    agora = timezone.now()
+    for stock_item_id, total in totais.items():
+        StockItem.objects.filter(pk=stock_item_id).update(quantity=F('quantity') + total, last_updated=agora)
+    return totais
+
+
+def transicionar_vendas(venda_ids, novo_status):
+    """
+    Leva várias vendas para `novo_status` de uma vez, seguindo Venda.TRANSICOES_STATUS.
+
+    As vendas são travadas e validadas uma a uma; todas as transições permitidas
+    são gravadas com um único UPDATE ... WHERE status IN (origens permitidas).
+    Na confirmação, as reservas viram baixa; no cancelamento, as reservas ativas
+    são liberadas e as demais vendas têm o estoque estornado, tudo somado por item.
+    Retorna um resultado por id, na ordem recebida:
+    {'id', 'result': 'alterada' | 'recusada' | 'nao_encontrada', 'status', 'error'?}.
+    """
+    origens = [atual for atual, destinos in Venda.TRANSICOES_STATUS.items() if novo_status in destinos]
+
+    with transaction.atomic():
+        atuais = dict(
+            Venda.objects.select_for_update().filter(pk__in=venda_ids).order_by('pk').values_list('pk', 'status')
+        )
+        permitidas = sorted({pk for pk in venda_ids if atuais.get(pk) in origens})
+
+        if permitidas:
+            campos = {}
+            if novo_status == 'CANCELADO':
+                campos['estoque_devolvido'] = True
+                # Pedidos ainda reservados só devolvem a reserva; o estoque físico nunca foi baixado.
+                reservadas = set(
+                    ReservaEstoque.objects.filter(venda_id__in=permitidas, status='ATIVA').values_list('venda_id', flat=True)
+                )
+                if reservadas:
+                    liberar_reservas(reservadas)
+                baixadas = [pk for pk in permitidas if pk not in reservadas]
+                if baixadas:
+                    estornar_estoque(baixadas)
+            else:
+                aguardando = [pk for pk in permitidas if atuais[pk] == 'AGUARDANDO_PAGAMENTO']
+                if aguardando:
+                    converter_reservas_das_vendas(aguardando)
+            Venda.objects.filter(pk__in=permitidas, status__in=origens).update(
+                status=novo_status, sequencia=proxima_sequencia(), **campos
+            )
+            mover_vendas({pk: atuais[pk] for pk in permitidas}, novo_status)
+            publicar_mudanca_status(permitidas, novo_status)
+
+    permitidas = set(permitidas)
+    resultados = []
+    for pk in venda_ids:
+        if pk not in atuais:
+            resultados.append({'id': pk, 'result': 'nao_encontrada', 'error': "Pedido não encontrado."})
+        elif pk in permitidas:
+            resultados.append({'id': pk, 'result': 'alterada', 'status': novo_status})
+        else:
+            resultados.append({
+                'id': pk, 'result': 'recusada', 'status': atuais[pk],
+                'error': f"Transição não permitida: {atuais[pk]} -> {novo_status}.",
+            })
+    return resultados
+
+
+def sincronizar_vendas_offline(vendas):
+    """
+    Aplica as vendas que um terminal PDV acumulou offline, todas em um único lote.
+
+    `vendas` são os dicts validados por VendaOfflineInputSerializer. UUIDs já
+    gravados (reenvio da mesma fila) ou repetidos no próprio lote não geram nova
+    venda. Retorna um resultado por venda, na mesma ordem:
+    {'client_uuid', 'status': 'criada' | 'duplicada' | 'erro', 'venda_id' ou 'error'}.
+    """
+    uuids = [venda['client_uuid'] for venda in vendas]
+    # Uma venda reenviada pode já ter sido arquivada (orders/arquivo.py): o UUID continua valendo.
+    existentes = dict(
+        Venda.objects.filter(uuid_cliente__in=uuids).order_by().values_list('uuid_cliente', 'pk').union(
+            VendaArquivada.objects.filter(uuid_cliente__in=uuids).values_list('uuid_cliente', 'pk'), all=True
+        )
+    )
+
+    novas = []
+    vistos = set()
+    for venda in vendas:
+        if venda['client_uuid'] not in existentes and venda['client_uuid'] not in vistos:
+            vistos.add(venda['client_uuid'])
+            novas.append(venda)
+
+    gravadas = registrar_vendas_em_lote([
+        {
+            'carrinho': venda['items'],
+            'payment_method': venda['payment_method'],
+            'data_venda': venda.get('created_at'),
+            'uuid_cliente': venda['client_uuid'],
+        }
+        for venda in novas
+    ])
+    for venda, resultado in zip(novas, gravadas):
+        if not isinstance(resultado, Exception):
+            existentes[venda['client_uuid']] = resultado.pk
+
+    resultados = []
+    criadas = set()
+    erros = {venda['client_uuid']: r for venda, r in zip(novas, gravadas) if isinstance(r, Exception)}
+    for venda in vendas:
+        client_uuid = venda['client_uuid']
+        if client_uuid in erros:
+            resultados.append({'client_uuid': client_uuid, 'status': 'erro', 'error': erros[client_uuid].mensagem})
+        elif client_uuid in vistos and client_uuid not in criadas:
+            criadas.add(client_uuid)
+            resultados.append({'client_uuid': client_uuid, 'status': 'criada', 'venda_id': existentes[client_uuid]})
+        else:
+            resultados.append({'client_uuid': client_uuid, 'status': 'duplicada', 'venda_id': existentes[client_uuid]})
+    return resultados
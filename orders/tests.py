@@ -1,3 +1,1154 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import tempfile
+import threading
+import uuid
+import warnings
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from lanchonete_backend_python.testing import OrcamentoQueriesMixin
+from stock.models import StockItem, MenuProduct
+from stock.forecasting import load_daily_consumption
+from stock.services import fold_shards
+from users.models import CustomUser
+from .arquivo import arquivar_vendas, meses_arquivados
+from .benchmark import limpar_catalogo, semear_catalogo
+from .cache_relatorios import cache_relatorios
+from .models import (
+    Venda, ItemVenda, ReservaEstoque, DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales,
+    VendaArquivada, ArquivoMensal,
+)
+from .services import (
+    registrar_venda, registrar_vendas_em_lote, liberar_reservas_expiradas, EstoqueInsuficiente, ProdutoNaoEncontrado
+)
+from .idempotencia import cache_respostas
+from .eventos import hub, resgatar_ingresso
+
+
+def criar_produto(nome, quantidade, preco='10.00', stock_item=None):
+    if stock_item is None:
+        stock_item = StockItem.objects.create(name=nome, quantity=quantidade, cost_price=Decimal('4.00'))
+    return MenuProduct.objects.create(stock_item=stock_item, name=nome, sale_price=Decimal(preco))
+
+
+class CriarVendaViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse('create-sale')
+        self.coxinha = criar_produto('Coxinha', 10, '6.50')
+        self.refri = criar_produto('Refrigerante', 5, '5.00')
+
+    def test_venda_pdv_baixa_estoque_e_grava_itens(self):
+        response = self.client.post(self.url, {
+            'payment_method': 'PIX',
+            'items': [{'product_id': self.coxinha.id, 'quantity': 2}, {'product_id': self.refri.id, 'quantity': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'PAGO')
+        self.assertEqual(Decimal(response.data['valor_total']), Decimal('18.00'))
+        self.assertEqual(len(response.data['itens']), 2)
+        self.coxinha.stock_item.refresh_from_db()
+        self.refri.stock_item.refresh_from_db()
+        self.assertEqual(self.coxinha.stock_item.quantity, 8)
+        self.assertEqual(self.refri.stock_item.quantity, 4)
+
+    def test_produtos_com_mesmo_item_de_estoque_somam_a_demanda(self):
+        combo = criar_produto('Coxinha Dupla', None, '12.00', stock_item=self.coxinha.stock_item)
+        response = self.client.post(self.url, {
+            'payment_method': 'DINHEIRO',
+            'items': [{'product_id': self.coxinha.id, 'quantity': 6}, {'product_id': combo.id, 'quantity': 5}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.coxinha.stock_item.refresh_from_db()
+        self.assertEqual(self.coxinha.stock_item.quantity, 10)
+
+    def test_estoque_insuficiente_desfaz_baixas_anteriores(self):
+        response = self.client.post(self.url, {
+            'payment_method': 'PIX',
+            'items': [{'product_id': self.coxinha.id, 'quantity': 2}, {'product_id': self.refri.id, 'quantity': 50}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Estoque insuficiente para: Refrigerante', response.data['error'])
+        self.coxinha.stock_item.refresh_from_db()
+        self.assertEqual(self.coxinha.stock_item.quantity, 10)
+        self.assertFalse(Venda.objects.exists())
+
+    def test_produto_inexistente(self):
+        response = self.client.post(self.url, {
+            'payment_method': 'PIX',
+            'items': [{'product_id': 9999, 'quantity': 1}],
+        }, format='json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error'], 'Produto com ID 9999 não encontrado.')
+
+    def test_numero_de_queries_so_cresce_com_as_baixas_de_estoque(self):
+        produtos = [criar_produto(f'Produto {i}', 100) for i in range(11)]
+
+        # savepoint/release (2) + produtos (1) + trava do estoque (1)
+        # + um UPDATE por item de estoque (n) + sequência de alterações (2: UPDATE
+        # e SELECT do contador; no PostgreSQL, 1) + venda (1) + bulk_create dos
+        # itens (1) + resumos diários (2) + resumos por hora (2) = 12 + n
+        with self.assertNumQueries(12 + 1):
+            registrar_venda([{'product_id': produtos[0].id, 'quantity': 1}], 'PIX')
+        with self.assertNumQueries(12 + 10):
+            registrar_venda([{'product_id': p.id, 'quantity': 1} for p in produtos[1:]], 'PIX')
+        self.assertEqual(ItemVenda.objects.count(), 11)
+
+
+class IdempotenciaVendaTests(TestCase):
+    def setUp(self):
+        cache_respostas.limpar()
+        self.client = APIClient()
+        self.url = reverse('create-sale')
+        self.produto = criar_produto('Coxinha', 10)
+        self.payload = {'payment_method': 'PIX', 'items': [{'product_id': self.produto.id, 'quantity': 3}]}
+
+    def test_reenvio_devolve_resposta_original_sem_baixar_estoque(self):
+        primeira = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        segunda = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(primeira.status_code, 201)
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(Venda.objects.count(), 1)
+        self.produto.stock_item.refresh_from_db()
+        self.assertEqual(self.produto.stock_item.quantity, 7)
+
+    def test_reenvio_consulta_a_tabela_quando_o_cache_esta_frio(self):
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        cache_respostas.limpar()
+
+        with self.assertNumQueries(1):
+            segunda = self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.assertEqual(segunda.status_code, 201)
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_chaves_diferentes_criam_vendas_diferentes(self):
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='a')
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='b')
+        self.assertEqual(Venda.objects.count(), 2)
+
+    def test_mesma_chave_com_outro_corpo_e_recusada(self):
+        self.client.post(self.url, self.payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        outro = {**self.payload, 'items': [{'product_id': self.produto.id, 'quantity': 1}]}
+
+        response = self.client.post(self.url, outro, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        cache_respostas.limpar()
+        sem_cache = self.client.post(self.url, outro, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(sem_cache.status_code, 422)
+        self.assertEqual(Venda.objects.count(), 1)
+
+    def test_chave_vale_so_para_o_mesmo_usuario(self):
+        ana = CustomUser.objects.create_user(email='ana@escola.com', password='senha-123', first_name='Ana')
+        bia = CustomUser.objects.create_user(email='bia@escola.com', password='senha-123', first_name='Bia')
+        payload = {**self.payload, 'payment_method': 'ONLINE'}
+        self.client.force_authenticate(ana)
+        primeira = self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+        self.client.force_authenticate(bia)
+        segunda = self.client.post(self.url, payload, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+
+        self.assertEqual(segunda.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', segunda)
+        self.assertNotEqual(segunda.json()['id'], primeira.json()['id'])
+        self.assertEqual(Venda.objects.count(), 2)
+
+
+class VendasEmLoteTests(TestCase):
+    def test_lote_grava_pedidos_validos_e_isola_os_invalidos(self):
+        coxinha = criar_produto('Coxinha', 5)
+        refri = criar_produto('Refrigerante', 10)
+        pedidos = [
+            {'carrinho': [{'product_id': coxinha.id, 'quantity': 3}], 'payment_method': 'PIX'},
+            {'carrinho': [{'product_id': coxinha.id, 'quantity': 3}], 'payment_method': 'PIX'},
+            {'carrinho': [{'product_id': 9999, 'quantity': 1}], 'payment_method': 'PIX'},
+            {'carrinho': [{'product_id': coxinha.id, 'quantity': 2}, {'product_id': refri.id, 'quantity': 1}],
+             'payment_method': 'ONLINE'},
+        ]
+
+        # produtos (1) + trava (1) + baixa (1) + reservas do pedido online (2) + vendas (1) + itens (1)
+        # + registro das reservas (1) + savepoint/release (2) + savepoint/release das baixas do lote (2)
+        with self.assertNumQueries(18):
+            resultados = registrar_vendas_em_lote(pedidos)
+
+        self.assertIsInstance(resultados[0], Venda)
+        self.assertIsInstance(resultados[1], EstoqueInsuficiente)
+        self.assertIsInstance(resultados[2], ProdutoNaoEncontrado)
+        self.assertEqual(resultados[3].status, 'AGUARDANDO_PAGAMENTO')
+        self.assertEqual(ItemVenda.objects.filter(venda=resultados[3]).count(), 2)
+        coxinha.stock_item.refresh_from_db()
+        self.assertEqual(coxinha.stock_item.quantity, 2)
+        self.assertEqual(coxinha.stock_item.available_quantity, 0)
+
+
+class ReservaEstoqueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.aluno = CustomUser.objects.create_user(email='aluno@escola.com', password='senha-123', first_name='Ana')
+        self.equipe = CustomUser.objects.create_user(
+            email='caixa@escola.com', password='senha-123', first_name='Caio', role='equipe'
+        )
+        self.produto = criar_produto('Coxinha', 5)
+        self.stock_item = self.produto.stock_item
+
+    def pedido_online(self, quantidade=3):
+        self.client.force_authenticate(self.aluno)
+        return self.client.post(reverse('create-sale'), {
+            'payment_method': 'NA_RETIRADA',
+            'items': [{'product_id': self.produto.id, 'quantity': quantidade}],
+        }, format='json')
+
+    def test_pedido_online_reserva_sem_baixar_o_estoque_fisico(self):
+        response = self.pedido_online()
+
+        self.assertEqual(response.status_code, 201)
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.quantity, 5)
+        self.assertEqual(self.stock_item.reserved_quantity, 3)
+        self.assertEqual(self.stock_item.available_quantity, 2)
+
+        # O balcão não pode vender o que está reservado.
+        with self.assertRaises(EstoqueInsuficiente):
+            registrar_venda([{'product_id': self.produto.id, 'quantity': 3}], 'DINHEIRO')
+
+    def test_confirmar_pagamento_converte_reserva_em_baixa(self):
+        venda_id = self.pedido_online().data['id']
+
+        response = self.client.post(reverse('confirm-payment', args=[venda_id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.quantity, 2)
+        self.assertEqual(self.stock_item.reserved_quantity, 0)
+        self.assertEqual(ReservaEstoque.objects.get(venda_id=venda_id).status, 'CONVERTIDA')
+
+    def test_cancelamento_pela_equipe_libera_reserva_sem_estornar(self):
+        venda_id = self.pedido_online().data['id']
+        self.client.force_authenticate(self.equipe)
+
+        response = self.client.patch(reverse('sale-detail', args=[venda_id]), {'status': 'CANCELADO'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.quantity, 5)
+        self.assertEqual(self.stock_item.reserved_quantity, 0)
+
+    def test_liberador_cancela_pedidos_com_reserva_vencida(self):
+        vencido = self.pedido_online(2).data['id']
+        em_dia = self.pedido_online(1).data['id']
+        ReservaEstoque.objects.filter(venda_id=vencido).update(expira_em=timezone.now() - timedelta(minutes=1))
+
+        self.assertEqual(liberar_reservas_expiradas(), 1)
+
+        self.assertEqual(Venda.objects.get(pk=vencido).status, 'CANCELADO')
+        self.assertEqual(Venda.objects.get(pk=em_dia).status, 'AGUARDANDO_PAGAMENTO')
+        self.stock_item.refresh_from_db()
+        self.assertEqual(self.stock_item.reserved_quantity, 1)
+
+
+class SincronizarVendasViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='pdv@escola.com', password='senha-123', first_name='PDV', role='equipe'
+        ))
+        self.url = reverse('sync-sales')
+        self.coxinha = criar_produto('Coxinha', 100)
+        self.refri = criar_produto('Refrigerante', 100)
+
+    def venda(self, **extra):
+        dados = {
+            'client_uuid': str(uuid.uuid4()),
+            'created_at': '2025-06-10T12:30:00Z',
+            'payment_method': 'DINHEIRO',
+            'items': [{'product_id': self.coxinha.id, 'quantity': 1}, {'product_id': self.refri.id, 'quantity': 1}],
+        }
+        dados.update(extra)
+        return dados
+
+    def test_lote_grande_usa_numero_fixo_de_queries(self):
+        vendas = [self.venda() for _ in range(50)]
+
+        # UUIDs existentes (1) + produtos (1) + trava (1) + baixas (2) + vendas (1) + itens (1) + savepoint/release (2)
+        # + savepoint/release das baixas do lote (2)
+        with self.assertNumQueries(17):
+            response = self.client.post(self.url, {'sales': vendas}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(r['status'] == 'criada' for r in response.data['results']))
+        self.coxinha.stock_item.refresh_from_db()
+        self.assertEqual(self.coxinha.stock_item.quantity, 50)
+        self.assertEqual(Venda.objects.first().data_venda.day, 10)
+
+    def test_reenvio_nao_duplica_e_erros_sao_por_venda(self):
+        primeira = self.venda()
+        self.client.post(self.url, {'sales': [primeira]}, format='json')
+
+        response = self.client.post(self.url, {'sales': [
+            primeira,
+            self.venda(items=[{'product_id': self.coxinha.id, 'quantity': 500}]),
+            self.venda(payment_method='ONLINE'),
+            self.venda(),
+        ]}, format='json')
+
+        status_por_venda = [r['status'] for r in response.data['results']]
+        self.assertEqual(status_por_venda, ['duplicada', 'erro', 'erro', 'criada'])
+        self.assertEqual(Venda.objects.count(), 2)
+        self.coxinha.stock_item.refresh_from_db()
+        self.assertEqual(self.coxinha.stock_item.quantity, 98)
+
+
+class TransicaoStatusLoteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='cozinha@escola.com', password='senha-123', first_name='Cida', role='equipe'
+        ))
+        self.coxinha = criar_produto('Coxinha', 20)
+        self.suco = criar_produto('Suco', 20)
+
+    def vender(self, payment_method='DINHEIRO', quantidade=1):
+        return registrar_venda([
+            {'product_id': self.coxinha.id, 'quantity': quantidade},
+            {'product_id': self.suco.id, 'quantity': 1},
+        ], payment_method)
+
+    def transicionar(self, ids, novo_status):
+        return self.client.post(reverse('bulk-sale-status'), {'ids': ids, 'status': novo_status}, format='json')
+
+    def test_aplica_as_permitidas_e_recusa_as_demais(self):
+        vendas = [self.vender() for _ in range(3)]
+        Venda.objects.filter(pk=vendas[2].pk).update(status='FINALIZADO')
+
+        response = self.transicionar([vendas[0].pk, vendas[1].pk, vendas[2].pk, 9999], 'PRONTO')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['result'] for r in response.data['results']], ['alterada', 'alterada', 'recusada', 'nao_encontrada'])
+        self.assertEqual(response.data['results'][2]['status'], 'FINALIZADO')
+        self.assertEqual(
+            list(Venda.objects.order_by('pk').values_list('status', flat=True)), ['PRONTO', 'PRONTO', 'FINALIZADO']
+        )
+
+    def test_cancelamento_em_lote_estorna_somado_e_libera_reservas(self):
+        pagas = [self.vender(quantidade=2) for _ in range(3)]
+        reservada = self.vender('NA_RETIRADA', quantidade=4)
+
+        # Não cresce com o número de pedidos: um incremento por item de estoque e um único UPDATE das vendas.
+        with self.assertNumQueries(24):
+            response = self.transicionar([venda.pk for venda in pagas] + [reservada.pk], 'CANCELADO')
+
+        self.assertTrue(all(r['result'] == 'alterada' for r in response.data['results']))
+        coxinha = StockItem.objects.get(pk=self.coxinha.stock_item_id)
+        self.assertEqual((coxinha.quantity, coxinha.reserved_quantity), (20, 0))
+        self.assertEqual(StockItem.objects.get(pk=self.suco.stock_item_id).quantity, 20)
+
+        # Repetir o cancelamento não estorna de novo: as vendas já não aceitam a transição.
+        response = self.transicionar([pagas[0].pk], 'CANCELADO')
+        self.assertEqual(response.data['results'][0]['result'], 'recusada')
+        self.assertEqual(StockItem.objects.get(pk=self.coxinha.stock_item_id).quantity, 20)
+
+    def test_status_invalido(self):
+        self.assertEqual(self.transicionar([1], 'VOANDO').status_code, 400)
+
+
+class EstornoCancelamentoTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='caixa@escola.com', password='senha-123', first_name='Caio', role='equipe'
+        ))
+        self.produtos = [criar_produto(f'Produto {i}', 10) for i in range(5)]
+        # Dois produtos do cardápio vendendo o mesmo item de estoque.
+        self.produtos.append(criar_produto('Produto Combo', 0, stock_item=self.produtos[0].stock_item))
+        self.venda = registrar_venda([{'product_id': p.id, 'quantity': 2} for p in self.produtos], 'DINHEIRO')
+
+    def cancelar(self):
+        return self.client.patch(reverse('sale-detail', args=[self.venda.pk]), {'status': 'CANCELADO'}, format='json')
+
+    def quantidades(self):
+        return list(StockItem.objects.order_by('pk').values_list('quantity', flat=True))
+
+    def test_estorno_agrupado_com_numero_fixo_de_queries(self):
+        self.assertEqual(self.quantidades(), [6, 8, 8, 8, 8])
+
+        # 6 linhas, 5 itens de estoque: uma query agrupa os itens e cada StockItem recebe um único
+        # incremento; o resto (trava, reservas, sequência, gravação, resumos diários) é fixo.
+        with self.assertNumQueries(19 + 5):
+            response = self.cancelar()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.quantidades(), [10] * 5)
+
+    def test_cancelar_de_novo_nao_estorna_duas_vezes(self):
+        self.cancelar()
+        self.cancelar()
+
+        self.assertEqual(self.quantidades(), [10] * 5)
+        self.assertTrue(Venda.objects.get(pk=self.venda.pk).estoque_devolvido)
+
+    def test_pedido_cancelado_nao_volta_a_ser_pago(self):
+        self.cancelar()
+
+        response = self.client.patch(reverse('sale-detail', args=[self.venda.pk]), {'status': 'PAGO'}, format='json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Venda.objects.get(pk=self.venda.pk).status, 'CANCELADO')
+        self.assertEqual(self.quantidades(), [10] * 5)
+
+
+class ResumosDiariosTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        self.coxinha = criar_produto('Coxinha', 100, preco='6.00')
+        self.suco = criar_produto('Suco', 100, preco='4.00')
+
+    def linhas(self):
+        return (
+            sorted(DailySalesSummary.objects.values_list('day', 'payment_method', 'status_group', 'order_count', 'revenue')),
+            sorted(DailyProductSales.objects.values_list('day', 'status_group', 'product_name', 'quantity', 'revenue')),
+            sorted(HourlySalesSummary.objects.values_list('day', 'hour', 'status_group', 'order_count', 'revenue')),
+            sorted(HourlyProductSales.objects.values_list('day', 'hour', 'status_group', 'product_name', 'quantity')),
+        )
+
+    def movimentar(self):
+        carrinho = [{'product_id': self.coxinha.id, 'quantity': 2}, {'product_id': self.suco.id, 'quantity': 1}]
+        registrar_venda(carrinho, 'PIX')
+        cancelada = registrar_venda(carrinho, 'PIX')
+        online = registrar_venda(carrinho, 'ONLINE')
+        registrar_venda(carrinho, 'NA_RETIRADA')
+        registrar_vendas_em_lote([
+            {'carrinho': carrinho, 'payment_method': 'DINHEIRO', 'data_venda': timezone.now() - timedelta(days=3)},
+        ])
+        self.client.patch(reverse('sale-detail', args=[cancelada.pk]), {'status': 'CANCELADO'}, format='json')
+        self.client.patch(reverse('sale-detail', args=[online.pk]), {'status': 'EM_PREPARO'}, format='json')
+
+    def test_incremental_bate_com_a_reconstrucao(self):
+        self.movimentar()
+        incremental = self.linhas()
+
+        call_command('reconstruir_resumos', stdout=io.StringIO())
+
+        self.assertEqual(self.linhas(), incremental)
+        hoje = timezone.localdate()
+        self.assertIn((hoje, 'PIX', 'FATURADO', 1, Decimal('16.00')), incremental[0])
+        self.assertIn((hoje, 'PIX', 'CANCELADO', 1, Decimal('16.00')), incremental[0])
+        self.assertIn((hoje, 'NA_RETIRADA', 'PENDENTE', 1, Decimal('16.00')), incremental[0])
+
+    def test_migracoes_preenchem_os_resumos(self):
+        self.movimentar()
+        incremental = self.linhas()
+        for tabela in (DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales):
+            tabela.objects.all().delete()
+
+        importlib.import_module('orders.migrations.0011_resumos_diarios').preencher_resumos(django_apps, None)
+        importlib.import_module('orders.migrations.0014_resumos_por_hora').preencher_resumos_por_hora(django_apps, None)
+
+        self.assertEqual(self.linhas(), incremental)
+
+    def test_relatorio_le_os_resumos(self):
+        self.movimentar()
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('sales-report'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resumo']['total_pedidos'], 3)
+        self.assertEqual(response.data['resumo']['faturamento_total'], Decimal('48.00'))
+        self.assertEqual(response.data['resumo']['ticket_medio'], Decimal('16.00'))
+        self.assertEqual(len(response.data['vendas_por_dia']), 2)
+        self.assertEqual(response.data['top_produtos'][0], {'nome_produto': 'Coxinha', 'quantidade_vendida': 6})
+        self.assertEqual(
+            {linha['payment_method']: linha['total'] for linha in response.data['vendas_por_pagamento']},
+            {'PIX': Decimal('16.00'), 'ONLINE': Decimal('16.00'), 'DINHEIRO': Decimal('16.00')}
+        )
+
+
+class BenchmarkTests(TestCase):
+    def test_limpar_catalogo_desconta_as_vendas_dos_resumos(self):
+        product_ids = semear_catalogo(2, quantidade=10)
+        vendas = [
+            registrar_venda([{'product_id': product_id, 'quantity': 1}], 'PIX').pk for product_id in product_ids
+        ]
+
+        limpar_catalogo(venda_ids=vendas)
+
+        self.assertFalse(Venda.objects.exists())
+        for tabela in (DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales):
+            self.assertFalse(tabela.objects.exists())
+
+
+class BenchCicloPedidosTests(TransactionTestCase):
+    # Os clientes do benchmark rodam em threads, cada uma com a sua conexão.
+    serialized_rollback = True
+
+    def test_um_cliente_roda_o_ciclo_e_apaga_o_que_criou(self):
+        saida = io.StringIO()
+        call_command('bench_ciclo_pedidos', clientes=1, ciclos=2, produtos=3, itens=2, stdout=saida)
+
+        relatorio = json.loads(saida.getvalue())
+        self.assertEqual(relatorio['erros'], 0, relatorio.get('primeiro_erro'))
+        self.assertEqual(relatorio['endpoints']['checkout']['operacoes'], 2)
+        self.assertEqual(relatorio['endpoints']['atualizar_status']['operacoes'], 6)
+        self.assertFalse(Venda.objects.exists())
+        self.assertFalse(StockItem.objects.exists())
+        self.assertFalse(CustomUser.objects.filter(email__endswith='@bench.local').exists())
+        for tabela in (DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales):
+            self.assertFalse(tabela.objects.exists())
+
+
+class BenchContencaoEstoqueTests(TransactionTestCase):
+    # As vendas do benchmark rodam em threads, cada uma com a sua conexão.
+    serialized_rollback = True
+
+    def test_um_cliente_nos_dois_modos_e_apaga_o_que_criou(self):
+        saida = io.StringIO()
+        call_command('bench_contencao_estoque', clientes=1, vendas=3, shards=2, stdout=saida)
+
+        relatorio = json.loads(saida.getvalue())
+        for modo in ('linha_unica', 'fragmentado'):
+            self.assertEqual(relatorio[modo]['erros'], 0, relatorio[modo].get('primeiro_erro'))
+            self.assertEqual(relatorio[modo]['operacoes'], 3)
+            self.assertTrue(relatorio[modo]['estoque_consistente'])
+        self.assertFalse(Venda.objects.exists())
+        self.assertFalse(StockItem.objects.exists())
+        for tabela in (DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales):
+            self.assertFalse(tabela.objects.exists())
+
+
+class LucratividadeTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        self.coxinha = criar_produto('Coxinha', 100, preco='6.00')
+
+    def test_usa_o_custo_da_epoca_da_venda(self):
+        registrar_venda([{'product_id': self.coxinha.id, 'quantity': 2}], 'PIX')
+        StockItem.objects.filter(pk=self.coxinha.stock_item_id).update(cost_price=Decimal('5.00'))
+        registrar_venda([{'product_id': self.coxinha.id, 'quantity': 1}], 'PIX')
+
+        # Itens vivos (1) + manifesto do arquivo (1)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('product-profitability-report'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        linha = response.data[0]
+        self.assertEqual(linha['quantidade_vendida'], 3)
+        self.assertEqual(linha['receita_total'], Decimal('18.00'))
+        self.assertEqual(linha['custo_total'], Decimal('13.00'))
+        self.assertEqual(linha['lucro_bruto'], Decimal('5.00'))
+
+
+class CacheRelatoriosTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        self.coxinha = criar_produto('Coxinha', 100, preco='6.00')
+
+    def vender(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return registrar_venda([{'product_id': self.coxinha.id, 'quantity': 1}], 'PIX')
+
+    def test_repeticao_sai_do_cache_e_venda_de_hoje_invalida(self):
+        self.vender()
+        url = reverse('sales-report')
+        self.assertEqual(self.client.get(url).data['resumo']['total_pedidos'], 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['resumo']['total_pedidos'], 1)
+
+        self.vender()
+        self.assertEqual(self.client.get(url).data['resumo']['total_pedidos'], 2)
+
+    def test_mudanca_de_status_invalida_a_lucratividade(self):
+        venda = self.vender()
+        url = reverse('product-profitability-report')
+        self.assertEqual(self.client.get(url).data[0]['quantidade_vendida'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('sale-detail', args=[venda.pk]), {'status': 'EM_PREPARO'}, format='json')
+
+        self.assertEqual(self.client.get(url).data, [])
+
+    def test_periodo_fechado_nao_e_recalculado(self):
+        ontem = (timezone.localdate() - timedelta(days=1)).isoformat()
+        url = reverse('product-profitability-report')
+        params = {'start_date': ontem, 'end_date': ontem}
+        self.assertEqual(self.client.get(url, params).data, [])
+
+        self.vender()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, params).data, [])
+
+    def test_data_invalida(self):
+        response = self.client.get(reverse('sales-report'), {'start_date': 'ontem'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_periodo_longo_demais_e_recusado(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('sales-report'), {'start_date': '0001-01-01', 'end_date': '9999-12-31'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("relatorios:geracao:5000-01-01", cache_relatorios())
+
+
+@override_settings(TIME_ZONE='America/Sao_Paulo')
+class PeriodoRelatoriosTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        coxinha = criar_produto('Coxinha', 100, preco='6.00')
+        # 01:30 em UTC ainda é o dia 9 em São Paulo (22:30).
+        registrar_vendas_em_lote([{
+            'carrinho': [{'product_id': coxinha.id, 'quantity': 1}], 'payment_method': 'PIX',
+            'data_venda': datetime(2026, 3, 10, 1, 30, tzinfo=dt_timezone.utc),
+        }])
+
+    def test_dia_no_fuso_da_loja_e_end_date(self):
+        dia_9 = self.client.get(reverse('sales-report'), {'start_date': '2026-03-09', 'end_date': '2026-03-09'})
+        dia_10 = self.client.get(reverse('sales-report'), {'start_date': '2026-03-10', 'end_date': '2026-03-10'})
+
+        self.assertEqual(dia_9.data['resumo']['total_pedidos'], 1)
+        self.assertEqual(dia_9.data['vendas_por_dia'], [{'dia': date(2026, 3, 9), 'total': Decimal('6.00')}])
+        self.assertEqual(dia_10.data['resumo']['total_pedidos'], 0)
+
+    def test_lucratividade_filtra_no_fuso_da_loja(self):
+        url = reverse('product-profitability-report')
+        self.assertEqual(len(self.client.get(url, {'start_date': '2026-03-09', 'end_date': '2026-03-09'}).data), 1)
+        self.assertEqual(self.client.get(url, {'start_date': '2026-03-10', 'end_date': '2026-03-10'}).data, [])
+
+    def test_periodo_invalido(self):
+        url = reverse('sales-report')
+        self.assertEqual(self.client.get(url, {'end_date': '2026-02-30'}).status_code, 400)
+        response = self.client.get(url, {'start_date': '2026-03-10', 'end_date': '2026-03-09'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_date', response.data)
+
+
+class MapaDeCalorTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        coxinha = criar_produto('Coxinha', 100, preco='6.00')
+        suco = criar_produto('Suco', 100, preco='4.00')
+        registrar_vendas_em_lote([
+            # Segunda, 12h e quarta, 18h (UTC, o fuso dos testes).
+            {'carrinho': [{'product_id': coxinha.id, 'quantity': 2}], 'payment_method': 'PIX',
+             'data_venda': datetime(2026, 3, 9, 12, 15, tzinfo=dt_timezone.utc)},
+            {'carrinho': [{'product_id': suco.id, 'quantity': 1}, {'product_id': coxinha.id, 'quantity': 1}],
+             'payment_method': 'DINHEIRO', 'data_venda': datetime(2026, 3, 11, 18, 40, tzinfo=dt_timezone.utc)},
+        ])
+        self.params = {'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+    def test_matriz_densa_e_series_por_produto(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('sales-heatmap'), self.params)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([len(linha) for linha in response.data['pedidos']], [24] * 7)
+        self.assertEqual(response.data['pedidos'][0][12], 1)
+        self.assertEqual(response.data['pedidos'][2][18], 1)
+        self.assertEqual(sum(map(sum, response.data['pedidos'])), 2)
+        self.assertEqual(response.data['faturamento'][0][12], Decimal('12.00'))
+        coxinha, suco = response.data['produtos']
+        self.assertEqual(coxinha['nome_produto'], 'Coxinha')
+        self.assertEqual(coxinha['quantidade_total'], 3)
+        self.assertEqual((coxinha['por_hora'][12], coxinha['por_hora'][18]), (2, 1))
+        self.assertEqual(suco['por_hora'][18], 1)
+
+    def test_limite_de_produtos(self):
+        response = self.client.get(reverse('sales-heatmap'), {**self.params, 'produtos': 1})
+        self.assertEqual([produto['nome_produto'] for produto in response.data['produtos']], ['Coxinha'])
+
+
+class ExportacaoVendasTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        coxinha = criar_produto('Coxinha', 100, preco='6.00')
+        suco = criar_produto('Suco', 100, preco='4.00')
+        self.venda = registrar_venda([{'product_id': coxinha.id, 'quantity': 2}, {'product_id': suco.id, 'quantity': 1}], 'PIX')
+        registrar_vendas_em_lote([{
+            'carrinho': [{'product_id': suco.id, 'quantity': 1}], 'payment_method': 'DINHEIRO',
+            'data_venda': timezone.now() - timedelta(days=40),
+        }])
+        self.hoje = timezone.localdate().isoformat()
+
+    def exportar(self, **params):
+        return self.client.get(reverse('sales-export'), {'start_date': self.hoje, 'end_date': self.hoje, **params})
+
+    def test_csv_em_streaming(self):
+        response = self.exportar()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        linhas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(linhas[0][:3], ['venda_id', 'data_venda', 'status'])
+        self.assertEqual(len(linhas), 3)
+        self.assertEqual([linha[8] for linha in linhas[1:]], ['Coxinha', 'Suco'])
+        self.assertEqual(linhas[1][0], str(self.venda.pk))
+
+    def test_ndjson(self):
+        response = self.exportar(output='ndjson')
+
+        registros = [json.loads(linha) for linha in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(registros), 2)
+        self.assertEqual(registros[0]['nome_produto'], 'Coxinha')
+        self.assertEqual(registros[0]['preco_unitario'], '6.00')
+        self.assertEqual(registros[0]['status'], 'PAGO')
+
+    async def test_streaming_no_asgi_sem_juntar_o_corpo(self):
+        equipe = await CustomUser.objects.aget(email='gerente@escola.com')
+        response = await AsyncClient().get(
+            reverse('sales-export'), {'start_date': self.hoje, 'end_date': self.hoje},
+            headers={'Authorization': f'Bearer {AccessToken.for_user(equipe)}'},
+        )
+        # Um corpo síncrono seria lido inteiro com sync_to_async(list), com aviso.
+        self.assertTrue(response.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            partes = [parte async for parte in response.streaming_content]
+        self.assertTrue(partes[0].startswith(b'venda_id,data_venda,status'))
+        self.assertEqual(len(b''.join(partes).decode().splitlines()), 3)
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.exportar(output='xlsx').status_code, 400)
+        self.assertEqual(self.client.get(reverse('sales-export')).status_code, 400)
+
+    def test_comando(self):
+        saida = io.StringIO()
+        inicio = (timezone.localdate() - timedelta(days=60)).isoformat()
+        call_command('exportar_vendas', '--inicio', inicio, '--fim', self.hoje, '--formato', 'ndjson', stdout=saida)
+
+        self.assertEqual(len(saida.getvalue().splitlines()), 3)
+
+
+class ArquivoVendasTests(TestCase):
+    def setUp(self):
+        cache_relatorios().clear()
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.enterContext(self.settings(ORDERS_ARCHIVE_DIR=Path(pasta.name)))
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        self.coxinha = criar_produto('Coxinha', 100, preco='6.00')
+        self.suco = criar_produto('Suco', 100, preco='4.00')
+
+    def vender(self, dias_atras, status=None, uuid_cliente=None, cliente=None):
+        carrinho = [{'product_id': self.coxinha.id, 'quantity': 2}, {'product_id': self.suco.id, 'quantity': 1}]
+        [venda] = registrar_vendas_em_lote([{
+            'carrinho': carrinho, 'payment_method': 'DINHEIRO', 'uuid_cliente': uuid_cliente, 'cliente': cliente,
+            'data_venda': timezone.now() - timedelta(days=dias_atras),
+        }])
+        if status:
+            self.client.patch(reverse('sale-detail', args=[venda.pk]), {'status': status}, format='json')
+        return venda
+
+    def relatorios(self):
+        cache_relatorios().clear()
+        inicio = (timezone.localdate() - timedelta(days=365)).isoformat()
+        exportacao = self.client.get(reverse('sales-export'), {
+            'start_date': inicio, 'end_date': timezone.localdate().isoformat(), 'output': 'ndjson',
+        })
+        call_command('reconstruir_resumos', stdout=io.StringIO())
+        return (
+            self.client.get(reverse('product-profitability-report')).data,
+            sorted(b''.join(exportacao.streaming_content).decode().splitlines()),
+            sorted(DailyProductSales.objects.values_list('day', 'status_group', 'product_name', 'quantity', 'revenue')),
+            sorted(HourlyProductSales.objects.values_list('day', 'hour', 'status_group', 'product_name', 'quantity')),
+            load_daily_consumption(
+                sorted([self.coxinha.stock_item_id, self.suco.stock_item_id]), date.fromisoformat(inicio), timezone.localdate()
+            ).tolist(),
+        )
+
+    def test_relatorios_nao_mudam_com_o_arquivamento(self):
+        self.vender(200, 'FINALIZADO')
+        self.vender(250, 'CANCELADO')
+        self.vender(210)                      # PAGO: não é arquivada
+        self.vender(0, 'FINALIZADO')
+        antes = self.relatorios()
+
+        call_command('arquivar_vendas', stdout=io.StringIO())
+
+        self.assertEqual(VendaArquivada.objects.count(), 2)
+        self.assertEqual(Venda.objects.count(), 2)
+        self.assertEqual(ItemVenda.objects.count(), 4)
+        self.assertEqual(sum(ArquivoMensal.objects.values_list('linhas', flat=True)), 4)
+        self.assertEqual(self.relatorios(), antes)
+
+    def test_sobra_de_arquivamento_desfeito_e_descartada(self):
+        self.vender(200, 'FINALIZADO')
+        arquivar_vendas()
+        # Bytes de um lote cuja transação não confirmou o manifesto.
+        [manifesto] = ArquivoMensal.objects.all()
+        with open(settings.ORDERS_ARCHIVE_DIR / f'{manifesto.mes:%Y-%m}' / 'venda_id.bin', 'ab') as arquivo:
+            arquivo.write(b'\xff' * 24)
+
+        segunda = self.vender(200, 'FINALIZADO')
+        self.assertEqual(arquivar_vendas(), 1)
+
+        [mes] = meses_arquivados()
+        self.assertEqual(len(mes), 4)
+        self.assertEqual(sorted(set(mes.colunas['venda_id'].tolist()))[-1], segunda.pk)
+        self.assertEqual(mes.nomes, ['Coxinha', 'Suco'])
+
+    def test_sincronizacao_reconhece_uuid_arquivado(self):
+        client_uuid = uuid.uuid4()
+        venda = self.vender(200, 'FINALIZADO', uuid_cliente=client_uuid)
+        arquivar_vendas()
+
+        response = self.client.post(reverse('sync-sales'), {'sales': [{
+            'client_uuid': str(client_uuid), 'created_at': '2025-06-10T12:30:00Z', 'payment_method': 'DINHEIRO',
+            'items': [{'product_id': self.coxinha.id, 'quantity': 1}],
+        }]}, format='json')
+
+        self.assertEqual(response.data['results'][0]['status'], 'duplicada')
+        self.assertEqual(response.data['results'][0]['venda_id'], venda.pk)
+        self.assertFalse(Venda.objects.exists())
+
+    def test_meus_pedidos_e_detalhe_incluem_vendas_arquivadas(self):
+        aluno = CustomUser.objects.create_user(email='ana@escola.com', password='senha-123', first_name='Ana')
+        antigas = [self.vender(dias, 'FINALIZADO', cliente=aluno) for dias in (300, 200)]
+        recente = self.vender(0, cliente=aluno)
+        self.vender(250, 'FINALIZADO')        # de outro cliente
+        self.assertEqual(arquivar_vendas(), 3)
+
+        aluno_client = APIClient()
+        aluno_client.force_authenticate(aluno)
+        primeira = aluno_client.get(reverse('my-orders'), {'page_size': 2})
+        segunda = aluno_client.get(primeira.data['next'])
+
+        pedidos = primeira.data['results'] + segunda.data['results']
+        self.assertEqual([p['id'] for p in pedidos], [recente.pk, antigas[1].pk, antigas[0].pk])
+        self.assertIsNone(segunda.data['next'])
+        itens = [(i['nome_produto'], i['quantidade'], i['preco_unitario']) for i in pedidos[2]['itens']]
+        self.assertEqual(itens, [('Coxinha', 2, '6.00'), ('Suco', 1, '4.00')])
+        self.assertEqual(pedidos[2]['status'], 'FINALIZADO')
+        self.assertEqual(pedidos[2]['cliente_nome'], 'Ana')
+
+        detalhe = self.client.get(reverse('sale-detail', args=[antigas[0].pk]))
+        self.assertEqual(detalhe.status_code, 200)
+        self.assertEqual(detalhe.data['itens'], pedidos[2]['itens'])
+        # Arquivada não aceita alterações.
+        response = self.client.patch(reverse('sale-detail', args=[antigas[0].pk]), {'status': 'CANCELADO'}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+
+class AlteracoesDesdeCursorTests(TransactionTestCase):
+    # Cada venda na sua própria transação, como em produção: no PostgreSQL a
+    # sequência é o id da transação. O contador da migração volta a cada teste.
+    serialized_rollback = True
+
+    def setUp(self):
+        self.client = APIClient()
+        self.aluno = CustomUser.objects.create_user(email='aluno@escola.com', password='senha-123', first_name='Ana')
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='cozinha@escola.com', password='senha-123', first_name='Cida', role='equipe'
+        ))
+        self.produto = criar_produto('Pastel', 50)
+
+    def vender(self, cliente=None):
+        return registrar_venda([{'product_id': self.produto.id, 'quantity': 1}], 'DINHEIRO', cliente=cliente)
+
+    def test_lista_completa_informa_o_cursor_no_header(self):
+        self.vender()
+
+        response = self.client.get(reverse('active-sales-list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+        self.assertGreaterEqual(int(response['X-Cursor']), Venda.objects.get().sequencia)
+
+    def test_since_traz_so_o_que_mudou_e_os_removidos(self):
+        parado = self.vender()
+        finalizado = self.vender()
+        cursor = self.client.get(reverse('active-sales-list'))['X-Cursor']
+
+        novo = self.vender()
+        self.client.patch(reverse('sale-detail', args=[finalizado.pk]), {'status': 'FINALIZADO'}, format='json')
+
+        response = self.client.get(reverse('active-sales-list'), {'since': cursor})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([pedido['id'] for pedido in response.data['results']], [novo.pk])
+        self.assertEqual(response.data['removed'], [finalizado.pk])
+        self.assertNotIn(parado.pk, [pedido['id'] for pedido in response.data['results']])
+
+        # Sem novidades: resposta vazia e o mesmo cursor, sem ler as vendas.
+        with self.assertNumQueries(1):
+            vazio = self.client.get(reverse('active-sales-list'), {'since': response.data['cursor']})
+        self.assertEqual(vazio.data, {'cursor': response.data['cursor'], 'results': [], 'removed': []})
+
+    def test_since_nos_pedidos_do_usuario(self):
+        pedido = self.vender(cliente=self.aluno)
+        self.vender()
+        aluno = APIClient()
+        aluno.force_authenticate(self.aluno)
+        cursor = aluno.get(reverse('my-orders'))['X-Cursor']
+        self.assertFalse(aluno.get(reverse('my-orders'), {'since': cursor}).data['results'])
+
+        self.client.patch(reverse('sale-detail', args=[pedido.pk]), {'status': 'EM_PREPARO'}, format='json')
+        self.vender()
+        response = aluno.get(reverse('my-orders'), {'since': cursor})
+
+        self.assertEqual([venda['id'] for venda in response.data['results']], [pedido.pk])
+        self.assertEqual(response.data['removed'], [])
+
+    def test_pedido_apagado_vem_em_removed(self):
+        do_aluno = self.vender(cliente=self.aluno)
+        balcao = self.vender()
+        aluno = APIClient()
+        aluno.force_authenticate(self.aluno)
+        cursor_painel = self.client.get(reverse('active-sales-list'))['X-Cursor']
+        cursor_aluno = aluno.get(reverse('my-orders'))['X-Cursor']
+
+        for venda in (do_aluno, balcao):
+            self.assertEqual(self.client.delete(reverse('sale-detail', args=[venda.pk])).status_code, 204)
+
+        painel = self.client.get(reverse('active-sales-list'), {'since': cursor_painel})
+        self.assertEqual(painel.data['results'], [])
+        self.assertEqual(painel.data['removed'], [do_aluno.pk, balcao.pk])
+        # Cada cliente só recebe as remoções dos próprios pedidos.
+        self.assertEqual(aluno.get(reverse('my-orders'), {'since': cursor_aluno}).data['removed'], [do_aluno.pk])
+        vazio = self.client.get(reverse('active-sales-list'), {'since': painel.data['cursor']})
+        self.assertEqual(vazio.data['removed'], [])
+
+    def test_cursor_invalido(self):
+        response = self.client.get(reverse('active-sales-list'), {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EstoqueFragmentadoCheckoutTests(TestCase):
+    def test_venda_e_reserva_em_item_fragmentado(self):
+        produto = criar_produto('Refrigerante', 6)
+        StockItem.objects.filter(pk=produto.stock_item_id).update(counter_shards=3)
+        fold_shards([produto.stock_item_id])
+
+        registrar_venda([{'product_id': produto.id, 'quantity': 3}], 'PIX')
+        registrar_venda([{'product_id': produto.id, 'quantity': 2}], 'ONLINE')
+        with self.assertRaises(EstoqueInsuficiente):
+            registrar_venda([{'product_id': produto.id, 'quantity': 2}], 'PIX')
+
+        stock_item = StockItem.objects.get(pk=produto.stock_item_id)
+        self.assertEqual(stock_item.current_quantity, 3)
+        self.assertEqual(stock_item.reserved_quantity, 2)
+        self.assertEqual(stock_item.available_quantity, 1)
+
+
+class CotasEsgotadasTests(TransactionTestCase):
+    # Sem transação em volta, como em produção: o fold roda depois do rollback do checkout.
+    serialized_rollback = True
+
+    def setUp(self):
+        self.refri = criar_produto('Refrigerante', 6)
+        StockItem.objects.filter(pk=self.refri.stock_item_id).update(counter_shards=3)
+        fold_shards([self.refri.stock_item_id])
+        # Reposição que ainda não voltou para as cotas dos shards.
+        StockItem.objects.filter(pk=self.refri.stock_item_id).update(quantity=F('quantity') + 6)
+
+    def test_lote_isola_o_pedido_sem_cota(self):
+        coxinha = criar_produto('Coxinha', 5)
+
+        resultados = registrar_vendas_em_lote([
+            {'carrinho': [{'product_id': self.refri.id, 'quantity': 8}], 'payment_method': 'PIX'},
+            {'carrinho': [{'product_id': coxinha.id, 'quantity': 2}], 'payment_method': 'PIX'},
+        ])
+
+        self.assertIsInstance(resultados[0], EstoqueInsuficiente)
+        self.assertIsInstance(resultados[1], Venda)
+        self.assertEqual(StockItem.objects.get(pk=coxinha.stock_item_id).quantity, 3)
+        self.assertEqual(StockItem.objects.get(pk=self.refri.stock_item_id).current_quantity, 12)
+
+    def test_checkout_consolida_e_tenta_de_novo(self):
+        response = APIClient().post(
+            reverse('create-sale'),
+            {'payment_method': 'PIX', 'items': [{'product_id': self.refri.id, 'quantity': 8}]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StockItem.objects.get(pk=self.refri.stock_item_id).current_quantity, 4)
+
+
+class PaginacaoPedidosDoUsuarioTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.aluno = CustomUser.objects.create_user(email='aluno@escola.com', password='senha-123', first_name='Ana')
+        self.client.force_authenticate(self.aluno)
+        produto = criar_produto('Suco', 100)
+        self.vendas = [
+            registrar_venda([{'product_id': produto.id, 'quantity': 1}], 'PIX', cliente=self.aluno) for _ in range(5)
+        ]
+        # Empate em data_venda: o id desempata e nenhuma venda se repete ou some.
+        Venda.objects.filter(pk__in=[v.pk for v in self.vendas[1:4]]).update(data_venda=self.vendas[1].data_venda)
+
+    def test_percorre_todas_as_paginas_pelo_cursor(self):
+        esperado = list(Venda.objects.filter(cliente=self.aluno).order_by('-data_venda', '-id').values_list('pk', flat=True))
+        vistos = []
+        url = reverse('my-orders') + '?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            vistos.extend(venda['id'] for venda in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(vistos, esperado)
+
+    def test_cursor_invalido(self):
+        response = self.client.get(reverse('my-orders'), {'cursor': 'nao-e-um-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class OrcamentoQueriesListasTests(OrcamentoQueriesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.aluno = CustomUser.objects.create_user(email='aluno@escola.com', password='senha-123', first_name='Ana')
+        self.equipe = CustomUser.objects.create_user(
+            email='cozinha@escola.com', password='senha-123', first_name='Cida', role='equipe'
+        )
+        self.produtos = [criar_produto(f'Produto {i}', 1000) for i in range(3)]
+
+    def semear(self):
+        carrinho = [{'product_id': produto.id, 'quantity': 1} for produto in self.produtos]
+        for cliente in (self.aluno, None, self.aluno):
+            registrar_venda(carrinho, 'DINHEIRO', cliente=cliente)
+
+    def test_painel_de_pedidos_ativos(self):
+        self.client.force_authenticate(self.equipe)
+        # cursor + vendas (com cliente) + itens
+        response = self.assertOrcamentoQueries(self.client, reverse('active-sales-list'), 3, self.semear)
+        self.assertEqual(len(response.data), 9)
+        self.assertEqual(len(response.data[0]['itens']), 3)
+
+    def test_pedidos_do_usuario(self):
+        self.client.force_authenticate(self.aluno)
+        # +1: as vendas arquivadas do usuário (nenhuma aqui, então o arquivo nem é aberto).
+        self.assertOrcamentoQueries(self.client, reverse('my-orders'), 4, self.semear)
+
+    def test_detalhe_da_venda(self):
+        self.semear()
+        self.client.force_authenticate(self.equipe)
+        venda = Venda.objects.filter(cliente=self.aluno).first()
+        response = self.assertOrcamentoQueries(
+            self.client, reverse('sale-detail', args=[venda.pk]), 2, lambda: None, rodadas=1
+        )
+        self.assertEqual(response.data['cliente_nome'], 'Ana')
+
+
+class PedidosAtivosStreamTests(TestCase):
+    def setUp(self):
+        self.equipe = CustomUser.objects.create_user(email='cozinha@escola.com', first_name='Cozinha', role='equipe')
+        self.produto = criar_produto('Coxinha', 10)
+
+    async def test_stream_envia_snapshot_e_depois_deltas(self):
+        client = AsyncClient()
+        token = str(AccessToken.for_user(self.equipe))
+        ingresso = await client.post(reverse('active-sales-stream-ticket'), headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(ingresso.status_code, 201)
+        response = await client.get(reverse('active-sales-stream'), {'ticket': ingresso.json()['ticket']})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        eventos = aiter(response.streaming_content)
+
+        snapshot = await anext(eventos)
+        self.assertTrue(snapshot.startswith(b'event: snapshot\ndata: []'))
+
+        hub.publicar('status_alterado', {'id': 7, 'status': 'PRONTO'})
+        delta = await anext(eventos)
+        self.assertEqual(delta, b'event: status_alterado\ndata: {"id": 7, "status": "PRONTO"}\n\n')
+        await eventos.aclose()
+
+    async def test_stream_exige_token_da_equipe(self):
+        response = await AsyncClient().get(reverse('active-sales-stream'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_ingresso_vale_uma_vez_e_nao_aceita_jwt_na_url(self):
+        client = APIClient()
+        client.force_authenticate(self.equipe)
+        ingresso = client.post(reverse('active-sales-stream-ticket')).data['ticket']
+
+        self.assertEqual(resgatar_ingresso(ingresso), self.equipe.pk)
+        self.assertIsNone(resgatar_ingresso(ingresso))
+        response = self.client.get(reverse('active-sales-stream'), {'token': str(AccessToken.for_user(self.equipe))})
+        self.assertEqual(response.status_code, 403)
+
+    def test_ingresso_so_para_a_equipe(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(email='ana@escola.com', first_name='Ana'))
+        self.assertEqual(client.post(reverse('active-sales-stream-ticket')).status_code, 403)
+
+    def test_gravacoes_publicam_os_deltas_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            registrar_venda([{'product_id': self.produto.id, 'quantity': 1}], 'PIX')
+        # O evento do painel e a invalidação do cache dos relatórios.
+        self.assertEqual(len(callbacks), 2)
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class CheckoutConcorrenteTests(TransactionTestCase):
+    def test_dois_caixas_nao_vendem_alem_do_estoque(self):
+        produto = criar_produto('Coxinha', 5)
+        resultados = []
+        barreira = threading.Barrier(4)
+
+        def vender():
+            try:
+                barreira.wait()
+                registrar_venda([{'product_id': produto.id, 'quantity': 2}], 'DINHEIRO')
+                resultados.append('ok')
+            except EstoqueInsuficiente:
+                resultados.append('sem_estoque')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=vender) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        produto.stock_item.refresh_from_db()
+        self.assertEqual(resultados.count('ok'), 2)
+        self.assertEqual(resultados.count('sem_estoque'), 2)
+        self.assertEqual(produto.stock_item.quantity, 1)
+        self.assertEqual(Venda.objects.count(), 2)
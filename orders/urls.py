@@ -1,15 +1,22 @@
 # orders/urls.py
 from django.urls import path
 from .views import CriarVendaView, PedidoAtivoListView, VendaDetailView, UserOrderListView, ConfirmarPagamentoView
-from .views import RelatorioVendasView, ProductProfitabilityView
+from .views import SincronizarVendasView, TransicaoStatusLoteView, IngressoStreamView, pedidos_ativos_stream
+from .views import RelatorioVendasView, ProductProfitabilityView, ExportarVendasView, MapaDeCalorView
 
 urlpatterns = [
     path('sales/create/', CriarVendaView.as_view(), name='create-sale'),
+    path('sales/sync/', SincronizarVendasView.as_view(), name='sync-sales'),
     path('sales/active/', PedidoAtivoListView.as_view(), name='active-sales-list'),
+    path('sales/active/stream/', pedidos_ativos_stream, name='active-sales-stream'),
+    path('sales/active/stream/ticket/', IngressoStreamView.as_view(), name='active-sales-stream-ticket'),
+    path('sales/bulk-status/', TransicaoStatusLoteView.as_view(), name='bulk-sale-status'),
     path('sales/<int:pk>/', VendaDetailView.as_view(), name='sale-detail'),
     path('sales/<int:pk>/confirm-payment/', ConfirmarPagamentoView.as_view(), name='confirm-payment'),
     path('my-orders/', UserOrderListView.as_view(), name='my-orders'),
     path('reports/sales/', RelatorioVendasView.as_view(), name='sales-report'),
     path('reports/sales/', RelatorioVendasView.as_view(), name='sales-report'),
+    path('reports/heatmap/', MapaDeCalorView.as_view(), name='sales-heatmap'),
+    path('reports/sales/export/', ExportarVendasView.as_view(), name='sales-export'),
     path('reports/product-profitability/', ProductProfitabilityView.as_view(), name='product-profitability-report'),
 ]
\ No newline at end of file
@@ -1,27 +1,62 @@
 # orders/views.py
-from django.db import transaction
-from django.db.models import F
+import asyncio
+from collections import defaultdict
+from decimal import Decimal
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractIsoWeekDay
 from django.utils import timezone
-from django.db.models import Sum, Count, Avg
-from django.db.models.functions import TruncDate
 from rest_framework import status, generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from users.models import CustomUser
 from users.views import IsEquipe
-from django.db.models import Sum, F, ExpressionWrapper, DecimalField
+from lanchonete_backend_python.pagination import KeysetPagination
+from lanchonete_backend_python.streaming import resposta_em_streaming
 
 # Modelos dos apps
-from .models import Venda, ItemVenda
-from stock.models import MenuProduct, StockItem # <-- Importamos o StockItem
+from .models import Venda, ItemVenda, VendaArquivada, VendaRemovida, DailySalesSummary, DailyProductSales, HourlySalesSummary, HourlyProductSales
 
 # Serializers
-from .serializers import CarrinhoItemInputSerializer, VendaOutputSerializer, VendaStatusUpdateSerializer
+from .serializers import (
+    CarrinhoItemInputSerializer, VendaOutputSerializer, VendaStatusUpdateSerializer, VendaOfflineInputSerializer,
+    VendaTransicaoLoteInputSerializer, PeriodoInputSerializer, PeriodoObrigatorioInputSerializer, vendas_para_saida,
+    VendaArquivadaOutputSerializer, arquivadas_para_saida
+)
+from .services import (
+    registrar_venda, sincronizar_vendas_offline, converter_reservas, liberar_reservas, estornar_estoque,
+    transicionar_vendas, com_cotas_consolidadas, CheckoutError, VENDAS_ONLINE
+)
+from .sequencia import proxima_sequencia, registrar_remocoes, sequencia_atual
+from .idempotencia import (
+    HEADER_IDEMPOTENCIA, TAMANHO_MAXIMO_CHAVE, ConflitoIdempotencia, buscar_resposta, salvar_resposta,
+    escopo_da_requisicao, hash_do_corpo
+)
+from .fila_pedidos import entrada_em_lote_ativa, fila_de_pedidos
+from .eventos import hub, formatar_evento, publicar_mudanca_status, publicar_remocao, emitir_ingresso, resgatar_ingresso
+from .resumos import mover_vendas, limites_do_periodo
+from .cache_relatorios import relatorio_em_cache
+from . import arquivo
+from .exportacao import FORMATOS as FORMATOS_EXPORTACAO, exportar
+
+# Segundos sem eventos até o stream mandar um keep-alive
+INTERVALO_KEEPALIVE = 15
+
+# Header com o cursor da lista completa, para a próxima chamada com ?since=
+HEADER_CURSOR = 'X-Cursor'
 
 class CriarVendaView(APIView):
     permission_classes = [permissions.AllowAny]
 
-    @transaction.atomic
     def post(self, request):
         carrinho_data = request.data.get('items', [])
         payment_method = request.data.get('payment_method')
@@ -33,76 +68,269 @@ class CriarVendaView(APIView):
         carrinho_serializer = CarrinhoItemInputSerializer(data=carrinho_data, many=True)
         if not carrinho_serializer.is_valid():
             return Response(carrinho_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        carrinho_validado = carrinho_serializer.validated_data
-        valor_total_pedido = 0
-        itens_para_processar = []
 
-        for item_data in carrinho_validado:
+        # Reenvio de um pedido já registrado (ex.: retry após timeout no Wi-Fi):
+        # devolve a resposta original sem criar outra venda nem mexer no estoque.
+        # A chave vale só para o mesmo usuário (ou IP) e o mesmo corpo.
+        chave = request.headers.get(HEADER_IDEMPOTENCIA)
+        if chave is not None:
+            if not chave or len(chave) > TAMANHO_MAXIMO_CHAVE:
+                return Response(
+                    {"error": f"O header {HEADER_IDEMPOTENCIA} deve ter entre 1 e {TAMANHO_MAXIMO_CHAVE} caracteres."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            escopo, hash_corpo = escopo_da_requisicao(request), hash_do_corpo(request.data)
             try:
-                produto = MenuProduct.objects.select_related('stock_item').get(id=item_data['product_id'])
-                if produto.stock_item.quantity < item_data['quantity']:
-                    return Response(
-                        {"error": f"Estoque insuficiente para: {produto.name}. Disponível: {produto.stock_item.quantity}"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                stock_item_associado = produto.stock_item
-                stock_item_associado.quantity -= item_data['quantity']
-                stock_item_associado.save()
-
-                subtotal = produto.sale_price * item_data['quantity']
-                valor_total_pedido += subtotal
-                itens_para_processar.append({
-                    "produto": produto, "nome_produto": produto.name,
-                    "quantidade": item_data['quantity'], "preco_unitario": produto.sale_price,
-                    "subtotal": subtotal
-                })
-            except MenuProduct.DoesNotExist:
-                return Response({"error": f"Produto com ID {item_data['product_id']} não encontrado."}, status=status.HTTP_404_NOT_FOUND)
-
-        # --- LÓGICA DE STATUS CORRIGIDA ---
-        # Define o status inicial baseado na origem da venda
-        
-        # Vendas de balcão (PDV) já são consideradas pagas.
-        # Vendas do cardápio online ficam aguardando a confirmação.
-        vendas_pdv = ['DINHEIRO', 'CARTAO_DEBITO', 'CARTAO_CREDITO', 'PIX']
-        if payment_method in vendas_pdv:
-            initial_status = 'PAGO'
-        else: # Para 'NA_RETIRADA' e 'ONLINE' do cardápio do cliente
-            initial_status = 'AGUARDANDO_PAGAMENTO'
+                resposta_anterior = buscar_resposta(escopo, chave, hash_corpo)
+            except ConflitoIdempotencia:
+                return self._conflito_de_chave()
+            if resposta_anterior is not None:
+                return self._resposta_repetida(*resposta_anterior)
 
         # Atribui o cliente apenas se ele estiver logado e NÃO for uma venda anônima de PDV
         cliente_final = None
-        if request.user.is_authenticated and payment_method in ['ONLINE', 'NA_RETIRADA']:
+        if request.user.is_authenticated and payment_method in VENDAS_ONLINE:
             cliente_final = request.user
-        
-        nova_venda = Venda.objects.create(
-            cliente=cliente_final,
-            valor_total=valor_total_pedido,
-            status=initial_status, # <-- Status dinâmico
-            payment_method=payment_method
+
+        # Modo de pico (ORDERS_INTAKE_MODE = 'lote'): o pedido entra na fila e é gravado
+        # junto com os outros do mesmo micro-lote. Pedidos com Idempotency-Key seguem o
+        # caminho direto, pois a chave precisa ser gravada na mesma transação da venda.
+        if not chave and entrada_em_lote_ativa():
+            return self._criar_via_fila(carrinho_serializer.validated_data, payment_method, cliente_final)
+
+        # O serviço carrega os produtos, trava o estoque e grava a venda em uma única transação.
+        # Se algo falhar, nada é salvo (inclusive as baixas de estoque).
+        def gravar():
+            with transaction.atomic():
+                nova_venda = registrar_venda(carrinho_serializer.validated_data, payment_method, cliente_final)
+                dados = VendaOutputSerializer(nova_venda).data
+                if chave:
+                    salvar_resposta(escopo, chave, hash_corpo, nova_venda, status.HTTP_201_CREATED, dados)
+            return dados
+
+        try:
+            dados = com_cotas_consolidadas(gravar)
+        except CheckoutError as e:
+            return Response({"error": e.mensagem}, status=e.status_code)
+        except IntegrityError:
+            # Outra requisição com a mesma chave terminou primeiro: esta venda foi desfeita.
+            try:
+                resposta_anterior = buscar_resposta(escopo, chave, hash_corpo) if chave else None
+            except ConflitoIdempotencia:
+                return self._conflito_de_chave()
+            if resposta_anterior is None:
+                raise
+            return self._resposta_repetida(*resposta_anterior)
+
+        return Response(dados, status=status.HTTP_201_CREATED)
+
+    def _resposta_repetida(self, status_code, resposta):
+        return Response(resposta, status=status_code, headers={'Idempotent-Replayed': 'true'})
+
+    def _conflito_de_chave(self):
+        return Response(
+            {"error": f"O header {HEADER_IDEMPOTENCIA} já foi usado com outro pedido."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
         )
-        
-        for item_info in itens_para_processar:
-            ItemVenda.objects.create(
-                venda=nova_venda, produto=item_info['produto'], nome_produto=item_info['nome_produto'],
-                quantidade=item_info['quantidade'], preco_unitario=item_info['preco_unitario']
+
+    def _criar_via_fila(self, carrinho, payment_method, cliente):
+        futuro = fila_de_pedidos().submeter(carrinho, payment_method, cliente)
+        timeout = getattr(settings, 'ORDERS_INTAKE_TIMEOUT', 10)
+        try:
+            try:
+                nova_venda = futuro.result(timeout=timeout)
+            except FuturesTimeoutError:
+                # Se o lote ainda não começou, o pedido é descartado. Se já está sendo
+                # gravado, esperamos o resultado para não responder erro de uma venda feita.
+                if futuro.cancel():
+                    return Response(
+                        {"error": "Sistema sobrecarregado, tente novamente."},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    )
+                nova_venda = futuro.result()
+        except CheckoutError as e:
+            return Response({"error": e.mensagem}, status=e.status_code)
+
+        return Response(VendaOutputSerializer(nova_venda).data, status=status.HTTP_201_CREATED)
+
+
+class SincronizarVendasView(APIView):
+    """
+    Recebe de uma vez as vendas que um terminal PDV fez enquanto estava offline.
+    Cada venda traz um UUID gerado no terminal e o horário real da venda.
+    Todas são validadas contra o mesmo snapshot de produtos/estoque e gravadas
+    em lote; a resposta traz o resultado de cada uma, na ordem enviada.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+
+    def post(self, request):
+        vendas_data = request.data.get('sales')
+        limite = getattr(settings, 'ORDERS_SYNC_MAX_SALES', 1000)
+        if not isinstance(vendas_data, list) or not vendas_data:
+            return Response({"error": "Envie a lista de vendas em 'sales'."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(vendas_data) > limite:
+            return Response(
+                {"error": f"Máximo de {limite} vendas por sincronização."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        venda_criada_serializer = VendaOutputSerializer(nova_venda)
-        return Response(venda_criada_serializer.data, status=status.HTTP_201_CREATED)
+        # Uma venda malformada não impede a sincronização das outras.
+        validas = []
+        resultados = [None] * len(vendas_data)
+        for indice, venda_data in enumerate(vendas_data):
+            serializer = VendaOfflineInputSerializer(data=venda_data)
+            if serializer.is_valid():
+                validas.append((indice, serializer.validated_data))
+            else:
+                client_uuid = venda_data.get('client_uuid') if isinstance(venda_data, dict) else None
+                resultados[indice] = {'client_uuid': client_uuid, 'status': 'erro', 'error': serializer.errors}
+
+        try:
+            sincronizadas = sincronizar_vendas_offline([dados for _, dados in validas])
+        except CheckoutError as e:
+            # O lote inteiro foi desfeito: o terminal reenvia a fila, e os UUIDs evitam duplicatas.
+            return Response({"error": e.mensagem}, status=e.status_code)
+        for (indice, _), resultado in zip(validas, sincronizadas):
+            resultados[indice] = resultado
+
+        return Response({'results': resultados}, status=status.HTTP_200_OK)
+
+
+class AlteracoesDesdeMixin:
+    """
+    Listas de pedidos incrementais. Sem parâmetros a lista vem completa, como
+    sempre, e o header X-Cursor traz o cursor atual. Com ?since=<cursor> a
+    resposta traz só os pedidos criados ou que mudaram de status depois do cursor:
+    {"cursor", "results", "removed"}, onde "removed" são os ids que saíram da
+    lista (status em `status_fora_da_lista`) ou foram apagados (get_remocoes).
+    """
+    status_fora_da_lista = ()
+
+    def get_remocoes(self):
+        """Marcas (VendaRemovida) das vendas apagadas que esta lista pode ter mostrado."""
+        return VendaRemovida.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        # O cursor é lido antes da lista: uma alteração que entre no meio pode vir
+        # de novo na próxima chamada, mas nunca fica de fora.
+        cursor = sequencia_atual()
+        since = request.query_params.get('since')
+        if since is None:
+            response = super().list(request, *args, **kwargs)
+            response[HEADER_CURSOR] = str(cursor)
+            return response
+
+        try:
+            since = int(since)
+            if since < 0:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "Cursor 'since' inválido."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados, removidos = [], []
+        if since < cursor:
+            # Usa o índice de Venda.sequencia: só as linhas alteradas são lidas.
+            alteradas = self.get_queryset().filter(sequencia__gt=since)
+            resultados = self.get_serializer(alteradas, many=True).data
+            if self.status_fora_da_lista:
+                removidos = list(
+                    Venda.objects.filter(sequencia__gt=since, status__in=self.status_fora_da_lista)
+                    .order_by('sequencia').values_list('pk', flat=True)
+                )
+            removidos += self.get_remocoes().filter(sequencia__gt=since).order_by('sequencia').values_list('venda_id', flat=True)
+            removidos = list(dict.fromkeys(removidos))
+        return Response({'cursor': str(cursor), 'results': resultados, 'removed': removidos})
 
 
-class PedidoAtivoListView(generics.ListAPIView):
+class PedidoAtivoListView(AlteracoesDesdeMixin, generics.ListAPIView):
     """
     View para listar todos os pedidos que não estão Finalizados ou Cancelados.
+    Aceita ?since=<cursor> para buscar só as alterações (veja AlteracoesDesdeMixin).
     """
     serializer_class = VendaOutputSerializer
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
+    status_fora_da_lista = Venda.STATUS_ENCERRADOS
 
     def get_queryset(self):
-        return Venda.objects.exclude(status__in=['FINALIZADO', 'CANCELADO']).order_by('data_venda')
+        return vendas_para_saida(Venda.objects.exclude(status__in=Venda.STATUS_ENCERRADOS).order_by('data_venda'))
+
+
+def _autenticar_equipe(request):
+    """
+    Autentica o JWT do header Authorization ou, como o EventSource do navegador
+    não envia headers, o ingresso de uso único do parâmetro ?ticket= (veja
+    IngressoStreamView). Retorna o usuário da equipe ou None.
+    """
+    ingresso = request.GET.get('ticket')
+    if ingresso:
+        usuario_id = resgatar_ingresso(ingresso)
+        usuario = CustomUser.objects.filter(pk=usuario_id, is_active=True).first() if usuario_id else None
+    else:
+        autenticacao = JWTAuthentication()
+        header = autenticacao.get_header(request)
+        token = autenticacao.get_raw_token(header) if header else None
+        if not token:
+            return None
+        try:
+            usuario = autenticacao.get_user(autenticacao.get_validated_token(token))
+        except (InvalidToken, AuthenticationFailed):
+            return None
+    return usuario if usuario is not None and usuario.is_authenticated and usuario.role == 'equipe' else None
+
+
+class IngressoStreamView(APIView):
+    """
+    Emite o ingresso para abrir o stream dos pedidos ativos: o JWT vai no header
+    desta requisição, e não na URL do stream, onde acabaria nos logs.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+
+    def post(self, request, *args, **kwargs):
+        ingresso, validade = emitir_ingresso(request.user)
+        return Response({"ticket": ingresso, "expires_in": validade}, status=status.HTTP_201_CREATED)
+
+
+def _snapshot_pedidos_ativos():
+    vendas = Venda.objects.exclude(status__in=Venda.STATUS_ENCERRADOS).order_by('data_venda')
+    return VendaOutputSerializer(vendas_para_saida(vendas), many=True).data
+
+
+async def pedidos_ativos_stream(request):
+    """
+    Stream (Server-Sent Events) do painel da cozinha: envia uma vez a lista de
+    pedidos ativos ('snapshot') e depois só os deltas publicados pelo hub
+    ('pedido_criado', 'status_alterado', 'pedido_removido'). Precisa ser servido
+    por um servidor ASGI (veja ASGI_APPLICATION em settings.py). No navegador,
+    abrir com ?ticket=<ingresso de IngressoStreamView>.
+    """
+    usuario = await sync_to_async(_autenticar_equipe)(request)
+    if usuario is None:
+        return JsonResponse({"error": "Acesso restrito à equipe."}, status=status.HTTP_403_FORBIDDEN)
+
+    # Inscreve antes de ler o snapshot para não perder eventos entre as duas coisas.
+    fila = hub.inscrever()
+    try:
+        snapshot = await sync_to_async(_snapshot_pedidos_ativos)()
+    except Exception:
+        hub.cancelar(fila)
+        raise
+
+    async def eventos():
+        try:
+            yield formatar_evento('snapshot', snapshot)
+            while True:
+                try:
+                    yield await asyncio.wait_for(fila.get(), timeout=INTERVALO_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comentário SSE: mantém a conexão viva através de proxies.
+                    yield ': keep-alive\n\n'
+        finally:
+            hub.cancelar(fila)
+
+    response = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # --- CLASSE ALTERADA COM A CORREÇÃO DO BUG ---
@@ -119,43 +347,119 @@ class VendaDetailView(generics.RetrieveUpdateDestroyAPIView):
             return VendaStatusUpdateSerializer
         return VendaOutputSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # Venda já arquivada: continua visível, só não aceita mais alterações.
+            arquivada = get_object_or_404(VendaArquivada.objects.select_related('cliente'), pk=kwargs['pk'])
+            return Response(VendaArquivadaOutputSerializer(arquivadas_para_saida([arquivada])[0]).data)
+
+    def get_queryset(self):
+        # Nas alterações a venda fica travada até o fim da transação, para não
+        # disputar com a confirmação de pagamento ou o liberador de reservas.
+        # (Sem select_related aqui: o Postgres não trava o lado opcional de um LEFT JOIN.)
+        if self.request.method in ['PUT', 'PATCH', 'DELETE']:
+            return Venda.objects.select_for_update()
+        return vendas_para_saida(Venda.objects.all())
+
     def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
         # Usamos uma transação atômica para garantir a integridade dos dados.
         # Ou tudo funciona, ou nada é salvo no banco.
         with transaction.atomic():
             venda = self.get_object()
+            serializer = self.get_serializer(venda, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
             status_antigo = venda.status
-            status_novo = request.data.get('status')
+            status_novo = serializer.validated_data.get('status', status_antigo)
+            # A mesma máquina de estados das transições em lote: um pedido cancelado
+            # não volta a ser pago (o estoque já foi devolvido) nem um pronto volta ao preparo.
+            if status_novo != status_antigo and status_novo not in Venda.TRANSICOES_STATUS[status_antigo]:
+                return Response(
+                    {"error": f"Transição não permitida: {status_antigo} -> {status_novo}."},
+                    status=status.HTTP_409_CONFLICT
+                )
+            campos = {}
+
+            # Pedido online pago no balcão (ou que avançou direto): a reserva vira baixa real.
+            if status_antigo == 'AGUARDANDO_PAGAMENTO' and status_novo not in (status_antigo, 'CANCELADO'):
+                converter_reservas(venda)
 
             # LÓGICA DE ESTORNO DE ESTOQUE
-            # Só executa se o status anterior NÃO era 'CANCELADO' e o novo status É 'CANCELADO'
-            if status_novo == 'CANCELADO' and status_antigo != 'CANCELADO':
-                # Itera sobre cada item que foi vendido neste pedido
-                for item_vendido in venda.itens.all():
-                    # Verifica se o produto ainda existe
-                    if item_vendido.produto and item_vendido.produto.stock_item:
-                        stock_item = item_vendido.produto.stock_item
-                        # Devolve a quantidade ao estoque de forma segura
-                        stock_item.quantity += item_vendido.quantidade
-                        stock_item.save()
-
-            # Chama o método 'update' original para salvar a mudança de status
-            return super().update(request, *args, **kwargs)
-
-
-class UserOrderListView(generics.ListAPIView):
+            # Só devolve uma vez por venda (estoque_devolvido). Pedidos que só tinham
+            # reserva devolvem a reserva; o estoque físico nunca foi baixado.
+            if status_novo == 'CANCELADO' and not venda.estoque_devolvido:
+                if not liberar_reservas([venda.pk]):
+                    estornar_estoque([venda.pk])
+                campos['estoque_devolvido'] = True
+
+            if status_novo != status_antigo:
+                campos['sequencia'] = proxima_sequencia()
+            serializer.save(**campos)
+            if status_novo != status_antigo:
+                mover_vendas({venda.pk: status_antigo}, status_novo)
+                publicar_mudanca_status([venda.pk], status_novo)
+            return Response(serializer.data)
+
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            # Apagar um pedido ainda reservado não pode deixar estoque preso.
+            venda = self.get_object()
+            venda_id = venda.pk
+            liberar_reservas([venda_id])
+            # Marca para as listas incrementais: quem tem o pedido na tela recebe o id em "removed".
+            registrar_remocoes([(venda_id, venda.cliente_id)])
+            # Sai dos resumos diários antes de sumir do banco.
+            mover_vendas({venda_id: venda.status})
+            publicar_remocao(venda_id)
+            return super().destroy(request, *args, **kwargs)
+
+
+class TransicaoStatusLoteView(APIView):
+    """
+    Muda o status de vários pedidos de uma vez: {"ids": [...], "status": "PRONTO"}.
+    Cada pedido é validado pela máquina de estados (Venda.TRANSICOES_STATUS); os
+    permitidos são gravados juntos e a resposta traz um resultado por pedido.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+
+    def post(self, request):
+        serializer = VendaTransicaoLoteInputSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        resultados = transicionar_vendas(serializer.validated_data['ids'], serializer.validated_data['status'])
+        return Response({'results': resultados}, status=status.HTTP_200_OK)
+
+
+class UserOrderListView(AlteracoesDesdeMixin, generics.ListAPIView):
     """
     View para listar todos os pedidos de um usuário autenticado.
+    Aceita ?since=<cursor> para buscar só as alterações (veja AlteracoesDesdeMixin).
+    A lista completa é paginada por (data_venda, id), mais recentes primeiro.
     """
     serializer_class = VendaOutputSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-data_venda', '-id')
 
     def get_queryset(self):
         """
         Filtra as vendas para retornar apenas as do usuário que fez a requisição.
         """
         user = self.request.user
-        return Venda.objects.filter(cliente=user).order_by('-data_venda')
+        return vendas_para_saida(Venda.objects.filter(cliente=user).order_by('-data_venda'))
+
+    def get_remocoes(self):
+        return super().get_remocoes().filter(cliente=self.request.user)
+
+    def paginate_queryset(self, queryset):
+        # As vendas já arquivadas (orders/arquivo.py) continuam na lista, na mesma ordem.
+        arquivadas = VendaArquivada.objects.filter(cliente=self.request.user).select_related('cliente').only(
+            'id', 'status', 'payment_method', 'data_venda', 'valor_total', 'mes', 'cliente__first_name'
+        )
+        return arquivadas_para_saida(self.paginator.paginate_querysets([queryset, arquivadas], self.request, view=self))
 
 
 class ConfirmarPagamentoView(APIView):
@@ -164,10 +468,11 @@ class ConfirmarPagamentoView(APIView):
     """
     permission_classes = [IsAuthenticated] # Apenas usuários logados
 
+    @transaction.atomic
     def post(self, request, pk):
         try:
-            # Encontra a venda pelo ID (pk) fornecido na URL
-            venda = Venda.objects.get(pk=pk)
+            # Encontra a venda pelo ID (pk) fornecido na URL, travando-a contra o liberador de reservas
+            venda = Venda.objects.select_for_update().get(pk=pk)
 
             # --- VERIFICAÇÃO DE SEGURANÇA ---
             # Garante que o usuário logado é o dono do pedido
@@ -184,9 +489,13 @@ class ConfirmarPagamentoView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Se tudo estiver certo, atualiza o status para PAGO
+            # Se tudo estiver certo, a reserva vira baixa real e o status vai para PAGO
+            converter_reservas(venda)
             venda.status = 'PAGO'
+            venda.sequencia = proxima_sequencia()
             venda.save()
+            mover_vendas({venda.pk: 'AGUARDANDO_PAGAMENTO'}, 'PAGO')
+            publicar_mudanca_status([venda.pk], venda.status)
 
             # Retorna os dados do pedido atualizado
             serializer = VendaOutputSerializer(venda)
@@ -199,42 +508,48 @@ class RelatorioVendasView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
 
     def get(self, request):
-        # Pega as datas da query string, com um padrão de 30 dias atrás
-        end_date = timezone.now().date()
-        start_date = request.query_params.get('start_date', end_date - timezone.timedelta(days=30))
-        
-        # Filtra as vendas no período desejado e que não foram canceladas
-        vendas_no_periodo = Venda.objects.filter(
-            data_venda__date__range=[start_date, end_date],
-            status__in=['PAGO', 'EM_PREPARO', 'PRONTO', 'FINALIZADO']
-        )
+        # Pega as datas da query string (dias no fuso da loja), com um padrão dos últimos 30 dias
+        periodo = PeriodoInputSerializer(data=request.query_params)
+        periodo.is_valid(raise_exception=True)
+        end_date = periodo.validated_data.get('end_date', timezone.localdate())
+        start_date = periodo.validated_data.get('start_date', end_date - timezone.timedelta(days=30))
+        # O período normalizado é a chave do cache; só o dia de hoje costuma ser recalculado.
+        data = relatorio_em_cache('vendas', start_date, end_date, lambda: self.calcular(start_date, end_date))
+        return Response(data)
+
+    def calcular(self, start_date, end_date):
+        # Lê os resumos diários (orders/resumos.py) em vez de varrer as vendas. O dia de
+        # cada resumo já é o dia local da venda, e o filtro por `day` usa o índice único.
+        # Só entram os pedidos faturados: pagos, em preparo, prontos ou finalizados.
+        resumos_no_periodo = DailySalesSummary.objects.filter(day__range=[start_date, end_date], status_group='FATURADO')
 
         # 1. Resumo Geral
-        resumo = vendas_no_periodo.aggregate(
-            faturamento_total=Sum('valor_total'),
-            total_pedidos=Count('id'),
-            ticket_medio=Avg('valor_total')
+        resumo = resumos_no_periodo.aggregate(
+            faturamento_total=Sum('revenue'),
+            total_pedidos=Sum('order_count'),
         )
+        if resumo['total_pedidos']:
+            resumo['ticket_medio'] = resumo['faturamento_total'] / resumo['total_pedidos']
+        else:
+            resumo['ticket_medio'] = None
 
         # 2. Vendas ao Longo do Tempo (para o gráfico)
-        vendas_por_dia = vendas_no_periodo.annotate(
-            dia=TruncDate('data_venda')
-        ).values('dia').annotate(
-            total=Sum('valor_total')
+        vendas_por_dia = resumos_no_periodo.values(dia=F('day')).annotate(
+            total=Sum('revenue')
         ).order_by('dia')
 
         # 3. Produtos mais vendidos
-        produtos_vendidos = ItemVenda.objects.filter(
-            venda__in=vendas_no_periodo
-        ).values('nome_produto').annotate(
-            quantidade_vendida=Sum('quantidade')
+        produtos_vendidos = DailyProductSales.objects.filter(
+            day__range=[start_date, end_date], status_group='FATURADO'
+        ).values(nome_produto=F('product_name')).annotate(
+            quantidade_vendida=Sum('quantity')
         ).order_by('-quantidade_vendida')[:10] # Top 10
 
         # 4. Vendas por método de pagamento
-        vendas_por_pagamento = vendas_no_periodo.values(
+        vendas_por_pagamento = resumos_no_periodo.values(
             'payment_method'
         ).annotate(
-            total=Sum('valor_total')
+            total=Sum('revenue')
         ).order_by('-total')
 
 
@@ -249,53 +564,161 @@ class RelatorioVendasView(APIView):
             'top_produtos': list(produtos_vendidos),
             'vendas_por_pagamento': list(vendas_por_pagamento),
         }
-        
-        return Response(data)
+        return data
     
 
+class MapaDeCalorView(APIView):
+    """
+    Demanda por dia da semana × hora (local) para a escala do balcão, somada dos
+    resumos por hora (orders/resumos.py). Só pedidos faturados.
+
+    Resposta: matrizes densas 7×24 de pedidos e faturamento (linhas de segunda a
+    domingo, colunas de 0h a 23h) e, para os ?produtos= (padrão 10) mais vendidos
+    do período, a quantidade por hora.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+    DIAS_DA_SEMANA = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
+    MAX_PRODUTOS = 50
+
+    def get(self, request):
+        periodo = PeriodoInputSerializer(data=request.query_params)
+        periodo.is_valid(raise_exception=True)
+        end_date = periodo.validated_data.get('end_date', timezone.localdate())
+        start_date = periodo.validated_data.get('start_date', end_date - timezone.timedelta(days=30))
+        try:
+            n_produtos = min(max(int(request.query_params.get('produtos', 10)), 0), self.MAX_PRODUTOS)
+        except ValueError:
+            return Response({'produtos': 'Informe um número inteiro.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = relatorio_em_cache(
+            f'mapa_calor:{n_produtos}', start_date, end_date, lambda: self.calcular(start_date, end_date, n_produtos)
+        )
+        return Response(data)
+
+    def calcular(self, start_date, end_date, n_produtos):
+        pedidos = [[0] * 24 for _ in range(7)]
+        faturamento = [[Decimal('0')] * 24 for _ in range(7)]
+        for dia_semana, hora, total_pedidos, total_faturamento in HourlySalesSummary.objects.filter(
+            status_group='FATURADO', day__range=[start_date, end_date]
+        ).values(dia_semana=ExtractIsoWeekDay('day'), hora=F('hour')).annotate(
+            total_pedidos=Sum('order_count'), total_faturamento=Sum('revenue')
+        ).order_by().values_list('dia_semana', 'hora', 'total_pedidos', 'total_faturamento'):
+            pedidos[dia_semana - 1][hora] = total_pedidos
+            faturamento[dia_semana - 1][hora] = total_faturamento
+
+        series = defaultdict(lambda: [0] * 24)
+        if n_produtos:
+            for nome_produto, hora, quantidade in HourlyProductSales.objects.filter(
+                status_group='FATURADO', day__range=[start_date, end_date]
+            ).values('product_name', 'hour').annotate(total=Sum('quantity')).order_by().values_list(
+                'product_name', 'hour', 'total'
+            ):
+                series[nome_produto][hora] = quantidade
+        mais_vendidos = sorted(series.items(), key=lambda serie: (-sum(serie[1]), serie[0]))[:n_produtos]
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'dias_da_semana': self.DIAS_DA_SEMANA,
+            'pedidos': pedidos,
+            'faturamento': faturamento,
+            'produtos': [
+                {'nome_produto': nome, 'quantidade_total': sum(por_hora), 'por_hora': por_hora}
+                for nome, por_hora in mais_vendidos
+            ],
+        }
+
+
+class ExportarVendasView(APIView):
+    """
+    Exporta vendas e itens de um período (?start_date=&end_date=, datas locais
+    inclusivas) em CSV ou NDJSON (?output=, padrão csv). A resposta é montada
+    aos poucos enquanto as linhas são lidas do banco (orders/exportacao.py),
+    tanto no WSGI quanto no ASGI (lanchonete_backend_python/streaming.py).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+
+    def get(self, request):
+        formato = request.query_params.get('output', 'csv')
+        if formato not in FORMATOS_EXPORTACAO:
+            return Response(
+                {'output': f"Formato inválido. Use: {', '.join(FORMATOS_EXPORTACAO)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        periodo = PeriodoObrigatorioInputSerializer(data=request.query_params)
+        periodo.is_valid(raise_exception=True)
+        start_date, end_date = periodo.validated_data['start_date'], periodo.validated_data['end_date']
+
+        response = resposta_em_streaming(
+            request, exportar(start_date, end_date, formato), content_type=FORMATOS_EXPORTACAO[formato]
+        )
+        response['Content-Disposition'] = f'attachment; filename="vendas_{start_date}_{end_date}.{formato}"'
+        return response
+
+
 class ProductProfitabilityView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
 
     def get(self, request):
-        start_date_str = request.query_params.get('start_date')
-        end_date_str = request.query_params.get('end_date')
+        periodo = PeriodoInputSerializer(data=request.query_params)
+        periodo.is_valid(raise_exception=True)
+        # Sem as duas datas, o relatório cobre todas as vendas
+        start_date = periodo.validated_data.get('start_date')
+        end_date = periodo.validated_data.get('end_date')
+        if start_date is None or end_date is None:
+            start_date = end_date = None
+        report_data = relatorio_em_cache(
+            'lucratividade', start_date, end_date, lambda: self.calcular(start_date, end_date)
+        )
+        return Response(report_data)
 
+    def calcular(self, start_date, end_date):
         # Começamos com todos os itens de vendas de pedidos concluídos
         items_vendidos = ItemVenda.objects.filter(
             venda__status__in=['PAGO', 'FINALIZADO']
         )
 
-        # Filtra por data se os parâmetros forem fornecidos
-        if start_date_str and end_date_str:
-            items_vendidos = items_vendidos.filter(venda__data_venda__date__range=[start_date_str, end_date_str])
+        # Filtra por data se os parâmetros forem fornecidos: intervalo semiaberto no fuso da
+        # loja, direto na coluna (um __date envolveria data_venda num cast e perderia o índice)
+        de = ate = None
+        if start_date and end_date:
+            de, ate = limites_do_periodo(start_date, end_date)
+            items_vendidos = items_vendidos.filter(venda__data_venda__gte=de, venda__data_venda__lt=ate)
 
-        # Agrupa por produto e calcula os totais usando o poder do banco de dados
+        # Agrupa por produto e calcula os totais usando o poder do banco de dados.
+        # Nome e custo são os gravados no item na hora da venda: só a tabela de
+        # vendas entra no JOIN (para o filtro), e o custo é o da época.
         lucratividade = items_vendidos.values(
-            'produto__name' # Agrupa pelo nome do produto do cardápio
+            'nome_produto'
         ).annotate(
             quantidade_total=Sum('quantidade'),
             receita_total=Sum(F('quantidade') * F('preco_unitario')),
-            # Pega o preço de custo do item de estoque associado
-            custo_total=Sum(F('quantidade') * F('produto__stock_item__cost_price'))
+            custo_total=Sum(F('quantidade') * F('custo_unitario'))
         ).order_by('-receita_total')
 
-        # Calcula o lucro e a margem em Python para cada item agrupado
-        report_data = []
+        # Vendas arquivadas (só as FINALIZADO entram no relatório) vêm das colunas do
+        # arquivo e são somadas às vivas do mesmo produto.
+        totais = arquivo.totais_por_produto(de, ate, status=['FINALIZADO'])
         for item in lucratividade:
+            linha = totais[item['nome_produto']]
+            linha[0] += item['quantidade_total']
             # Garante que não haverá erro se um dos valores for None
-            receita = item['receita_total'] or 0
-            custo = item['custo_total'] or 0
-            
+            linha[1] += item['receita_total'] or 0
+            linha[2] += item['custo_total'] or 0
+
+        # Calcula o lucro e a margem em Python para cada item agrupado
+        report_data = []
+        for nome_produto, (quantidade, receita, custo) in totais.items():
             lucro_bruto = receita - custo
             margem = (lucro_bruto / receita * 100) if receita > 0 else 0
             
             report_data.append({
-                'nome_produto': item['produto__name'],
-                'quantidade_vendida': item['quantidade_total'],
+                'nome_produto': nome_produto,
+                'quantidade_vendida': quantidade,
                 'receita_total': receita,
                 'custo_total': custo,
                 'lucro_bruto': lucro_bruto,
                 'margem_lucro_percentual': round(margem, 2)
             })
-
-        return Response(report_data)
\ No newline at end of file
+        report_data.sort(key=lambda linha: linha['receita_total'], reverse=True)
+        return report_data
\ No newline at end of file
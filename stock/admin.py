@@ -28,10 +28,10 @@ class StockItemAdmin(admin.ModelAdmin):
     )
     search_fields = ('name', 'unit_of_measure', 'category__name', 'supplier__name') # Busca por nome do fornecedor
     list_filter = ('category', 'supplier', 'unit_of_measure', 'expiry_date') # Filtro por fornecedor
-    readonly_fields = ('last_updated',)
+    readonly_fields = ('last_updated', 'reserved_quantity')
     fieldsets = (
-        (None, {'fields': ('name', 'category', 'supplier', 'quantity', 'unit_of_measure')}), # Adicionado supplier ao form
-        ('Detalhes de Custo e Controle', {'fields': ('cost_price', 'minimum_stock_level', 'expiry_date', 'image')}), # Movido image para cá
+        (None, {'fields': ('name', 'category', 'supplier', 'quantity', 'reserved_quantity', 'unit_of_measure')}), # Adicionado supplier ao form
+        ('Detalhes de Custo e Controle', {'fields': ('cost_price', 'minimum_stock_level', 'expiry_date', 'image', 'counter_shards')}), # Movido image para cá
         ('Informações de Sistema', {'fields': ('last_updated',)}),
     )
 
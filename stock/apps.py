@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StockConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'stock'
+
+    def ready(self):
+        # Invalida o snapshot do cardápio público (stock/menu_snapshot.py)
+        from . import signals  # noqa: F401
@@ -0,0 +1,202 @@
+# stock/forecasting.py
+"""
+Previsão de consumo dos itens de estoque e sugestões de reposição.
+
+O consumo diário de cada StockItem (vendas faturadas, via MenuProduct.stock_item)
+é carregado em uma matriz NumPy itens × dias, e o modelo roda para todos os
+itens de uma vez: média móvel dos últimos dias, ajustada por um fator de
+sazonalidade por dia da semana. A projeção acumulada diz em quantos dias cada
+item chega ao estoque mínimo e a zero, e quanto pedir para cobrir o período de
+reposição. As sugestões saem agrupadas por fornecedor.
+"""
+import math
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from orders import arquivo
+from orders.models import ItemVenda
+from orders.resumos import limites_do_periodo
+
+from .models import StockItem, StockForecast, MenuProduct
+
+HISTORY_DAYS = 365      # Histórico carregado
+WINDOW_DAYS = 28        # Janela da média móvel (semanas inteiras: neutra quanto ao dia da semana)
+HORIZON_DAYS = 90       # Até onde a ruptura é projetada; além disso, "sem previsão"
+COVERAGE_DAYS = 14      # Dias que um pedido de reposição deve cobrir
+
+# Vendas que já tiraram o item do estoque (as online pendentes só reservam; as canceladas devolvem).
+STATUS_SEM_CONSUMO = ['AGUARDANDO_PAGAMENTO', 'CANCELADO']
+
+
+@dataclass
+class Forecast:
+    generated_at: object
+    history_days: int
+    coverage_days: int
+    items: list = field(default_factory=list)
+    suppliers: list = field(default_factory=list)
+
+
+def load_daily_consumption(stock_item_ids, start, end):
+    """
+    Matriz (len(stock_item_ids) × dias) com o consumo de cada item em cada dia
+    local de [start, end]. Uma única query agregada por item e dia, mais a
+    varredura das colunas dos meses arquivados.
+    """
+    n_days = (end - start).days + 1
+    consumption = np.zeros((len(stock_item_ids), n_days))
+    ids = np.asarray(stock_item_ids)
+    de, ate = limites_do_periodo(start, end)
+    if not len(ids):
+        return consumption
+    rows = list(
+        ItemVenda.objects.filter(
+            venda__data_venda__gte=de, venda__data_venda__lt=ate, produto__stock_item__isnull=False
+        ).exclude(venda__status__in=STATUS_SEM_CONSUMO)
+        .values_list('produto__stock_item', TruncDate('venda__data_venda'))
+        .annotate(total=Sum('quantidade')).order_by()
+    )
+    if rows:
+        item_ids, days, totals = zip(*rows)
+        offsets = np.fromiter(((day - start).days for day in days), dtype=np.int64, count=len(days))
+        _add(consumption, ids, np.asarray(item_ids), offsets, np.asarray(totals, dtype=float))
+
+    # Vendas arquivadas: produto -> item de estoque pelo cardápio atual, dia local pelas colunas.
+    archived_status = [code for code, status in enumerate(arquivo.STATUS) if status not in STATUS_SEM_CONSUMO]
+    product_map = None
+    for month in arquivo.meses_arquivados(de, ate):
+        if product_map is None:
+            product_map = np.asarray(
+                MenuProduct.objects.filter(stock_item__isnull=False).order_by('pk').values_list('pk', 'stock_item_id')
+            ).reshape(-1, 2)
+        columns = month.colunas
+        selected = np.isin(columns['status'], archived_status)
+        products = columns['produto_id'][selected]
+        positions = np.searchsorted(product_map[:, 0], products)
+        mapped = (positions < len(product_map)) & (product_map[np.minimum(positions, len(product_map) - 1), 0] == products)
+        offsets = arquivo.posicoes_locais(columns['data_venda'][selected][mapped], start, n_days)
+        _add(
+            consumption, ids, product_map[positions[mapped], 1], offsets,
+            columns['quantidade'][selected][mapped].astype(float),
+        )
+    return consumption
+
+
+def _add(consumption, ids, item_ids, offsets, totals):
+    """Soma `totals` em consumption[item, dia]; itens fora de `ids` e dias fora da matriz são ignorados."""
+    positions = np.searchsorted(ids, item_ids)
+    known = (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == item_ids) & (offsets >= 0)
+    np.add.at(consumption, (positions[known], offsets[known]), totals[known])
+
+
+def weekday_factors(consumption, start):
+    """
+    Fator de cada dia da semana (itens × 7, segunda = 0): consumo médio naquele
+    dia sobre o consumo médio geral. Usa só semanas completas; itens sem
+    histórico ficam com fator 1.
+    """
+    n_items, n_days = consumption.shape
+    weeks = n_days // 7
+    if not weeks:
+        return np.ones((n_items, 7))
+    skipped = n_days - weeks * 7
+    by_position = consumption[:, skipped:].reshape(n_items, weeks, 7).mean(axis=1)
+    # A posição p da semana recortada cai no dia da semana (primeiro + p) % 7.
+    by_weekday = np.roll(by_position, (start + timedelta(days=skipped)).weekday(), axis=1)
+    mean = by_weekday.mean(axis=1, keepdims=True)
+    return np.divide(by_weekday, mean, out=np.ones_like(by_weekday), where=mean > 0)
+
+
+def _days_until(cumulative, thresholds):
+    """Primeiro dia (1 = amanhã) em que o acumulado alcança o limite; 0 se já alcançou, None se não alcança."""
+    # Tolerância para o erro de ponto flutuante da soma acumulada (19.999... não pode virar um dia a mais).
+    reached = cumulative + 1e-9 >= thresholds[:, None]
+    days = np.where(reached.any(axis=1), reached.argmax(axis=1) + 1, -1)
+    days = np.where(thresholds <= 0, 0, days)
+    return [None if day < 0 else int(day) for day in days]
+
+
+def forecast_stock(history_days=HISTORY_DAYS, coverage_days=COVERAGE_DAYS, today=None):
+    """Calcula a previsão de todos os itens de estoque. Retorna um Forecast."""
+    today = today or timezone.localdate()
+    items = list(
+        StockItem.objects.select_related('supplier').prefetch_related('shards').order_by('pk')
+    )
+    start = today - timedelta(days=history_days)
+    end = today - timedelta(days=1)      # Hoje ainda está em andamento
+    consumption = load_daily_consumption([item.pk for item in items], start, end)
+
+    window = consumption[:, -WINDOW_DAYS:]
+    daily_demand = window.mean(axis=1) if window.size else np.zeros(len(items))
+    factors = weekday_factors(consumption, start)
+
+    horizon = max(HORIZON_DAYS, coverage_days)
+    future_weekdays = (today.weekday() + np.arange(1, horizon + 1)) % 7
+    projection = daily_demand[:, None] * factors[:, future_weekdays]
+    cumulative = np.cumsum(projection, axis=1)
+
+    available = np.array([float(item.available_quantity) for item in items])
+    minimum = np.array([float(item.minimum_stock_level) for item in items])
+    days_until_stockout = _days_until(cumulative, available)
+    days_until_minimum = _days_until(cumulative, available - minimum)
+    needed = cumulative[:, coverage_days - 1] + minimum - available if coverage_days else minimum - available
+
+    forecast = Forecast(generated_at=timezone.now(), history_days=history_days, coverage_days=coverage_days)
+    by_supplier = {}
+    for index, item in enumerate(items):
+        suggested = Decimal(math.ceil(needed[index])) if needed[index] > 0 else Decimal('0')
+        row = {
+            'stock_item': item.pk,
+            'name': item.name,
+            'unit_of_measure': item.unit_of_measure,
+            'available_quantity': item.available_quantity,
+            'minimum_stock_level': item.minimum_stock_level,
+            'daily_demand': round(float(daily_demand[index]), 3),
+            'days_until_minimum': days_until_minimum[index],
+            'days_until_stockout': days_until_stockout[index],
+            'suggested_quantity': suggested,
+        }
+        forecast.items.append(row)
+        if suggested:
+            supplier = by_supplier.setdefault(item.supplier_id, {
+                'supplier': item.supplier_id,
+                'supplier_name': item.supplier.name if item.supplier else None,
+                'estimated_cost': Decimal('0'),
+                'items': [],
+            })
+            supplier['items'].append(row)
+            if item.cost_price is not None:
+                supplier['estimated_cost'] += suggested * item.cost_price
+
+    # Fornecedores com o item mais urgente primeiro.
+    def urgency(supplier):
+        return min(row['days_until_stockout'] if row['days_until_stockout'] is not None else horizon + 1
+                   for row in supplier['items'])
+    forecast.suppliers = sorted(by_supplier.values(), key=lambda supplier: (urgency(supplier), supplier['supplier_name'] or ''))
+    return forecast
+
+
+def save_snapshot(forecast):
+    """Substitui a tabela StockForecast pela previsão calculada. Retorna quantas linhas gravou."""
+    with transaction.atomic():
+        StockForecast.objects.all().delete()
+        StockForecast.objects.bulk_create([
+            StockForecast(
+                stock_item_id=row['stock_item'],
+                generated_at=forecast.generated_at,
+                available_quantity=row['available_quantity'],
+                daily_demand=Decimal(str(row['daily_demand'])),
+                days_until_minimum=row['days_until_minimum'],
+                days_until_stockout=row['days_until_stockout'],
+                suggested_quantity=row['suggested_quantity'],
+            )
+            for row in forecast.items
+        ], batch_size=1000)
+    return len(forecast.items)
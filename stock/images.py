@@ -0,0 +1,182 @@
+# stock/images.py
+"""
+Variantes das fotos de StockItem e MenuProduct para o cardápio.
+
+Cada foto enviada ganha versões reduzidas (VARIANTS: largura máxima) em WebP e
+JPEG, gravadas no mesmo storage com o hash do conteúdo no nome
+(<pasta>/variants/<nome>.<variante>.<hash>.<ext>): um arquivo nunca muda depois
+de publicado, então a URL pode ser cacheada para sempre.
+
+A geração roda depois do commit, em um pool de threads (STOCK_IMAGE_WORKERS;
+0 = na própria thread), para que o upload não espere o Pillow. O resultado vai
+para o campo image_variants do objeto, que os serializers expõem como srcset.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .menu_snapshot import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Nome da variante -> largura máxima em pixels (a altura segue a proporção).
+VARIANTS = {
+    'thumb': 160,
+    'medium': 480,
+}
+# Formato -> (extensão, opções do Image.save)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+HASH_LENGTH = 16
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _workers():
+    return getattr(settings, 'STOCK_IMAGE_WORKERS', 2)
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_workers(), thread_name_prefix='stock-images')
+    return _executor
+
+
+def _encode(image, format_name):
+    extension, options = FORMATS[format_name]
+    if format_name == 'jpeg' and image.mode != 'RGB':
+        # JPEG não tem transparência: o fundo transparente vira branco.
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, **options)
+    return extension, buffer.getvalue()
+
+
+def render_variants(source):
+    """
+    Gera as variantes de uma imagem (arquivo aberto ou bytes). Retorna
+    {variante: (largura, {formato: (extensão, bytes)})}.
+    """
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        rendered = {}
+        for variant, max_width in VARIANTS.items():
+            image = original.copy()
+            # Nunca amplia: uma foto menor que a variante só é recodificada.
+            image.thumbnail((max_width, max_width * 10), Image.Resampling.LANCZOS)
+            rendered[variant] = (image.width, {name: _encode(image, name) for name in FORMATS})
+    return rendered
+
+
+def variant_name(source_name, variant, extension, data):
+    folder, filename = posixpath.split(source_name)
+    stem = posixpath.splitext(filename)[0]
+    digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+    return posixpath.join(folder, 'variants', f'{stem}.{variant}.{digest}.{extension}')
+
+
+def store_variants(source_name):
+    """
+    Gera e grava as variantes da imagem `source_name` do storage. Retorna o
+    dicionário guardado em image_variants:
+    {'source': nome, variante: {'width': largura, formato: nome do arquivo}}.
+    """
+    with default_storage.open(source_name, 'rb') as source:
+        rendered = render_variants(source)
+    stored = {'source': source_name}
+    for variant, (width, encoded) in rendered.items():
+        stored[variant] = {'width': width}
+        for format_name, (extension, data) in encoded.items():
+            name = variant_name(source_name, variant, extension, data)
+            # Mesmo nome = mesmo conteúdo: um arquivo já gravado não é regravado.
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(data))
+            stored[variant][format_name] = name
+    return stored
+
+
+def generate_variants(model_label, pk, source_name):
+    """
+    Tarefa do pool: gera as variantes e grava no objeto, se a foto dele ainda
+    for `source_name` (um upload mais novo tem a sua própria tarefa). Retorna o
+    image_variants gravado, ou None se a imagem não pôde ser processada.
+    """
+    try:
+        variants = store_variants(source_name)
+    except Exception:
+        # O objeto continua com a foto original; o backfill tenta de novo.
+        logger.exception("Falha ao gerar as variantes de %s (%s #%s).", source_name, model_label, pk)
+        return None
+    model = apps.get_model(model_label)
+    if model.objects.filter(pk=pk, image=source_name).update(image_variants=variants):
+        # update() não dispara os signals do cardápio.
+        bump_catalog_version()
+    return variants
+
+
+def generate_variants_in_worker(model_label, pk, source_name):
+    """generate_variants em uma thread do pool, que tem a sua própria conexão com o banco."""
+    close_old_connections()
+    try:
+        return generate_variants(model_label, pk, source_name)
+    finally:
+        close_old_connections()
+
+
+def needs_variants(instance):
+    return bool(instance.image) and (instance.image_variants or {}).get('source') != instance.image.name
+
+
+def schedule_variants(instance):
+    """
+    Agenda a geração das variantes da foto de `instance`, se ela mudou. Roda
+    depois do commit: a tarefa precisa enxergar o objeto gravado.
+    """
+    if not instance.image:
+        if instance.image_variants:
+            # Foto removida: as variantes antigas deixam de ser anunciadas.
+            type(instance).objects.filter(pk=instance.pk).update(image_variants={})
+        return
+    if not needs_variants(instance):
+        return
+    task = (instance._meta.label, instance.pk, instance.image.name)
+    if _workers():
+        transaction.on_commit(lambda: _pool().submit(generate_variants_in_worker, *task))
+    else:
+        transaction.on_commit(lambda: generate_variants(*task))
+
+
+def srcset(variants, url):
+    """
+    Um srcset por formato a partir de image_variants, ex.:
+    {'webp': '<url> 160w, <url> 480w', 'jpeg': ...}. `url` converte o nome do
+    arquivo na URL entregue ao cliente. None se ainda não há variantes.
+    """
+    sizes = [variants[variant] for variant in VARIANTS if variant in (variants or {})]
+    if not sizes:
+        return None
+    return {
+        format_name: ', '.join(f"{url(size[format_name])} {size['width']}w" for size in sizes)
+        for format_name in FORMATS
+    }
@@ -0,0 +1,18 @@
+# stock/management/commands/fold_stock_shards.py
+from django.core.management.base import BaseCommand
+
+from stock.services import fold_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida os contadores fragmentados dos itens de estoque: desconta o consumo dos shards "
+        "da linha principal e redistribui as cotas. Pensado para rodar periodicamente (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="IDs dos itens (padrão: todos os fragmentados).")
+
+    def handle(self, *args, **options):
+        consolidados = fold_shards(options['ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"{consolidados} item(ns) consolidado(s)."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from stock.forecasting import forecast_stock, save_snapshot, HISTORY_DAYS, COVERAGE_DAYS
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula a previsão de consumo de todos os itens de estoque e grava o resultado na tabela "
+        "StockForecast (substituindo a anterior). Pensado para rodar uma vez por dia (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help="Dias de histórico de vendas.")
+        parser.add_argument('--coverage-days', type=int, default=COVERAGE_DAYS, help="Dias que a reposição deve cobrir.")
+
+    def handle(self, *args, **options):
+        forecast = forecast_stock(history_days=options['history_days'], coverage_days=options['coverage_days'])
+        saved = save_snapshot(forecast)
+        for supplier in forecast.suppliers:
+            items = ', '.join(f"{row['name']} ({row['suggested_quantity']})" for row in supplier['items'])
+            self.stdout.write(f"{supplier['supplier_name'] or 'Sem fornecedor'}: {items}")
+        self.stdout.write(self.style.SUCCESS(f"{saved} previsão(ões) gravada(s)."))
@@ -0,0 +1,42 @@
+# stock/management/commands/generate_image_variants.py
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from stock.images import generate_variants, generate_variants_in_worker, needs_variants
+from stock.models import MenuProduct, StockItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as variantes (miniaturas WebP/JPEG) das fotos de itens de estoque e produtos do cardápio "
+        "que ainda não as têm: backfill das fotos antigas ou das que falharam no upload."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regera também as fotos que já têm variantes.")
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'STOCK_IMAGE_WORKERS', 2) or 1,
+            help="Imagens processadas em paralelo.",
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers precisa ser positivo.")
+        tasks = [
+            (model._meta.label, instance.pk, instance.image.name)
+            for model in (StockItem, MenuProduct)
+            for instance in model.objects.exclude(image='').exclude(image__isnull=True).only('pk', 'image', 'image_variants')
+            if options['force'] or needs_variants(instance)
+        ]
+        if options['workers'] == 1:
+            results = [generate_variants(*task) for task in tasks]
+        else:
+            with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='stock-images') as pool:
+                results = list(pool.map(lambda task: generate_variants_in_worker(*task), tasks))
+
+        failed = [task for task, result in zip(tasks, results) if result is None]
+        for label, pk, name in failed:
+            self.stderr.write(f"{label} #{pk}: não foi possível processar {name}.")
+        self.stdout.write(self.style.SUCCESS(f"{len(tasks) - len(failed)} foto(s) processada(s), {len(failed)} falha(s)."))
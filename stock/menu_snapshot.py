@@ -0,0 +1,128 @@
+# stock/menu_snapshot.py
+"""
+Snapshot do cardápio público (GET de MenuProductListCreateView sem a equipe).
+
+O JSON do cardápio é montado uma vez e guardado em bytes na memória do
+processo, junto com a versão do catálogo usada para montá-lo. A versão fica no
+cache (STOCK_CATALOG_CACHE_ALIAS) e é incrementada depois do commit das
+gravações da equipe que mudam o cardápio: save/delete de MenuProduct,
+StockItem, Category e Supplier (stock/signals.py) e as variantes de imagem.
+
+O estoque mostrado no cardápio muda a cada pedido; as baixas, reservas e
+estornos dos pedidos não mexem na versão (seria um snapshot novo por pedido).
+Em vez disso, todo snapshot vale no máximo STOCK_MENU_SNAPSHOT_TTL segundos:
+o estoque do cardápio atrasa no máximo isso, e um processo que não enxerga a
+versão dos outros (cache em memória local com vários workers) também nunca
+serve um cardápio mais velho que isso. O checkout confere o estoque de verdade.
+
+Enquanto o snapshot vale, a resposta sai dele sem tocar no banco, com um ETag
+forte (hash do conteúdo); um If-None-Match igual recebe 304, inclusive depois
+de remontar um snapshot com o mesmo conteúdo.
+"""
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_cache_control, patch_vary_headers
+
+CATALOG_VERSION_KEY = 'stock:catalog-version'
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    # time.monotonic() de quando foi montado
+    built_at: float
+
+
+# (endereço base das URLs de imagem) -> MenuSnapshot. Um por processo.
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def catalog_cache():
+    return caches[getattr(settings, 'STOCK_CATALOG_CACHE_ALIAS', 'default')]
+
+
+def snapshot_ttl():
+    return getattr(settings, 'STOCK_MENU_SNAPSHOT_TTL', 5)
+
+
+def catalog_version():
+    """
+    Versão atual do catálogo. Se o cache perdeu a chave, uma nova nasce com o
+    relógio em nanossegundos, maior que qualquer versão anterior.
+    """
+    cache = catalog_cache()
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 0)
+    return version
+
+
+def _bump():
+    cache = catalog_cache()
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_catalog_version():
+    """
+    Invalida os snapshots do cardápio. O incremento só acontece depois do commit:
+    antes disso, um leitor poderia montar o snapshot com os dados antigos e
+    guardá-lo sob a versão nova.
+    """
+    transaction.on_commit(_bump)
+
+
+def menu_snapshot(base_url, render):
+    """
+    Snapshot do cardápio para `base_url`, chamando `render()` (que devolve os bytes
+    do JSON) só quando o guardado é de uma versão anterior do catálogo.
+    """
+    # A versão é lida antes de montar: uma gravação no meio deixa o snapshot
+    # com a versão antiga, e a próxima requisição monta de novo.
+    version = catalog_version()
+    snapshot = _snapshots.get(base_url)
+    if not _valid(snapshot, version):
+        with _lock:
+            snapshot = _snapshots.get(base_url)
+            if not _valid(snapshot, version):
+                built_at = time.monotonic()
+                body = render()
+                snapshot = MenuSnapshot(version, body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', built_at)
+                _snapshots[base_url] = snapshot
+    return snapshot
+
+
+def _valid(snapshot, version):
+    return (
+        snapshot is not None and snapshot.version == version
+        and time.monotonic() - snapshot.built_at < snapshot_ttl()
+    )
+
+
+def snapshot_response(request, snapshot):
+    """Resposta com o corpo do snapshot, ou 304 se o cliente já tem o mesmo ETag."""
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    # If-None-Match usa a comparação fraca: W/"x" vale o mesmo que "x".
+    if '*' in etags or snapshot.etag in (etag.removeprefix('W/') for etag in etags):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(snapshot.body, content_type='application/json')
+    response['ETag'] = snapshot.etag
+    # O navegador guarda o cardápio, mas confirma a versão (If-None-Match) a cada uso.
+    patch_cache_control(response, public=True, no_cache=True)
+    # Com o token da equipe a mesma URL devolve o cardápio completo.
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0009_stockitem_profit_percentage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockitem',
+            name='reserved_quantity',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Quantidade Reservada'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0010_stockitem_reserved_quantity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockitem',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='0 = modo normal. Acima de 0, número de sub-contadores usados nas baixas deste item.', verbose_name='Contadores Fragmentados'),
+        ),
+        migrations.CreateModel(
+            name='StockItemShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(verbose_name='Índice')),
+                ('quota', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Cota')),
+                ('consumed', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Consumido')),
+                ('stock_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='stock.stockitem', verbose_name='Item de Estoque')),
+            ],
+            options={
+                'verbose_name': 'Sub-contador de Estoque',
+                'verbose_name_plural': 'Sub-contadores de Estoque',
+                'constraints': [models.UniqueConstraint(fields=('stock_item', 'index'), name='unique_stockitem_shard_index')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0011_stockitem_counter_shards_stockitemshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generated_at', models.DateTimeField(verbose_name='Gerada em')),
+                ('available_quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Quantidade Disponível')),
+                ('daily_demand', models.DecimalField(decimal_places=3, max_digits=10, verbose_name='Consumo Diário Previsto')),
+                ('days_until_minimum', models.PositiveIntegerField(blank=True, null=True, verbose_name='Dias até o Estoque Mínimo')),
+                ('days_until_stockout', models.PositiveIntegerField(blank=True, null=True, verbose_name='Dias até Acabar')),
+                ('suggested_quantity', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Reposição Sugerida')),
+                ('stock_item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='forecast', to='stock.stockitem', verbose_name='Item de Estoque')),
+            ],
+            options={
+                'verbose_name': 'Previsão de Estoque',
+                'verbose_name_plural': 'Previsões de Estoque',
+            },
+        ),
+    ]
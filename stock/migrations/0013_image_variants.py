@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0012_stockforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuproduct',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Foto'),
+        ),
+        migrations.AddField(
+            model_name='stockitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes da Foto'),
+        ),
+    ]
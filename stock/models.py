@@ -44,12 +44,24 @@ class StockItem(models.Model):
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Fornecedor")
 
     quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Quantidade")
+    # Total segurado por pedidos online ainda não pagos (ver orders.ReservaEstoque).
+    # Mantido com F() pelas vendas, para que o disponível seja lido sem varrer pedidos.
+    reserved_quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Quantidade Reservada")
+    # Modo opcional para itens muito vendidos (refrigerante, coxinha): as baixas vão para
+    # StockItemShard em vez desta linha, evitando que todas as vendas esperem pela mesma trava.
+    counter_shards = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Contadores Fragmentados",
+        help_text="0 = modo normal. Acima de 0, número de sub-contadores usados nas baixas deste item."
+    )
     unit_of_measure = models.CharField(max_length=20, default="unidades", verbose_name="Unidade de Medida")
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Preço de Custo")
     last_updated = models.DateTimeField(auto_now=True, verbose_name="Última Atualização")
     minimum_stock_level = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Estoque Mínimo")
     expiry_date = models.DateField(null=True, blank=True, verbose_name="Data de Validade")
     image = models.ImageField(upload_to='stock_images/', null=True, blank=True, verbose_name="Foto do Item")
+    # Miniaturas WebP/JPEG da foto, geradas em segundo plano (stock/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes da Foto")
 
     profit_percentage = models.DecimalField(
         max_digits=5, 
@@ -62,9 +74,20 @@ class StockItem(models.Model):
     def __str__(self):
         return f"{self.name} ({self.quantity} {self.unit_of_measure})"
         
+    @property
+    def current_quantity(self):
+        """Quantidade física: no modo fragmentado, desconta o consumo ainda não consolidado."""
+        if not self.counter_shards:
+            return self.quantity
+        return self.quantity - sum((shard.consumed for shard in self.shards.all()), 0)
+
+    @property
+    def available_quantity(self):
+        return self.current_quantity - self.reserved_quantity
+
     @property
     def is_below_minimum_stock(self):
-        return self.quantity < self.minimum_stock_level
+        return self.current_quantity < self.minimum_stock_level
 
     @property
     def is_expired(self):
@@ -84,6 +107,27 @@ class StockItem(models.Model):
         verbose_name_plural = "Itens de Estoque"
         ordering = ['name']
 
+class StockItemShard(models.Model):
+    """
+    Sub-contador de um StockItem em modo fragmentado. Cada shard recebe uma cota do
+    saldo livre e as vendas consomem de um shard sorteado com UPDATE condicional.
+    O job fold_stock_shards devolve o consumo à linha principal e refaz as cotas.
+    """
+    stock_item = models.ForeignKey(StockItem, related_name='shards', on_delete=models.CASCADE, verbose_name="Item de Estoque")
+    index = models.PositiveSmallIntegerField(verbose_name="Índice")
+    quota = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Cota")
+    consumed = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Consumido")
+
+    def __str__(self):
+        return f"{self.stock_item_id}#{self.index} ({self.consumed}/{self.quota})"
+
+    class Meta:
+        verbose_name = "Sub-contador de Estoque"
+        verbose_name_plural = "Sub-contadores de Estoque"
+        constraints = [
+            models.UniqueConstraint(fields=['stock_item', 'index'], name='unique_stockitem_shard_index'),
+        ]
+
 # --- NOVO MODELO PARA PRODUTOS DO CARDÁPIO ---
 class MenuProduct(models.Model):
     stock_item = models.ForeignKey(
@@ -115,6 +159,8 @@ class MenuProduct(models.Model):
         verbose_name="Foto no Cardápio",
         help_text="Foto específica para o cardápio. Se deixado em branco, pode-se usar a foto do item de estoque."
     )
+    # Miniaturas WebP/JPEG da foto, geradas em segundo plano (stock/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes da Foto")
     is_active = models.BooleanField(
         default=True, 
         verbose_name="Ativo no Cardápio?",
@@ -129,4 +175,24 @@ class MenuProduct(models.Model):
     class Meta:
         verbose_name = "Produto do Cardápio"
         verbose_name_plural = "Produtos do Cardápio"
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['name']
+
+class StockForecast(models.Model):
+    """
+    Última previsão de consumo de cada item de estoque, gravada pelo comando
+    forecast_stock (ver stock/forecasting.py) para consulta sem recalcular.
+    """
+    stock_item = models.OneToOneField(StockItem, related_name='forecast', on_delete=models.CASCADE, verbose_name="Item de Estoque")
+    generated_at = models.DateTimeField(verbose_name="Gerada em")
+    available_quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Quantidade Disponível")
+    daily_demand = models.DecimalField(max_digits=10, decimal_places=3, verbose_name="Consumo Diário Previsto")
+    days_until_minimum = models.PositiveIntegerField(null=True, blank=True, verbose_name="Dias até o Estoque Mínimo")
+    days_until_stockout = models.PositiveIntegerField(null=True, blank=True, verbose_name="Dias até Acabar")
+    suggested_quantity = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Reposição Sugerida")
+
+    def __str__(self):
+        return f"{self.stock_item_id}: {self.daily_demand}/dia, acaba em {self.days_until_stockout} dia(s)"
+
+    class Meta:
+        verbose_name = "Previsão de Estoque"
+        verbose_name_plural = "Previsões de Estoque"
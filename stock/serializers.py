@@ -1,6 +1,21 @@
 # stock/serializers.py
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .images import srcset
 from .models import StockItem, Category, Supplier, MenuProduct
+from .services import fold_shards
+
+
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """Variantes da foto (image_variants) como um srcset por formato, com URLs absolutas como as de image."""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+
+        def url(name):
+            relative = default_storage.url(name)
+            return request.build_absolute_uri(relative) if request else relative
+        return srcset(value, url)
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,24 +33,53 @@ class StockItemSerializer(serializers.ModelSerializer):
     is_expired = serializers.BooleanField(read_only=True)
     is_below_minimum_stock = serializers.BooleanField(read_only=True)
     days_until_expiry = serializers.IntegerField(read_only=True, allow_null=True)
+    available_quantity = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
     suggested_sale_price = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField(source='image_variants')
 
     class Meta:
         model = StockItem
         fields = [
             'id', 'name', 'category', 'category_name', 
             'supplier', 'supplier_name',
-            'quantity', 'unit_of_measure', 'cost_price', 'profit_percentage', 'last_updated', 
-            'minimum_stock_level', 'image', 'expiry_date',
+            'quantity', 'reserved_quantity', 'available_quantity', 'counter_shards', 'unit_of_measure', 'cost_price', 'profit_percentage', 'last_updated', 
+            'minimum_stock_level', 'image', 'image_srcset', 'expiry_date',
             'is_expired',
             'is_below_minimum_stock',
             'days_until_expiry', 'suggested_sale_price'
         ]
         read_only_fields = [
-            'last_updated', 'category_name', 'supplier_name',
-            'is_expired', 'is_below_minimum_stock', 'days_until_expiry', 'suggested_sale_price'
+            'last_updated', 'category_name', 'supplier_name', 'reserved_quantity', 'available_quantity',
+            'is_expired', 'is_below_minimum_stock', 'days_until_expiry', 'suggested_sale_price', 'image_srcset'
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # No modo fragmentado a quantidade da linha só é exata depois da consolidação.
+        if instance.counter_shards:
+            data['quantity'] = self.fields['quantity'].to_representation(instance.current_quantity)
+        return data
+
+    def create(self, validated_data):
+        instance = super().create(validated_data)
+        if instance.counter_shards:
+            fold_shards([instance.pk])
+        return instance
+
+    def update(self, instance, validated_data):
+        # Grava só as colunas editadas: quantity e reserved_quantity são alteradas
+        # com F() por vendas e reservas, e regravar a linha inteira desfaria as que
+        # entraram entre a leitura do item e este save.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'last_updated'])
+        instance.refresh_from_db(fields=['quantity', 'reserved_quantity'])
+        # Uma quantidade informada pela equipe é a contagem real: o consumo pendente
+        # nos shards é descartado e as cotas são refeitas a partir dela.
+        if 'quantity' in validated_data or 'counter_shards' in validated_data:
+            fold_shards([instance.pk], discard_consumed='quantity' in validated_data)
+        return instance
+
     def get_suggested_sale_price(self, obj):
         # Verifica se o item tem os campos necessários para o cálculo
         if obj.cost_price and hasattr(obj, 'profit_percentage') and obj.profit_percentage is not None:
@@ -53,13 +97,18 @@ class MenuProductSerializer(serializers.ModelSerializer):
     # Campos de leitura para dados relacionados
     stock_item_name = serializers.CharField(source='stock_item.name', read_only=True, allow_null=True)
     stock_item_category_name = serializers.CharField(source='stock_item.category.name', read_only=True, allow_null=True)
-    stock_item_quantity = serializers.DecimalField(source='stock_item.quantity', max_digits=10, decimal_places=2, read_only=True)
+    stock_item_quantity = serializers.DecimalField(source='stock_item.current_quantity', max_digits=10, decimal_places=2, read_only=True)
+    # Quantidade que ainda pode ser vendida (estoque físico menos as reservas de pedidos online)
+    stock_item_available_quantity = serializers.DecimalField(source='stock_item.available_quantity', max_digits=10, decimal_places=2, read_only=True)
     cost_price = serializers.DecimalField(source='stock_item.cost_price', max_digits=10, decimal_places=2, read_only=True, allow_null=True) # <-- NOVO
     supplier_name = serializers.CharField(source='stock_item.supplier.name', read_only=True, allow_null=True) # <-- NOVO
 
     # Campos de imagem
     image_url = serializers.ImageField(source='image', read_only=True, use_url=True)
     stock_item_image_url = serializers.ImageField(source='stock_item.image', read_only=True, use_url=True)
+    # Miniaturas para o celular ({'webp': srcset, 'jpeg': srcset}); None enquanto não foram geradas
+    image_srcset = ImageSrcsetField(source='image_variants')
+    stock_item_image_srcset = ImageSrcsetField(source='stock_item.image_variants')
 
     class Meta:
         model = MenuProduct
@@ -69,6 +118,7 @@ class MenuProductSerializer(serializers.ModelSerializer):
             'stock_item_name',
             'stock_item_category_name', 
             'stock_item_quantity',
+            'stock_item_available_quantity',
             'name', 
             'description', 
             'sale_price',
@@ -77,6 +127,8 @@ class MenuProductSerializer(serializers.ModelSerializer):
             'image',
             'image_url',
             'stock_item_image_url',
+            'image_srcset',
+            'stock_item_image_srcset',
             'is_active',
             'created_at', 
             'updated_at'
@@ -85,10 +137,13 @@ class MenuProductSerializer(serializers.ModelSerializer):
             'stock_item_name', 
             'stock_item_category_name',
             'stock_item_quantity',
+            'stock_item_available_quantity',
             'cost_price', # <-- NOVO
             'supplier_name', # <-- NOVO
             'image_url',
             'stock_item_image_url',
+            'image_srcset',
+            'stock_item_image_srcset',
             'created_at', 
             'updated_at'
         )
@@ -0,0 +1,123 @@
+# stock/services.py
+import random
+from decimal import Decimal, ROUND_DOWN
+
+from django.db import transaction
+from django.db.models import F, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from .models import StockItem, StockItemShard
+
+CENTAVO = Decimal('0.01')
+
+
+def split_quota(total, parts):
+    """Divide `total` em `parts` cotas com 2 casas decimais; a sobra vai para a primeira."""
+    if parts <= 0:
+        return []
+    base = (total / parts).quantize(CENTAVO, rounding=ROUND_DOWN)
+    quotas = [base] * parts
+    quotas[0] += total - base * parts
+    return quotas
+
+
+def fold_shards(stock_item_ids=None, discard_consumed=False):
+    """
+    Consolida os contadores fragmentados (shards) de volta na linha do StockItem.
+
+    O consumo acumulado nos shards é descontado de StockItem.quantity, e o saldo
+    livre (quantidade menos reservas) é redistribuído em cotas iguais entre os
+    shards. Também cria/remove shards quando counter_shards foi alterado.
+    Com discard_consumed=True a quantidade atual do item é tomada como a contagem
+    real (ex.: a equipe acabou de ajustar o estoque) e o consumo pendente é zerado.
+    Retorna quantos itens foram consolidados.
+    """
+    with transaction.atomic():
+        ids = set(StockItemShard.objects.values_list('stock_item_id', flat=True).distinct())
+        ids.update(StockItem.objects.filter(counter_shards__gt=0).values_list('pk', flat=True))
+        if stock_item_ids is not None:
+            ids &= set(stock_item_ids)
+        if not ids:
+            return 0
+
+        # Mesma ordem de travas do checkout (StockItem por pk, depois os shards).
+        items = list(StockItem.objects.select_for_update().filter(pk__in=ids).order_by('pk'))
+        shards_por_item = {}
+        for shard in StockItemShard.objects.select_for_update().filter(stock_item_id__in=ids).order_by('stock_item_id', 'index'):
+            shards_por_item.setdefault(shard.stock_item_id, []).append(shard)
+
+        novos, alterados, removidos = [], [], []
+        for item in items:
+            shards = shards_por_item.get(item.pk, [])
+            if not discard_consumed:
+                item.quantity -= sum((shard.consumed for shard in shards), Decimal('0'))
+            livre = max(item.quantity - item.reserved_quantity, Decimal('0'))
+            quotas = split_quota(livre, item.counter_shards)
+
+            existentes = {shard.index: shard for shard in shards}
+            for index, quota in enumerate(quotas):
+                shard = existentes.pop(index, None)
+                if shard is None:
+                    novos.append(StockItemShard(stock_item=item, index=index, quota=quota, consumed=0))
+                else:
+                    shard.quota, shard.consumed = quota, 0
+                    alterados.append(shard)
+            removidos.extend(shard.pk for shard in existentes.values())
+
+        StockItem.objects.bulk_update(items, ['quantity'])
+        StockItemShard.objects.bulk_update(alterados, ['quota', 'consumed'])
+        StockItemShard.objects.bulk_create(novos)
+        StockItemShard.objects.filter(pk__in=removidos).delete()
+    return len(items)
+
+
+def sharded_available(stock_item_ids):
+    """
+    Saldo disponível (sem trava) dos itens fragmentados: quantidade da linha principal
+    menos o consumo pendente nos shards e as reservas. Uma única query.
+    """
+    pendente = Coalesce(Sum('shards__consumed'), Value(Decimal('0')), output_field=DecimalField())
+    linhas = StockItem.objects.filter(pk__in=stock_item_ids).annotate(pendente=pendente).values_list(
+        'pk', 'quantity', 'reserved_quantity', 'pendente'
+    )
+    return {pk: quantity - pendente - reserved for pk, quantity, reserved, pendente in linhas}
+
+
+def _take(stock_item_id, index, quantity, reserve):
+    # Uma venda aumenta o consumo do shard; uma reserva tira a quantidade da cota,
+    # pois ela passa a ser controlada por StockItem.reserved_quantity.
+    campo = {'quota': F('quota') - quantity} if reserve else {'consumed': F('consumed') + quantity}
+    return StockItemShard.objects.filter(
+        stock_item_id=stock_item_id, index=index, quota__gte=F('consumed') + quantity
+    ).update(**campo)
+
+
+def take_from_shards(stock_item_id, quantity, shards, reserve=False):
+    """
+    Retira `quantity` unidades vendáveis de um item em modo fragmentado, sem travar
+    a linha do StockItem. Tenta primeiro um único shard sorteado (um UPDATE
+    condicional); se ele não tiver saldo, divide o pedido entre os shards. Retorna
+    False se as cotas não cobrem o pedido: o chamador deve desfazer a transação,
+    pois partes podem ter sido retiradas.
+
+    Nunca consolida (fold_shards trava o StockItem antes dos shards, e aqui os
+    shards já estão travados): o saldo que ficou fora das cotas (reservas
+    liberadas, reposições) volta com o fold_stock_shards periódico ou com um
+    fold_shards do chamador depois que a transação terminar.
+    """
+    inicio = random.randrange(shards)
+    if _take(stock_item_id, inicio, quantity, reserve):
+        return True
+
+    restante = quantity
+    linhas = list(
+        StockItemShard.objects.filter(stock_item_id=stock_item_id).order_by('index').values_list('index', 'quota', 'consumed')
+    )
+    linhas = linhas[inicio:] + linhas[:inicio]
+    for index, quota, consumed in linhas:
+        parte = min(quota - consumed, restante)
+        if parte > 0 and _take(stock_item_id, index, parte, reserve):
+            restante -= parte
+            if not restante:
+                return True
+    return False
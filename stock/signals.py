@@ -0,0 +1,23 @@
+# stock/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .images import schedule_variants
+from .menu_snapshot import bump_catalog_version
+from .models import Category, MenuProduct, StockItem, Supplier
+
+
+@receiver([post_save, post_delete], sender=MenuProduct)
+@receiver([post_save, post_delete], sender=StockItem)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Supplier)
+def catalog_changed(sender, **kwargs):
+    # O cardápio público mostra nome, categoria, fornecedor, preço, estoque e imagens.
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=MenuProduct)
+@receiver(post_save, sender=StockItem)
+def image_saved(sender, instance, **kwargs):
+    # Uma foto nova ganha as variantes do cardápio depois do commit.
+    schedule_variants(instance)
@@ -1,3 +1,421 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import warnings
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.db.models import F
+from django.test import AsyncClient, TestCase
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from lanchonete_backend_python.testing import OrcamentoQueriesMixin
+from users.models import CustomUser
+from orders.models import Venda, ItemVenda
+from orders.services import registrar_venda
+from .forecasting import forecast_stock, weekday_factors
+from .menu_snapshot import CATALOG_VERSION_KEY, catalog_cache, catalog_version
+from .models import Category, MenuProduct, StockForecast, StockItem, StockItemShard, Supplier
+from .serializers import StockItemSerializer
+from .services import fold_shards, split_quota, take_from_shards
+
+
+class ShardedCounterTests(TestCase):
+    def setUp(self):
+        self.item = StockItem.objects.create(name='Refrigerante', quantity=10, counter_shards=4)
+        fold_shards([self.item.pk])
+
+    def test_fold_distribui_o_saldo_livre_entre_os_shards(self):
+        quotas = list(self.item.shards.order_by('index').values_list('quota', flat=True))
+        self.assertEqual(quotas, [Decimal('2.50')] * 4)
+        self.assertEqual(split_quota(Decimal('10'), 3), [Decimal('3.34'), Decimal('3.33'), Decimal('3.33')])
+
+    def test_baixa_maior_que_um_shard_e_dividida_entre_eles(self):
+        self.assertTrue(take_from_shards(self.item.pk, 7, shards=4))
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.current_quantity, 3)
+        self.assertEqual(self.item.quantity, 10)
+
+    def test_nao_vende_alem_do_estoque(self):
+        self.assertTrue(take_from_shards(self.item.pk, 10, shards=4))
+        self.assertFalse(take_from_shards(self.item.pk, 1, shards=4))
+
+    def test_nao_consolida_durante_a_baixa(self):
+        # Reposição ainda fora das cotas: a baixa falha, e o fold fica para depois.
+        StockItem.objects.filter(pk=self.item.pk).update(quantity=F('quantity') + 10)
+
+        with transaction.atomic():
+            self.assertFalse(take_from_shards(self.item.pk, 12, shards=4))
+            # Como no checkout: a baixa parcial é desfeita com a transação.
+            transaction.set_rollback(True)
+        fold_shards([self.item.pk])
+        self.assertTrue(take_from_shards(self.item.pk, 12, shards=4))
+
+    def test_fold_consolida_o_consumo_na_linha_principal(self):
+        take_from_shards(self.item.pk, 3, shards=4)
+        fold_shards([self.item.pk])
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 7)
+        self.assertFalse(StockItemShard.objects.filter(stock_item=self.item, consumed__gt=0).exists())
+
+    def test_desligar_o_modo_fragmentado_remove_os_shards(self):
+        take_from_shards(self.item.pk, 2, shards=4)
+        StockItem.objects.filter(pk=self.item.pk).update(counter_shards=0)
+        fold_shards([self.item.pk])
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 8)
+        self.assertFalse(self.item.shards.exists())
+
+
+class StockItemEdicaoTests(TestCase):
+    def setUp(self):
+        self.item = StockItem.objects.create(name='Coxinha', quantity=10, cost_price=Decimal('3.00'))
+
+    def test_edicao_nao_desfaz_reserva_nem_venda_concorrentes(self):
+        carregado = StockItem.objects.get(pk=self.item.pk)
+        # Reserva de um pedido online e uma venda entre a leitura e o save da equipe.
+        StockItem.objects.filter(pk=self.item.pk).update(
+            reserved_quantity=F('reserved_quantity') + 2, quantity=F('quantity') - 1
+        )
+
+        serializer = StockItemSerializer(carregado, data={'cost_price': '3.50'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.cost_price, Decimal('3.50'))
+        self.assertEqual(self.item.reserved_quantity, 2)
+        self.assertEqual(self.item.quantity, 9)
+        self.assertEqual(serializer.data['reserved_quantity'], '2.00')
+
+    def test_contagem_informada_substitui_a_quantidade(self):
+        StockItem.objects.filter(pk=self.item.pk).update(reserved_quantity=2)
+        serializer = StockItemSerializer(self.item, data={'quantity': '25'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantity, 25)
+        self.assertEqual(self.item.reserved_quantity, 2)
+
+
+class OrcamentoQueriesListasTests(OrcamentoQueriesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='estoque@escola.com', password='senha-123', first_name='Edu', role='equipe'
+        ))
+        self.categoria = Category.objects.create(name='Salgados')
+        self.fornecedor = Supplier.objects.create(name='Distribuidora')
+        self.contador = 0
+
+    def semear(self):
+        for _ in range(3):
+            self.contador += 1
+            item = StockItem.objects.create(
+                name=f'Item {self.contador}', quantity=20, category=self.categoria, supplier=self.fornecedor,
+                counter_shards=2 if self.contador % 2 else 0
+            )
+            MenuProduct.objects.create(stock_item=item, name=f'Produto {self.contador}', sale_price=Decimal('5.00'))
+        fold_shards()
+
+    def test_itens_de_estoque(self):
+        self.assertOrcamentoQueries(self.client, reverse('stockitem-list-create'), 2, self.semear)
+
+    def test_cardapio_da_equipe_e_publico(self):
+        def semear_e_publicar():
+            # O cardápio público é um snapshot: só muda depois do commit das gravações.
+            with self.captureOnCommitCallbacks(execute=True):
+                self.semear()
+
+        self.assertOrcamentoQueries(self.client, reverse('menuproduct-list-create'), 2, self.semear)
+        self.assertOrcamentoQueries(APIClient(), reverse('menuproduct-list-create'), 2, semear_e_publicar)
+
+    def test_relatorio_de_produtos(self):
+        self.assertOrcamentoQueries(self.client, reverse('report-all-products'), 2, self.semear)
+
+    def test_fornecedores_e_categorias(self):
+        def semear():
+            self.semear()
+            Supplier.objects.create(name=f'Fornecedor {self.contador}')
+            Category.objects.create(name=f'Categoria {self.contador}')
+
+        self.assertOrcamentoQueries(self.client, reverse('supplier-list-create'), 1, semear)
+        self.assertOrcamentoQueries(self.client, reverse('category-list-create'), 1, semear)
+
+
+class MenuSnapshotTests(TestCase):
+    def setUp(self):
+        # Versão nova: nenhum snapshot de outro teste vale.
+        catalog_cache().delete(CATALOG_VERSION_KEY)
+        self.url = reverse('menuproduct-list-create')
+        item = StockItem.objects.create(name='Coxinha', quantity=20)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto = MenuProduct.objects.create(stock_item=item, name='Coxinha', sale_price=Decimal('6.00'))
+
+    def test_repeticao_e_304_nao_tocam_no_banco(self):
+        primeira = APIClient().get(self.url)
+        self.assertEqual(primeira.status_code, 200)
+        self.assertEqual([produto['name'] for produto in json.loads(primeira.content)], ['Coxinha'])
+        etag = primeira['ETag']
+        self.assertFalse(etag.startswith('W/'))
+
+        with self.assertNumQueries(0):
+            segunda = APIClient().get(self.url)
+            condicional = APIClient().get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(segunda.content, primeira.content)
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional['ETag'], etag)
+        self.assertEqual(condicional.content, b'')
+
+    def test_gravacoes_da_equipe_trocam_a_versao(self):
+        etag = APIClient().get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto.sale_price = Decimal('7.00')
+            self.produto.save()
+        response = APIClient().get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)[0]['sale_price'], '7.00')
+
+    def test_vendas_nao_trocam_a_versao_e_o_estoque_segue_o_prazo(self):
+        APIClient().get(self.url)
+        versao = catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venda([{'product_id': self.produto.id, 'quantity': 3}], 'PIX')
+        self.assertEqual(catalog_version(), versao)
+
+        with self.assertNumQueries(0):
+            antes = APIClient().get(self.url)
+        self.assertEqual(json.loads(antes.content)[0]['stock_item_available_quantity'], '20.00')
+        # Passado o prazo do snapshot, o cardápio é remontado com o estoque atual.
+        with self.settings(STOCK_MENU_SNAPSHOT_TTL=0):
+            depois = APIClient().get(self.url)
+        self.assertEqual(json.loads(depois.content)[0]['stock_item_available_quantity'], '17.00')
+
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (200, 40, 40, 128)).save(buffer, format='PNG')
+    return SimpleUploadedFile('foto.png', buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantsTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name, STOCK_IMAGE_WORKERS=0))
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='estoque@escola.com', password='senha-123', first_name='Edu', role='equipe'
+        ))
+
+    def test_upload_gera_variantes_com_hash_no_nome(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = StockItem.objects.create(name='Coxinha', quantity=10, image=png(800, 600))
+
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants['source'], item.image.name)
+        self.assertEqual(item.image_variants['thumb']['width'], 160)
+        self.assertEqual(item.image_variants['medium']['width'], 480)
+        nome = item.image_variants['thumb']['webp']
+        self.assertRegex(nome, r'^stock_images/variants/foto[^/]*\.thumb\.[0-9a-f]{16}\.webp$')
+        with default_storage.open(nome) as arquivo, Image.open(arquivo) as imagem:
+            self.assertEqual((imagem.format, imagem.size), ('WEBP', (160, 120)))
+        with default_storage.open(item.image_variants['medium']['jpeg']) as arquivo, Image.open(arquivo) as imagem:
+            self.assertEqual((imagem.format, imagem.mode), ('JPEG', 'RGB'))
+
+        data = self.client.get(reverse('stockitem-detail', args=[item.pk])).data
+        self.assertEqual(
+            data['image_srcset']['webp'],
+            f"http://testserver/media/{nome} 160w, http://testserver/media/{item.image_variants['medium']['webp']} 480w",
+        )
+
+    def test_foto_pequena_nao_e_ampliada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = StockItem.objects.create(name='Suco', quantity=10, image=png(100, 50))
+
+        item.refresh_from_db()
+        self.assertEqual(item.image_variants['thumb']['width'], 100)
+        self.assertEqual(item.image_variants['medium']['width'], 100)
+
+    def test_backfill_das_fotos_antigas(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            item = StockItem.objects.create(name='Bolo', quantity=10, image=png(300, 300))
+            MenuProduct.objects.create(stock_item=item, name='Bolo', sale_price=Decimal('5.00'), image=png(640, 480))
+        self.assertFalse(MenuProduct.objects.get().image_variants)
+
+        saida = io.StringIO()
+        call_command('generate_image_variants', '--workers', '1', stdout=saida)
+
+        self.assertIn('2 foto(s) processada(s), 0 falha(s)', saida.getvalue())
+        produto = MenuProduct.objects.get()
+        self.assertEqual(produto.image_variants['medium']['width'], 480)
+        self.assertEqual(produto.stock_item.image_variants['thumb']['width'], 160)
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        self.conteudo = bytes(range(256)) * 4
+        for nome in ('stock_images/foto.png', 'stock_images/variants/foto.thumb.0123456789abcdef.webp'):
+            caminho = Path(media.name) / nome
+            caminho.parent.mkdir(parents=True, exist_ok=True)
+            caminho.write_bytes(self.conteudo)
+
+    def test_cache_e_304(self):
+        response = self.client.get('/media/stock_images/variants/foto.thumb.0123456789abcdef.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.conteudo)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        original = self.client.get('/media/stock_images/foto.png')
+        self.assertNotIn('immutable', original['Cache-Control'])
+
+        condicional = self.client.get('/media/stock_images/foto.png', HTTP_IF_NONE_MATCH=original['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertEqual(condicional['ETag'], original['ETag'])
+
+    def test_intervalos(self):
+        url = '/media/stock_images/foto.png'
+        parcial = self.client.get(url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(parcial.status_code, 206)
+        self.assertEqual(b''.join(parcial.streaming_content), self.conteudo[10:20])
+        self.assertEqual(parcial['Content-Range'], 'bytes 10-19/1024')
+
+        final = self.client.get(url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(final.streaming_content), self.conteudo[-4:])
+
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=5000-').status_code, 416)
+        outra_versao = self.client.get(url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"outra"')
+        self.assertEqual(outra_versao.status_code, 200)
+
+    @mock.patch('lanchonete_backend_python.media.TAMANHO_DO_BLOCO', 256)
+    async def test_asgi_entrega_em_blocos_sem_juntar_o_arquivo(self):
+        url = '/media/stock_images/foto.png'
+        inteiro = await AsyncClient().get(url)
+        parcial = await AsyncClient().get(url, headers={'Range': 'bytes=10-19'})
+        # Um corpo síncrono seria lido inteiro com sync_to_async(list), com aviso.
+        self.assertTrue(inteiro.is_async)
+        self.assertTrue(parcial.is_async)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            blocos = [parte async for parte in inteiro.streaming_content]
+            intervalo = [parte async for parte in parcial.streaming_content]
+        self.assertEqual(len(blocos), 4)
+        self.assertEqual(b''.join(blocos), self.conteudo)
+        self.assertEqual(inteiro['Content-Length'], '1024')
+        self.assertEqual(b''.join(intervalo), self.conteudo[10:20])
+        self.assertEqual(parcial.status_code, 206)
+
+    def test_caminhos_invalidos_e_offload(self):
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/stock_images/').status_code, 404)
+        self.assertEqual(self.client.post('/media/stock_images/foto.png').status_code, 405)
+
+        with self.settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get('/media/stock_images/foto.png')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/stock_images/foto.png')
+        self.assertEqual(response.content, b'')
+
+
+class PaginacaoFornecedoresTests(TestCase):
+    def test_paginas_em_ordem_de_nome(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(
+            email='estoque@escola.com', password='senha-123', first_name='Edu', role='equipe'
+        ))
+        nomes = [f'Fornecedor {letra}' for letra in 'EDCBA']
+        for nome in nomes:
+            Supplier.objects.create(name=nome)
+
+        primeira = client.get(reverse('supplier-list-create'), {'page_size': 3})
+        segunda = client.get(primeira.data['next'])
+
+        self.assertEqual([f['name'] for f in primeira.data['results']], sorted(nomes)[:3])
+        self.assertEqual([f['name'] for f in segunda.data['results']], sorted(nomes)[3:])
+        self.assertIsNone(segunda.data['next'])
+
+
+class StockForecastTests(TestCase):
+    def setUp(self):
+        self.hoje = timezone.localdate()
+        self.fornecedor = Supplier.objects.create(name='Padaria Central')
+        self.pao = StockItem.objects.create(
+            name='Pão', quantity=30, minimum_stock_level=10, cost_price=Decimal('0.50'), supplier=self.fornecedor
+        )
+        self.parado = StockItem.objects.create(name='Guardanapo', quantity=100)
+        produto = MenuProduct.objects.create(stock_item=self.pao, name='Misto', sale_price=Decimal('8.00'))
+        # 2 unidades por dia nas últimas 4 semanas (e uma venda cancelada que não conta).
+        vendas = Venda.objects.bulk_create([
+            Venda(
+                status='CANCELADO' if dias == 0 else 'FINALIZADO', payment_method='PIX', valor_total=Decimal('16.00'),
+                data_venda=timezone.make_aware(datetime.combine(self.hoje - timedelta(days=max(dias, 1)), time(12))),
+            )
+            for dias in range(29)
+        ])
+        ItemVenda.objects.bulk_create([
+            ItemVenda(venda=venda, produto=produto, nome_produto='Misto', quantidade=2, preco_unitario=Decimal('8.00'))
+            for venda in vendas
+        ])
+
+    def test_fator_por_dia_da_semana(self):
+        inicio = date(2026, 3, 2)  # segunda-feira
+        consumo = np.zeros((2, 14))
+        consumo[0, [5, 12]] = 7  # só aos sábados
+
+        fatores = weekday_factors(consumo, inicio)
+
+        self.assertEqual(fatores[0].tolist(), [0, 0, 0, 0, 0, 7, 0])
+        self.assertEqual(fatores[1].tolist(), [1] * 7)
+
+    def test_previsao_e_sugestao_por_fornecedor(self):
+        previsao = forecast_stock(coverage_days=14, today=self.hoje)
+
+        pao, parado = sorted(previsao.items, key=lambda row: row['stock_item'] != self.pao.pk)
+        self.assertEqual(pao['daily_demand'], 2)
+        self.assertEqual(pao['days_until_minimum'], 10)
+        self.assertEqual(pao['days_until_stockout'], 15)
+        # 14 dias × 2 + mínimo 10 − disponível 30
+        self.assertEqual(pao['suggested_quantity'], Decimal('8'))
+        self.assertIsNone(parado['days_until_stockout'])
+        self.assertEqual(parado['suggested_quantity'], 0)
+
+        fornecedor, = previsao.suppliers
+        self.assertEqual(fornecedor['supplier_name'], 'Padaria Central')
+        self.assertEqual(fornecedor['estimated_cost'], Decimal('4.00'))
+        self.assertEqual([row['name'] for row in fornecedor['items']], ['Pão'])
+
+    def test_endpoint_e_comando(self):
+        client = APIClient()
+        client.force_authenticate(CustomUser.objects.create_user(
+            email='estoque@escola.com', password='senha-123', first_name='Edu', role='equipe'
+        ))
+        response = client.get(reverse('stock-forecast'), {'coverage_days': 7})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['coverage_days'], 7)
+        self.assertEqual(client.get(reverse('stock-forecast'), {'coverage_days': 0}).status_code, 400)
+
+        call_command('forecast_stock', stdout=io.StringIO())
+        self.assertEqual(StockForecast.objects.count(), 2)
+        self.assertEqual(StockForecast.objects.get(stock_item=self.pao).daily_demand, Decimal('2.000'))
 
-# Create your tests here.
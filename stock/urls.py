@@ -10,7 +10,8 @@ from .views import (
     # 1. IMPORTAMOS AS NOVAS VIEWS DE MenuProduct
     MenuProductListCreateView,
     MenuProductRetrieveUpdateDestroyView,
-    MenuProductReportView
+    MenuProductReportView,
+    StockForecastView
 )
 
 urlpatterns = [
@@ -30,4 +31,5 @@ urlpatterns = [
     path('menu-products/', MenuProductListCreateView.as_view(), name='menuproduct-list-create'),
     path('menu-products/<int:pk>/', MenuProductRetrieveUpdateDestroyView.as_view(), name='menuproduct-detail'),
     path('reports/all-products/', MenuProductReportView.as_view(), name='report-all-products'),
+    path('reports/forecast/', StockForecastView.as_view(), name='stock-forecast'),
 ]
\ No newline at end of file
@@ -1,14 +1,22 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.views import IsEquipe # Importa sua permissão IsEquipe
+from lanchonete_backend_python.pagination import KeysetPagination
 
 from .models import StockItem, Category, Supplier, MenuProduct
 from .serializers import StockItemSerializer, CategorySerializer, SupplierSerializer, MenuProductSerializer
+from .forecasting import forecast_stock, HISTORY_DAYS, COVERAGE_DAYS
+from .menu_snapshot import menu_snapshot, snapshot_response
 
 # --- Views para Fornecedores (Supplier) ---
 class SupplierListCreateView(generics.ListCreateAPIView):
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('name', 'id')
 
 class SupplierRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView): # <-- CORRIGIDO
     queryset = Supplier.objects.all()
@@ -30,12 +38,15 @@ class CategoryRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
 
 # --- Views para Itens de Estoque (StockItem) ---
 class StockItemListCreateView(generics.ListCreateAPIView):
-    queryset = StockItem.objects.select_related('category', 'supplier').all()
+    # 'shards': itens em modo fragmentado somam o consumo pendente ao serializar
+    queryset = StockItem.objects.select_related('category', 'supplier').prefetch_related('shards').all()
     serializer_class = StockItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('name', 'id')
 
 class StockItemRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView): # <-- CORRIGIDO
-    queryset = StockItem.objects.select_related('category', 'supplier').all()
+    queryset = StockItem.objects.select_related('category', 'supplier').prefetch_related('shards').all()
     serializer_class = StockItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsEquipe]
     lookup_field = 'pk'
@@ -49,15 +60,33 @@ class MenuProductListCreateView(generics.ListCreateAPIView):
         Retorna todos os produtos para a equipe de gerenciamento
         e apenas os produtos ativos para visualização pública.
         """
-        user = self.request.user
+        # O serializer mostra categoria, fornecedor e quantidade do item de estoque
+        queryset = MenuProduct.objects.select_related(
+            'stock_item__category', 'stock_item__supplier'
+        ).prefetch_related('stock_item__shards')
         
-        # Verifica se o usuário é autenticado e pertence à equipe
-        if user.is_authenticated and IsEquipe().has_permission(self.request, self):
+        if self.is_equipe():
             # Se for da equipe, retorna TODOS os produtos
-            return MenuProduct.objects.select_related('stock_item').all()
+            return queryset.all()
         
         # Para todos os outros (público), retorna apenas os produtos ativos
-        return MenuProduct.objects.select_related('stock_item').filter(is_active=True)
+        return queryset.filter(is_active=True)
+
+    def is_equipe(self):
+        # Verifica se o usuário é autenticado e pertence à equipe
+        user = self.request.user
+        return user.is_authenticated and IsEquipe().has_permission(self.request, self)
+
+    def list(self, request, *args, **kwargs):
+        if self.is_equipe():
+            return super().list(request, *args, **kwargs)
+        # Público: o JSON pronto da versão atual do catálogo, sem banco nem serializer.
+        snapshot = menu_snapshot(request.build_absolute_uri('/'), self.render_public_menu)
+        return snapshot_response(request, snapshot)
+
+    def render_public_menu(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return JSONRenderer().render(serializer.data)
 
     def get_permissions(self):
         """
@@ -93,4 +122,30 @@ class MenuProductReportView(generics.ListAPIView):
             'stock_item', 
             'stock_item__category', 
             'stock_item__supplier'
-        ).all().order_by('name')
\ No newline at end of file
+        ).prefetch_related('stock_item__shards').all().order_by('name')
+
+
+# --- Previsão de consumo e reposição ---
+class StockForecastParamsSerializer(serializers.Serializer):
+    history_days = serializers.IntegerField(min_value=7, max_value=730, default=HISTORY_DAYS)
+    coverage_days = serializers.IntegerField(min_value=1, max_value=90, default=COVERAGE_DAYS)
+
+class StockForecastView(APIView):
+    """
+    Previsão calculada na hora (stock/forecasting.py): consumo diário esperado,
+    dias até o estoque mínimo e até acabar, e a reposição sugerida por fornecedor.
+    ?history_days= (padrão 365) e ?coverage_days= (padrão 14).
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEquipe]
+
+    def get(self, request):
+        params = StockForecastParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        forecast = forecast_stock(**params.validated_data)
+        return Response({
+            'generated_at': forecast.generated_at,
+            'history_days': forecast.history_days,
+            'coverage_days': forecast.coverage_days,
+            'items': forecast.items,
+            'suppliers': forecast.suppliers,
+        })
@@ -114,6 +114,10 @@ class CustomUser(AbstractUser):
         verbose_name = _('user')
         verbose_name_plural = _('users')
         ordering = ['email']
+        indexes = [
+            # Lista de funcionários (role='equipe'), paginada por (first_name, id).
+            models.Index(fields=['role', 'first_name', 'id'], name='user_role_nome_idx'),
+        ]
 
 
 # --- PasswordResetCode (sem alterações) ---
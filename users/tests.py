@@ -1,3 +1,32 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from lanchonete_backend_python.testing import OrcamentoQueriesMixin
+from .models import Cargo, CustomUser, FrontendPermission
+
+
+class OrcamentoQueriesListasTests(OrcamentoQueriesMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='gerente@escola.com', password='senha-123', first_name='Gil', role='equipe'
+        ))
+        self.contador = 0
+
+    def semear(self):
+        for _ in range(3):
+            self.contador += 1
+            permissao = FrontendPermission.objects.create(name=f'Tela {self.contador}', codename=f'tela_{self.contador}')
+            cargo = Cargo.objects.create(name=f'Cargo {self.contador}')
+            cargo.permissions.add(permissao)
+            CustomUser.objects.create_user(
+                email=f'func{self.contador}@escola.com', first_name=f'Func {self.contador}', role='equipe', function=cargo
+            )
+
+    def test_funcionarios(self):
+        response = self.assertOrcamentoQueries(self.client, reverse('employee_list'), 1, self.semear)
+        self.assertEqual(response.data['results'][-2]['function_name'], 'Cargo 9')
+
+    def test_cargos(self):
+        self.assertOrcamentoQueries(self.client, reverse('cargo-list'), 2, self.semear)
@@ -5,7 +5,7 @@ from rest_framework import status, viewsets
 from django.contrib.auth import authenticate, get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 # ALTERADO: Trocamos DestroyAPIView pela view mais completa
-from rest_framework.generics import RetrieveUpdateDestroyAPIView 
+from rest_framework.generics import ListAPIView, RetrieveUpdateDestroyAPIView 
 from rest_framework.permissions import IsAuthenticated, BasePermission
 from .models import CustomUser, Cargo, PasswordResetCode, FrontendPermission
 from .serializers import (
@@ -24,6 +24,7 @@ from django.core.mail import send_mail
 from django.conf import settings
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.decorators import action
+from lanchonete_backend_python.pagination import KeysetPagination
 
 
 CustomUser = get_user_model()
@@ -51,7 +52,7 @@ class CargoViewSet(viewsets.ModelViewSet):
     API endpoint que permite visualizar, criar, editar e deletar Cargos.
     Acessível apenas por membros da equipe.
     """
-    queryset = Cargo.objects.all().order_by('name')
+    queryset = Cargo.objects.prefetch_related('permissions').order_by('name')
     serializer_class = CargoSerializer
     permission_classes = [IsAuthenticated, IsEquipe]
 
@@ -152,13 +153,15 @@ class RegisterEmployeeView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 # --- VIEW: Listar Funcionários da Equipe (Protegida) ---
-class EmployeeListView(APIView):
+class EmployeeListView(ListAPIView):
+    """
+    Lista os funcionários da equipe por nome, paginada por (first_name, id).
+    """
+    queryset = CustomUser.objects.filter(role='equipe').select_related('function')
+    serializer_class = UserSerializer
     permission_classes = [IsAuthenticated, IsEquipe] 
-
-    def get(self, request):
-        employees = CustomUser.objects.filter(role='equipe').order_by('first_name')
-        serializer = UserSerializer(employees, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    pagination_class = KeysetPagination
+    keyset_ordering = ('first_name', 'id')
 
 # --- VIEW SUBSTITUÍDA: Gerencia GET, UPDATE e DELETE de um funcionário ---
 class EmployeeDetailView(RetrieveUpdateDestroyAPIView):